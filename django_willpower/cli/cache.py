@@ -0,0 +1,111 @@
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core import FileBytecodeCache, RenderCache
+from ..core.caches import get_user_cache_dir
+
+
+def get_caches(bytecode_cache, render_cache):
+    """
+    Return cache objects indexed on their label.
+    """
+    return {
+        "Bytecode": FileBytecodeCache(
+            bytecode_cache or get_user_cache_dir("bytecode")
+        ).storage,
+        "Render": RenderCache(render_cache or get_user_cache_dir("renders")).storage,
+    }
+
+
+def format_size(size):
+    """
+    Format a size in bytes to MiB.
+    """
+    return "{:.2f}MiB".format(size / (1024 * 1024))
+
+
+cache_directory_options = [
+    click.option(
+        "--bytecode-cache",
+        type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+        metavar="<directory>",
+        help=(
+            "Directory of compiled templates cache. Default to 'bytecode' directory "
+            "from the user cache directory."
+        )
+    ),
+    click.option(
+        "--render-cache",
+        type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+        metavar="<directory>",
+        help=(
+            "Directory of render cache. Default to 'renders' directory from the user "
+            "cache directory."
+        )
+    ),
+]
+
+
+def with_cache_directory_options(func):
+    for option in reversed(cache_directory_options):
+        func = option(func)
+
+    return func
+
+
+@click.group()
+def cache_command():
+    """
+    Willpower commands to manage caches.
+    """
+    pass
+
+
+@cache_command.command("stats")
+@with_cache_directory_options
+def stats_command(bytecode_cache, render_cache):
+    """
+    Display cache statistics.
+    """
+    for label, storage in get_caches(bytecode_cache, render_cache).items():
+        stats = storage.stats()
+        click.echo("{label} cache: {directory}".format(
+            label=label,
+            directory=storage.directory,
+        ))
+        click.echo("    {files} files, {size} used on {max_size}".format(
+            files=stats["files"],
+            size=format_size(stats["size"]),
+            max_size=format_size(stats["max_size"]),
+        ))
+
+
+@cache_command.command("prune")
+@with_cache_directory_options
+@click.option(
+    "--max-size",
+    type=click.IntRange(min=0),
+    metavar="INTEGER",
+    help=(
+        "Size limit in MiB to prune caches to, '0' clears caches. Default to the "
+        "size limit of each cache."
+    )
+)
+def prune_command(bytecode_cache, render_cache, max_size):
+    """
+    Remove least recently used cache files to respect size limits.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    if max_size is not None:
+        max_size = max_size * 1024 * 1024
+
+    for label, storage in get_caches(bytecode_cache, render_cache).items():
+        removed = storage.prune(max_size=max_size)
+        logger.info("{label} cache: removed {removed} files".format(
+            label=label,
+            removed=removed,
+        ))
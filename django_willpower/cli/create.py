@@ -4,10 +4,41 @@ from pathlib import Path
 import click
 
 import django_willpower
-from ..core import ProjectRegistry, ProjectBuilder
+from ..core import (
+    BuildProfiler, DaemonClient, FileBytecodeCache, ProjectRegistry, ProjectBuilder,
+    RenderCache, TarSink, TemplateProfiler, ZipSink,
+)
+from ..core.caches import get_user_cache_dir
+from ..core.daemon import DEFAULT_SOCKET
+from ..core.shards import parse_shard
+from ..core.sinks import FSYNC_POLICIES
 from ..exceptions import ProjectBuildError, ProjectValidationError
 
 
+def validate_shard(context, param, value):
+    """
+    Parse shard option value.
+    """
+    if value is None:
+        return None
+
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def log_stats(logger, stats):
+    """
+    Log build stats.
+    """
+    logger.info((
+        "Rendered {rendered} modules, got {cached} from cache, copied {copied} "
+        "files, skipped {skipped} unchanged; written {written} files, left "
+        "{unchanged} identical files untouched"
+    ).format(**stats))
+
+
 @click.command()
 @click.argument(
     "basedir",
@@ -23,8 +54,225 @@ from ..exceptions import ProjectBuildError, ProjectValidationError
     required=True,
     metavar="<config>",
 )
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    metavar="INTEGER",
+    help=(
+        "Number of worker processes to render modules with. Default to '1' which "
+        "render everything sequentially."
+    )
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Skip modules which inputs have not changed since the previous build. "
+        "Fingerprints of inputs are stored in a manifest file in project directory."
+    )
+)
+@click.option(
+    "--track-attributes/--no-track-attributes",
+    default=True,
+    help=(
+        "With '--incremental', either to record the model and field attributes "
+        "read by each module so a module is only rendered again when one of them "
+        "has changed, or to render again every modules of a changed application. "
+        "Default is to track attributes."
+    )
+)
+@click.option(
+    "--only",
+    multiple=True,
+    metavar="<query>",
+    help=(
+        "Only build the modules selected by a stack query like "
+        "'blog,cms@app{views,urls}:*', '*@appadmins:module' or '#Article'. Each "
+        "part is a comma separated list of names or globs. This option can be "
+        "given many times to select more modules."
+    )
+)
+@click.option(
+    "--shard",
+    callback=validate_shard,
+    metavar="I/N",
+    help=(
+        "Only build the shard I from N shards, like '2/5'. Targets are divided "
+        "between shards with balanced costs, the same way on every node. A shard "
+        "manifest is written with the output so shards can be merged with command "
+        "'merge'."
+    )
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help=(
+        "Resume a build which has been interrupted, from the journal it has left in "
+        "the project directory. Modules already written are not built again, "
+        "unless their inputs, templates or file have changed since. Only for the "
+        "'dir' output format without '--staged'."
+    )
+)
+@click.option(
+    "--preflight/--no-preflight",
+    default=True,
+    help=(
+        "Either to load and compile every needed templates before rendering "
+        "anything, so the build fails early with all template errors at once, or to "
+        "discover errors during rendering. Default is to run preflight."
+    )
+)
+@click.option(
+    "--skip-identical/--always-write",
+    default=True,
+    help=(
+        "Either to not write a module when its file already have the same content, "
+        "or to always write it. Default is to skip identical modules so their "
+        "modification time is left untouched."
+    )
+)
+@click.option(
+    "--streaming",
+    is_flag=True,
+    help=(
+        "Render modules chunk by chunk into temporary files which are renamed once "
+        "complete. This keeps memory usage low for modules rendered over large "
+        "inventories."
+    )
+)
+@click.option(
+    "--writers",
+    type=click.IntRange(min=0),
+    default=0,
+    metavar="INTEGER",
+    help=(
+        "Number of threads writing rendered modules while rendering continues, it "
+        "mostly helps on slow or network filesystems. Default to '0' which writes "
+        "modules right after their render."
+    )
+)
+@click.option(
+    "--fsync",
+    type=click.Choice(FSYNC_POLICIES),
+    default="none",
+    help=(
+        "Policy to flush written files to disk. 'none' leaves it to the operating "
+        "system, 'file' flushes each file once written and 'build' flushes every "
+        "written files at the end of the build. Only for the 'dir' output format. "
+        "Default to 'none'."
+    )
+)
+@click.option(
+    "--output-format",
+    type=click.Choice(["dir", "zip", "tar"]),
+    default="dir",
+    help=(
+        "Format of build output. 'dir' writes files into the project directory, "
+        "'zip' and 'tar' write a single archive '<basedir>.zip' or "
+        "'<basedir>.tar.gz' instead."
+    )
+)
+@click.option(
+    "--staged",
+    is_flag=True,
+    help=(
+        "Write modules into a staging directory for each application which is "
+        "swapped with the application directory once the build is finished. Only "
+        "for the 'dir' output format."
+    )
+)
+@click.option(
+    "--bytecode-cache",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    metavar="<directory>",
+    help=(
+        "Directory where to store compiled templates between builds. Default to "
+        "'bytecode' directory from the user cache directory."
+    )
+)
+@click.option(
+    "--no-bytecode-cache",
+    is_flag=True,
+    help="Disable the compiled templates cache."
+)
+@click.option(
+    "--render-cache",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    is_flag=False,
+    flag_value=str(get_user_cache_dir("renders")),
+    metavar="[<directory>]",
+    help=(
+        "Enable the cache of rendered modules which can be shared between builds, "
+        "projects and machines. If no directory is given, the 'renders' directory "
+        "from the user cache directory is used. Disabled by default."
+    )
+)
+@click.option(
+    "--render-cache-size",
+    type=click.IntRange(min=1),
+    metavar="INTEGER",
+    help=(
+        "Maximum size in MiB of the render cache, least recently used renders are "
+        "removed at the end of the build. Default to 256."
+    )
+)
+@click.option(
+    "--profile",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=Path),
+    metavar="<path>",
+    help=(
+        "Profile the build and write a JSON report of the wall and CPU times of each "
+        "phase, application, component, template and module file with the size of "
+        "written files. A summary with the slowest modules is displayed. The build "
+        "is never sent to the daemon when profiling."
+    )
+)
+@click.option(
+    "--profile-templates",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=Path),
+    metavar="<path>",
+    help=(
+        "Profile the time spent on each template line, including the templates "
+        "included and the macros called from it, and write it in the collapsed "
+        "stack format of flame graph tools. A summary with the slowest template "
+        "lines is displayed. Rendering is much slower while profiling templates. "
+        "The build is never sent to the daemon when profiling."
+    )
+)
+@click.option(
+    "--profile-top",
+    type=click.IntRange(min=0),
+    default=10,
+    metavar="INTEGER",
+    help=(
+        "Number of slowest modules or template lines displayed in profile "
+        "summaries. Default to 10."
+    )
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=Path),
+    default=DEFAULT_SOCKET,
+    metavar="<path>",
+    help=(
+        "Socket of the build daemon from command 'serve'. If a daemon is running on "
+        "it, the build is made by the daemon. Default to 'daemon/willpower.sock' "
+        "from the user cache directory."
+    )
+)
+@click.option(
+    "--no-daemon",
+    is_flag=True,
+    help="Never send the build to a running daemon."
+)
 @click.pass_context
-def create_command(context, basedir, config):
+def create_command(context, basedir, config, jobs, incremental, track_attributes,
+                   only, shard, resume, preflight, skip_identical, streaming, writers,
+                   fsync, output_format, staged, bytecode_cache, no_bytecode_cache,
+                   render_cache, render_cache_size, profile, profile_templates,
+                   profile_top, socket_path, no_daemon):
     """
     Willpower command to build a project.
 
@@ -34,6 +282,16 @@ def create_command(context, basedir, config):
 
     'config' is a path to a valid JSON file which contain the full project
     configuration. See documentation to know the structure of this JSON in details.
+
+    With option '--jobs' greater than 1, modules are rendered in parallel from a pool
+    of processes. The build stops on the first error.
+
+    Written modules are recorded in a journal during the build, so an interrupted
+    build can be continued with option '--resume'.
+
+    When a daemon from command 'serve' is running with the same Willpower version,
+    the build of a 'dir' output format is sent to it so registry and templates are not
+    loaded again.
     """
     logger = logging.getLogger(django_willpower.__pkgname__)
 
@@ -41,20 +299,157 @@ def create_command(context, basedir, config):
     logger.info("🚀 Starting")
     logger.debug("🔧 Base directory: {}".format(basedir.resolve()))
 
+    profiler = BuildProfiler() if profile else None
+    template_profiler = TemplateProfiler() if profile_templates else None
+
+    if (
+        output_format == "dir" and
+        not no_daemon and
+        not profiler and
+        not template_profiler
+    ):
+        client = DaemonClient(socket_path)
+        status = client.ping()
+        if status and status.get("version") != django_willpower.__version__:
+            logger.warning(
+                "Ignored daemon from {} which runs version {} instead of {}".format(
+                    socket_path,
+                    status.get("version"),
+                    django_willpower.__version__,
+                )
+            )
+        elif status:
+            logger.debug("🛰️ Using daemon from: {}".format(socket_path))
+
+            # Paths are resolved since daemon has its own working directory
+            bytecode_directory = None
+            if not no_bytecode_cache:
+                bytecode_directory = str(
+                    (bytecode_cache or get_user_cache_dir("bytecode")).resolve()
+                )
+
+            try:
+                response = client.request(
+                    "build",
+                    config=str(config.resolve()),
+                    basedir=str(basedir.resolve()),
+                    only=list(only),
+                    shard=shard,
+                    resume=resume,
+                    options={
+                        "jobs": jobs,
+                        "incremental": incremental,
+                        "track_attributes": track_attributes,
+                        "skip_identical": skip_identical,
+                        "streaming": streaming,
+                        "staged": staged,
+                        "render_cache": (
+                            str(Path(render_cache).resolve()) if render_cache else None
+                        ),
+                        "render_cache_size": (
+                            render_cache_size * 1024 * 1024
+                            if render_cache_size else None
+                        ),
+                        "bytecode_cache": bytecode_directory,
+                        "preflight": preflight,
+                        "writers": writers,
+                        "fsync": fsync,
+                    },
+                )
+            except (ProjectBuildError, ProjectValidationError) as e:
+                logger.critical(str(e))
+                raise click.Abort()
+
+            log_stats(logger, response["stats"])
+            logger.info("Finished")
+            return
+
     project = ProjectRegistry()
 
     try:
-        project.load_configuration(config)
+        if profiler:
+            with profiler.phase("configuration"):
+                project.load_configuration(config)
+        else:
+            project.load_configuration(config)
     except ProjectValidationError as e:
         logger.critical(str(e))
         raise click.Abort()
 
+    if not no_bytecode_cache:
+        bytecode_cache = FileBytecodeCache(
+            bytecode_cache or get_user_cache_dir("bytecode")
+        )
+    else:
+        bytecode_cache = None
+
+    if render_cache:
+        render_cache = RenderCache(
+            render_cache,
+            max_size=(render_cache_size or 0) * 1024 * 1024,
+        )
+
+    # Archive formats write a single file next to the project directory
+    sink = None
+    if output_format != "dir":
+        projectdir = basedir.resolve()
+        projectdir.parent.mkdir(parents=True, exist_ok=True)
+        sink_class, extension = {
+            "zip": (ZipSink, ".zip"),
+            "tar": (TarSink, ".tar.gz"),
+        }[output_format]
+        sink = sink_class(
+            projectdir,
+            projectdir.with_name(projectdir.name + extension)
+        )
+
     # Run builder processor
     try:
-        builder = ProjectBuilder(project, basedir)
-        builder.process()
+        builder = ProjectBuilder(
+            project,
+            basedir,
+            jobs=jobs,
+            incremental=incremental,
+            track_attributes=track_attributes,
+            skip_identical=skip_identical,
+            streaming=streaming,
+            sink=sink,
+            staged=staged,
+            bytecode_cache=bytecode_cache,
+            render_cache=render_cache,
+            preflight=preflight,
+            writers=writers,
+            fsync=fsync,
+            profiler=profiler,
+            template_profiler=template_profiler,
+        )
+        builder.process(only=only, shard=shard, resume=resume)
     except ProjectBuildError as e:
+        if sink:
+            sink.abort()
         logger.critical(str(e))
         raise click.Abort()
+    finally:
+        if profiler:
+            profiler.save(profile)
+        if template_profiler:
+            template_profiler.save(profile_templates)
+
+    log_stats(logger, builder.stats)
+
+    if profiler:
+        logger.info("Profile report written to: {}\n{}".format(
+            profile,
+            profiler.get_summary(top=profile_top)
+        ))
+
+    if template_profiler:
+        logger.info("Template profile written to: {}\n{}".format(
+            profile_templates,
+            template_profiler.get_summary(top=profile_top)
+        ))
+
+    if sink:
+        logger.info("Archive written to: {}".format(sink.archive))
 
     logger.info("Finished")
@@ -8,7 +8,13 @@ from ..logger import init_logger
 from .. import __pkgname__
 
 from .version import version_command
+from .cache import cache_command
 from .create import create_command
+from .merge import merge_command
+from .plan import plan_command
+from .render import render_command
+from .serve import serve_command
+from .watch import watch_command
 
 
 # Help alias on "-h" argument
@@ -63,3 +69,9 @@ def cli_frontend(ctx, verbose):
 # Attach commands methods to the main grouper
 cli_frontend.add_command(version_command, name="version")
 cli_frontend.add_command(create_command, name="create")
+cli_frontend.add_command(plan_command, name="plan")
+cli_frontend.add_command(merge_command, name="merge")
+cli_frontend.add_command(render_command, name="render")
+cli_frontend.add_command(cache_command, name="cache")
+cli_frontend.add_command(watch_command, name="watch")
+cli_frontend.add_command(serve_command, name="serve")
@@ -0,0 +1,56 @@
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core.shards import merge_shards
+from ..exceptions import ProjectBuildError
+
+
+@click.command()
+@click.argument(
+    "basedir",
+    nargs=1,
+    required=True,
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    metavar="<basedir>",
+)
+@click.argument(
+    "shards",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
+    metavar="<shard>...",
+)
+@click.option(
+    "--skip-identical/--always-write",
+    default=True,
+    help=(
+        "Either to not write a file which already have the same content, or to "
+        "always write it. Default is to skip identical files."
+    )
+)
+@click.pass_context
+def merge_command(context, basedir, shards, skip_identical):
+    """
+    Willpower command to merge the outputs of a build made with option '--shard' of
+    command 'create'.
+
+    'basedir' is the project directory where to merge outputs and each 'shard' is a
+    shard output, either a directory or a ZIP or TAR archive. Shard manifests are
+    verified first so nothing is merged if a shard is missing, given twice or comes
+    from another build or if a target is missing or duplicated.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    try:
+        stats = merge_shards(shards, basedir, skip_identical=skip_identical)
+    except ProjectBuildError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+
+    logger.info((
+        "Merged {shards} shards; written {written} files, left {unchanged} "
+        "identical files untouched"
+    ).format(**stats))
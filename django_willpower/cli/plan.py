@@ -0,0 +1,110 @@
+import json
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core import ProjectRegistry, ProjectBuilder
+from ..exceptions import ProjectBuildError, ProjectValidationError
+from .create import validate_shard
+
+
+@click.command()
+@click.argument(
+    "basedir",
+    nargs=1,
+    required=True,
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    metavar="<basedir>",
+)
+@click.argument(
+    "config",
+    nargs=1,
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, path_type=Path),
+    required=True,
+    metavar="<config>",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "Check the manifest from a previous incremental build to report the modules "
+        "which would be skipped as unchanged."
+    )
+)
+@click.option(
+    "--only",
+    multiple=True,
+    metavar="<query>",
+    help=(
+        "Only plan the modules selected by a stack query like "
+        "'blog,cms@app{views,urls}:*', '*@appadmins:module' or '#Article'. Each "
+        "part is a comma separated list of names or globs. This option can be "
+        "given many times to select more modules."
+    )
+)
+@click.option(
+    "--shard",
+    callback=validate_shard,
+    metavar="I/N",
+    help=(
+        "Only plan the shard I from N shards, like '2/5'. Targets are divided "
+        "between shards with balanced costs, the same way on every node."
+    )
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    help="Output format of the plan. Default to 'text'."
+)
+@click.pass_context
+def plan_command(context, basedir, config, incremental, only, shard,
+                 output_format):
+    """
+    Willpower command to display what a build would do, without rendering or writing
+    anything.
+
+    Arguments are the same than for the 'create' command. Each planned module is
+    printed with its destination path relatively to the project directory.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    project = ProjectRegistry()
+
+    try:
+        project.load_configuration(config)
+    except ProjectValidationError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+
+    try:
+        builder = ProjectBuilder(project, basedir, incremental=incremental)
+        plan = builder.plan(only=only, shard=shard)
+    except ProjectBuildError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+
+    payload = plan.as_dict()
+
+    if output_format == "json":
+        click.echo(json.dumps(payload, indent=4))
+        return
+
+    for target in payload["targets"]:
+        if target["exclude"]:
+            continue
+
+        click.echo("{status} {path} -> {destination}".format(
+            status="skip " if target["skip"] else (
+                "copy " if target["copy"] else "build"
+            ),
+            path=target["path"],
+            destination=target["destination"],
+        ))
+
+    click.echo(
+        "{build} to build, {skip} to skip, {exclude} excluded".format(**payload)
+    )
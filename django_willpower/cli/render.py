@@ -0,0 +1,69 @@
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core import ProjectRegistry, ProjectBuilder
+from ..exceptions import ProjectBuildError, ProjectValidationError
+from ..utils.stackpath import split_stack_path
+
+
+@click.command()
+@click.argument(
+    "config",
+    nargs=1,
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, path_type=Path),
+    required=True,
+    metavar="<config>",
+)
+@click.argument(
+    "path",
+    nargs=1,
+    required=True,
+    metavar="<app@component:module>",
+)
+@click.option(
+    "--model",
+    metavar="<name>",
+    help=(
+        "Name of the model to render the module for. Required for a module rendered "
+        "for each model when its application has more than one model."
+    )
+)
+@click.pass_context
+def render_command(context, config, path, model):
+    """
+    Willpower command to render a single module and print it to the standard output,
+    nothing is written.
+
+    'config' is the project configuration as for the 'create' command and 'path' the
+    stack path of the module to render like 'blog@appviews:module'.
+
+    Only the application from path is loaded and only the templates needed by the
+    module are compiled.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    app = split_stack_path(path)[0]
+    if not app:
+        logger.critical("Module path must include the application part.")
+        raise click.Abort()
+
+    project = ProjectRegistry()
+
+    try:
+        project.load_configuration(config, names=[app])
+    except ProjectValidationError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+
+    try:
+        builder = ProjectBuilder(project, Path.cwd())
+        content = builder.render_module(path, model=model)
+    except ProjectBuildError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+
+    # Content of a copied module is bytes which are written as is
+    click.echo(content, nl=False)
@@ -0,0 +1,71 @@
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core import FileBytecodeCache, ProjectDaemon
+from ..core.caches import get_user_cache_dir
+from ..core.daemon import DEFAULT_SOCKET
+from ..exceptions import ProjectBuildError
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(file_okay=True, dir_okay=False, path_type=Path),
+    default=DEFAULT_SOCKET,
+    metavar="<path>",
+    help=(
+        "Path of the Unix socket to listen on. Default to 'daemon/willpower.sock' "
+        "from the user cache directory."
+    )
+)
+@click.option(
+    "--bytecode-cache",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    metavar="<directory>",
+    help=(
+        "Directory where to store compiled templates between builds. Default to "
+        "'bytecode' directory from the user cache directory."
+    )
+)
+@click.option(
+    "--no-bytecode-cache",
+    is_flag=True,
+    help="Disable the compiled templates cache."
+)
+@click.pass_context
+def serve_command(context, socket_path, bytecode_cache, no_bytecode_cache):
+    """
+    Willpower command to run a build daemon.
+
+    The daemon keeps project registries, builders and compiled templates in memory
+    and answers build, plan and render requests on a Unix socket. Command 'create'
+    sends its build to the daemon when it is running on the same socket.
+
+    Use CTRL+C to stop the daemon.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    if not no_bytecode_cache:
+        bytecode_cache = FileBytecodeCache(
+            bytecode_cache or get_user_cache_dir("bytecode")
+        )
+    else:
+        bytecode_cache = None
+
+    daemon = ProjectDaemon(socket_path, bytecode_cache=bytecode_cache)
+
+    logger.info("🛰️ Listening on: {}".format(socket_path))
+
+    try:
+        daemon.serve()
+    except ProjectBuildError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+    except KeyboardInterrupt:
+        pass
+
+    logger.info("Stopped")
@@ -0,0 +1,82 @@
+import logging
+from pathlib import Path
+
+import click
+
+import django_willpower
+from ..core import ProjectWatcher
+from ..exceptions import ProjectValidationError
+
+
+@click.command()
+@click.argument(
+    "basedir",
+    nargs=1,
+    required=True,
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    metavar="<basedir>",
+)
+@click.argument(
+    "config",
+    nargs=1,
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, path_type=Path),
+    required=True,
+    metavar="<config>",
+)
+@click.option(
+    "--debounce",
+    type=click.FloatRange(min=0),
+    default=0.2,
+    metavar="SECONDS",
+    help=(
+        "Delay without any change to wait for before building, so a burst of "
+        "changes triggers a single build. Default to '0.2'."
+    )
+)
+@click.option(
+    "--polling",
+    is_flag=True,
+    help=(
+        "Watch files by polling their modification time instead of using inotify "
+        "events. Polling is always used where inotify is not available."
+    )
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.05),
+    default=0.5,
+    metavar="SECONDS",
+    help="Delay between two polls when polling is used. Default to '0.5'."
+)
+@click.pass_context
+def watch_command(context, basedir, config, debounce, polling, interval):
+    """
+    Willpower command to build a project then build it again each time its
+    configuration or templates change.
+
+    Arguments are the same than for the 'create' command. The configuration file,
+    the declarations and appstack files it references and every application template
+    directories are watched. Builds are incremental so only the modules affected by a
+    change are rendered again.
+
+    Use CTRL+C to stop watching.
+    """
+    logger = logging.getLogger(django_willpower.__pkgname__)
+
+    watcher = ProjectWatcher(
+        config,
+        basedir,
+        debounce=debounce,
+        polling=polling,
+        interval=interval,
+    )
+
+    logger.info("👀 Watching, use CTRL+C to stop")
+
+    try:
+        watcher.run()
+    except ProjectValidationError as e:
+        logger.critical(str(e))
+        raise click.Abort()
+    except KeyboardInterrupt:
+        logger.info("Stopped")
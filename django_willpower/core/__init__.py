@@ -1,15 +1,37 @@
 from .appstack import Application, Component, Module
 from .builder import ProjectBuilder
+from .caches import FileBytecodeCache, RenderCache
+from .daemon import DaemonClient, ProjectDaemon
 from .datamodel import Field, DataModel
+from .inventory import InventoryView
+from .profiling import BuildProfiler, TemplateProfiler
 from .project import ProjectRegistry
+from .sinks import FilesystemSink, MemorySink, StagedSink, TarSink, ZipSink
+from .targets import BuildPlan, BuildTarget
+from .watcher import ProjectWatcher
 
 
 __all__ = [
     "Application",
+    "BuildPlan",
+    "BuildProfiler",
+    "BuildTarget",
     "Component",
+    "DaemonClient",
     "DataModel",
     "Field",
+    "FileBytecodeCache",
+    "FilesystemSink",
+    "InventoryView",
+    "MemorySink",
     "Module",
     "ProjectBuilder",
+    "ProjectDaemon",
     "ProjectRegistry",
+    "ProjectWatcher",
+    "RenderCache",
+    "StagedSink",
+    "TarSink",
+    "TemplateProfiler",
+    "ZipSink",
 ]
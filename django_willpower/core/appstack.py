@@ -74,10 +74,14 @@ class Application:
         """
         return self.code
 
-    def as_dict(self):
+    def as_dict(self, children=True):
         """
         A safe way to convert to a dict without recursion issues.
 
+        Keyword Arguments:
+            children (boolean): If disabled, ``components`` and ``models`` items are
+                omitted. Default is enabled.
+
         Returns:
             dict: ``components`` item are serialized using their ``as_dict()`` method.
         """
@@ -88,6 +92,7 @@ class Application:
                 else [c.as_dict() for c in getattr(self, f.name)]
             )
             for f in dataclasses_fields(self)
+            if children or f.name not in ["components", "models"]
         }
 
     def set_components(self, components, from_init=False):
@@ -326,10 +331,14 @@ class Component:
             component=self.code,
         )
 
-    def as_dict(self):
+    def as_dict(self, children=True):
         """
         Safe way to convert to a dict without recursion issues.
 
+        Keyword Arguments:
+            children (boolean): If disabled, ``modules`` item is omitted. Default is
+                enabled.
+
         Returns:
             dict: ``app`` attribute is omitted and ``modules`` items are serialized
             using their ``as_dict()`` method.
@@ -341,7 +350,7 @@ class Component:
                 else [c.as_dict() for c in getattr(self, f.name)]
             )
             for f in dataclasses_fields(self)
-            if f.name != "app"
+            if f.name != "app" and (children or f.name != "modules")
         }
 
 
@@ -364,7 +373,8 @@ class Module:
 
     Keyword Arguments:
         copy_without_render (bool): When set to true the template is just copied to its
-            destination without any change or render.
+            destination without any change or render. This is intended for static
+            files like images, stylesheets or fixtures.
         once (bool): If true the module is to be built once for all models. Default
             value is false so the module is build for each model.
         component (Component): Component which this Module is linked to.
@@ -374,6 +384,7 @@ class Module:
     template: str
     destination_pattern: str
     once: bool = False
+    copy_without_render: bool = False
     component: Any = field(default=None, repr=False)
 
     def __post_init__(self):
@@ -0,0 +1,196 @@
+"""
+Attribute level dependency tracking.
+
+Templates are rendered with proxies around the registry objects which record every
+attribute read during the render. Each accessed attribute is recorded as a key made
+of the object reference and the attribute name divided by ``:`` character, like
+``field:blog:Article:title:kind``. An incremental build then only renders again the
+outputs which accessed attributes have changed.
+
+References are tuples starting with the object kind followed by the codes needed to
+find the object again from the registry:
+
+* ``("app", app_code)``;
+* ``("component", app_code, component_code)``;
+* ``("module", app_code, component_code, module_code)``;
+* ``("model", app_code, model_name)``;
+* ``("field", app_code, model_name, field_name)``;
+* ``("view", app_code, model_name)`` for an ``InventoryView``.
+
+A method called on a proxy can not be tracked so it records the special attribute
+``*`` which stands for the whole object.
+"""
+from types import MappingProxyType
+
+from .appstack import Application, Component, Module
+from .datamodel import DataModel, Field
+from .inventory import InventoryView
+
+
+# Attribute name which stands for the whole object
+WHOLE_OBJECT = "*"
+
+
+def get_reference(value):
+    """
+    Return the reference of a registry object.
+
+    Arguments:
+        value (object): Any value.
+
+    Returns:
+        tuple: The object reference or ``None`` if value is not a registry object.
+    """
+    if isinstance(value, Field):
+        model = value.model
+        app = model.app if model else None
+        return (
+            "field",
+            app.code if app else "",
+            model.name if model else "",
+            value.name,
+        )
+    elif isinstance(value, DataModel):
+        return ("model", value.app.code if value.app else "", value.name)
+    elif isinstance(value, InventoryView):
+        model = value.model
+        return ("view", model.app.code if model.app else "", model.name)
+    elif isinstance(value, Module):
+        component = value.component
+        return (
+            "module",
+            component.app.code if component and component.app else "",
+            component.code if component else "",
+            value.code,
+        )
+    elif isinstance(value, Component):
+        return ("component", value.app.code if value.app else "", value.code)
+    elif isinstance(value, Application):
+        return ("app", value.code)
+
+    return None
+
+
+def get_signature(value):
+    """
+    Return a JSON serializable signature of an attribute value.
+
+    Registry objects are replaced by their reference, so an attribute which links to
+    another object only changes if the link itself changes.
+
+    Arguments:
+        value (object): Attribute value.
+
+    Returns:
+        object: The value signature.
+    """
+    reference = get_reference(value)
+    if reference is not None:
+        return {"ref": ":".join(reference)}
+
+    if isinstance(value, (list, tuple)):
+        return [get_signature(item) for item in value]
+
+    if isinstance(value, (dict, MappingProxyType)):
+        return {str(k): get_signature(v) for k, v in value.items()}
+
+    return value
+
+
+class TrackedObject:
+    """
+    A proxy around a registry object which records every accessed attributes.
+
+    Attribute values are returned wrapped in proxies too, so every objects reached
+    from a proxy are tracked.
+
+    Arguments:
+        tracked (object): The registry object.
+        reference (tuple): The object reference.
+        recorder (AttributeRecorder): The recorder where to record attributes.
+    """
+    __slots__ = ("_tracked", "_reference", "_recorder")
+
+    def __init__(self, tracked, reference, recorder):
+        object.__setattr__(self, "_tracked", tracked)
+        object.__setattr__(self, "_reference", reference)
+        object.__setattr__(self, "_recorder", recorder)
+
+    def __getattr__(self, name):
+        value = getattr(self._tracked, name)
+
+        if callable(value) and get_reference(value) is None:
+            # Method results can not be tracked, depend on the whole object
+            self._recorder.record(self._reference, WHOLE_OBJECT)
+            return value
+
+        self._recorder.record(self._reference, name)
+
+        return self._recorder.wrap(value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Tracked objects are read only")
+
+    def __str__(self):
+        self._recorder.record(self._reference, WHOLE_OBJECT)
+        return str(self._tracked)
+
+    def __repr__(self):
+        return "<TrackedObject {}>".format(":".join(self._reference))
+
+    def __eq__(self, other):
+        if isinstance(other, TrackedObject):
+            other = other._tracked
+
+        return self._tracked is other
+
+    def __hash__(self):
+        return id(self._tracked)
+
+
+class AttributeRecorder:
+    """
+    Record attributes accessed from tracked objects.
+
+    Attributes:
+        keys (set): Recorded attribute keys.
+    """
+    def __init__(self):
+        self.keys = set()
+
+    def record(self, reference, name):
+        """
+        Record an accessed attribute.
+
+        Arguments:
+            reference (tuple): Reference of the object.
+            name (string): Attribute name.
+        """
+        self.keys.add(":".join(reference + (name,)))
+
+    def wrap(self, value):
+        """
+        Wrap a value so the attributes of every registry objects it contains are
+        tracked.
+
+        Arguments:
+            value (object): Any value.
+
+        Returns:
+            object: A ``TrackedObject`` for a registry object, a list, a tuple or a
+            dict with wrapped items for a container or else the value itself.
+        """
+        reference = get_reference(value)
+        if reference is not None:
+            return TrackedObject(value, reference, self)
+
+        if isinstance(value, list):
+            return [self.wrap(item) for item in value]
+
+        if isinstance(value, tuple):
+            return tuple([self.wrap(item) for item in value])
+
+        if isinstance(value, (dict, MappingProxyType)):
+            return {k: self.wrap(v) for k, v in value.items()}
+
+        return value
@@ -1,9 +1,104 @@
+import json
 import logging
+import sys
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+from jinja2.loaders import split_template_path
 
 from ..exceptions import ProjectBuildError
-from .. import __pkgname__
+from ..utils.stackquery import StackQuery
+from .. import __pkgname__, __version__
+from .appstack import Module
+from .attributes import WHOLE_OBJECT, AttributeRecorder, get_signature
+from .inventory import InventoryView
+from .journal import BuildJournal
+from .manifest import BuildManifest
+from .preflight import TemplatePreflight
+from .profiling import TemplateProfiler, get_clock, get_elapsed
+from .renderers import FieldRendererRegistry
+from .shards import SHARD_FILENAME, get_shard_manifest
+from .sinks import FilesystemSink, StagedSink
+from .targets import BuildPlan, BuildTarget
+from .tracking import TrackingLoader
+from .writers import WriteBehind
+
+
+# Builder instance used by a worker process from parallel mode
+_WORKER_BUILDER = None
+
+
+def _init_worker(registry, projectdir, names, options):
+    """
+    Initialize a worker process with its own builder and expanded targets.
+
+    Targets expansion is deterministic from a same registry so the worker can address
+    them with the same indexes than the main process.
+
+    Arguments:
+        registry (ProjectRegistry): Registry to build.
+        projectdir (pathlib.Path): Project directory.
+        names (list): Application codes to expand.
+        options (dict): Keyword arguments for worker ``ProjectBuilder``.
+    """
+    global _WORKER_BUILDER
+
+    _WORKER_BUILDER = ProjectBuilder(registry, projectdir, **options)
+    _WORKER_BUILDER._worker_targets = _WORKER_BUILDER.get_targets(names=names)
+
+
+def _render_job(index):
+    """
+    Render a target from its index in a worker process.
+
+    With streaming enabled (only for a filesystem sink) the target is rendered into a
+    temporary file next to its destination and the temporary file path is returned
+    instead of the content.
+
+    Returns:
+        tuple: The target index, the rendered content (or the temporary file path),
+        the names of templates loaded to render it, the keys of attributes accessed
+        during render, whether it has been got from the render cache, the wall
+        and CPU times of its render, the template profiler stack times recorded
+        since the previous job (or ``None`` without template profiling) and the
+        hash of the temporary file content (only for a streamed target with journal
+        enabled).
+    """
+    target = _WORKER_BUILDER._worker_targets[index]
+
+    cached = False
+    content_hash = None
+    clock = get_clock()
+
+    if _WORKER_BUILDER.render_cache:
+        rendered, cached = _WORKER_BUILDER.render_cached_target(target)
+    elif _WORKER_BUILDER.streaming:
+        chunks = _WORKER_BUILDER.generate_target(target)
+        if _WORKER_BUILDER.journal:
+            chunks, content_hash = BuildJournal.hash_chunks(chunks)
+        rendered = _WORKER_BUILDER.sink.stream_to_temporary(
+            target.destination,
+            chunks
+        )
+        content_hash = content_hash() if content_hash else None
+    else:
+        rendered = _WORKER_BUILDER.render_target(target)
+
+    return (
+        index,
+        rendered,
+        target.dependencies,
+        target.attributes,
+        cached,
+        get_elapsed(clock),
+        (
+            _WORKER_BUILDER.template_profiler.pop_stacks()
+            if _WORKER_BUILDER.template_profiler else None
+        ),
+        content_hash,
+    )
 
 
 class ProjectBuilder:
@@ -27,44 +122,309 @@ class ProjectBuilder:
         └── DataModel{1,n}
             └── Field{1,n}
 
+    The tree is first expanded into a flat list of ``BuildTarget`` objects, each one
+    is an independent output to render and write.
+
     Arguments:
         registry (ProjectRegistry):
         projectdir (Path):
 
+    Keyword Arguments:
+        jobs (integer): Number of worker processes to render targets with. Default is
+            ``1`` which renders every targets sequentially in the current process.
+            With more than one job, targets are rendered from a process pool with the
+            longest targets scheduled first and the build is stopped on the first
+            error. Written files are the same in both modes.
+        incremental (boolean): If enabled, a manifest of built outputs is stored in
+            project directory and a next build will skip the outputs which inputs
+            fingerprint have not changed and which templates loaded during their
+            render (including the ones from ``include`` and ``import``) have not
+            changed. Default is disabled.
+        track_attributes (boolean): If enabled with incremental mode, templates are
+            rendered with proxies which record the model and field attributes they
+            access, so an output is only built again when one of its accessed
+            attributes has changed. Else an output is built again when anything has
+            changed in its application.
+        skip_identical (boolean): If enabled, a rendered module is not written when
+            its destination file already has exactly the same content, so its
+            modification time is left untouched. Default is enabled. It is only used
+            for the default sink.
+        streaming (boolean): If enabled, templates are rendered chunk by chunk to the
+            sink. With the filesystem sink, chunks are written into a temporary file
+            which is then renamed to its destination. So the rendered content is
+            never fully loaded in memory and a destination file is never partially
+            written. Default is disabled.
+        sink (BaseSink): The output sink where to write modules. Default is a
+            ``FilesystemSink`` on the project directory. Incremental mode is only
+            available with a filesystem sink.
+        staged (boolean): If enabled, modules are written into a staging directory
+            for each application which is swapped with the application destination
+            once every modules have been written. It can not be used with a custom
+            sink. Default is disabled.
+        bytecode_cache (jinja2.BytecodeCache): A Jinja bytecode cache to share
+            compiled templates between builds, commonly a ``FileBytecodeCache``.
+            Default is no cache.
+        render_cache (RenderCache): A cache of rendered targets to share between
+            builds and projects. A target found in cache is not rendered again. Targets
+            are not streamed when it is enabled. Default is no cache.
+        preflight (boolean): If enabled, every templates needed by the targets to
+            build are loaded and compiled before rendering or writing anything, and
+            the build fails with all the problems found at once. Templates are
+            compiled by the builder environments so they are not compiled again to
+            be rendered. Default is enabled.
+        writers (integer): Number of threads writing rendered modules and copied
+            files to the sink while rendering continues, see ``WriteBehind``. A sink
+            which does not support concurrent writes (like archive sinks) is written
+            from a single thread whatever this number is. Streamed targets are
+            always written during their render. Default is ``0`` which writes
+            every modules from the rendering thread.
+        write_queue_size (integer): Maximum number of rendered modules waiting to be
+            written before rendering is paused. Default is 16 modules per writer.
+        fsync (string): Policy to flush written files to disk, see
+            ``FilesystemSink``. It is only used for the default sinks. Default is
+            ``none``.
+        journal (boolean): If enabled, every completed target is appended to a
+            ``BuildJournal`` in project directory during the build, so a build which
+            has been interrupted can be resumed with ``process(resume=True)``. The
+            journal is removed once the build is finished. It is only available with
+            a filesystem sink without staged build. Default is enabled.
+        profiler (BuildProfiler): A profiler to record the times of build phases
+            (``plan``, ``resume``, ``preflight``, ``prepare``, ``render`` which
+            includes the writes which are not deferred, ``flush``, ``close`` and
+            ``finalize``), of target renders and writes and of template compilations,
+            with the size of outputs. Default is no profiling.
+        template_profiler (TemplateProfiler): A profiler to record the render time
+            of every template line, including the ones from worker processes. Renders
+            are much slower while it is enabled. Default is no template profiling.
+
+    Attributes:
+        stats (dict): Counters from the last ``process()`` run for ``rendered``,
+            ``cached``, ``copied`` and ``skipped`` targets and for ``written`` and
+            ``unchanged`` files.
     """
-    def __init__(self, registry, projectdir):
+    def __init__(self, registry, projectdir, jobs=1, incremental=False,
+                 skip_identical=True, streaming=False, sink=None, staged=False,
+                 bytecode_cache=None, render_cache=None, track_attributes=True,
+                 preflight=True, writers=0, write_queue_size=None, fsync="none",
+                 journal=True, profiler=None, template_profiler=None):
         self.logger = logging.getLogger(__pkgname__)
 
         self.registry = registry
         self.projectdir = projectdir.resolve()
+        self.jobs = jobs
+        self.incremental = incremental
+        self.track_attributes = incremental and track_attributes
+        self.streaming = streaming
+        self.bytecode_cache = bytecode_cache
+        self.render_cache = render_cache
+        self.preflight = preflight
+        self.writers = writers
+        self.write_queue_size = write_queue_size
+        self.profiler = profiler
+        self.template_profiler = template_profiler
+
+        if staged and sink:
+            raise ProjectBuildError(
+                "Staged build can not be used with a custom sink."
+            )
+        elif staged:
+            self.sink = StagedSink(
+                self.projectdir,
+                [
+                    self.projectdir / app.get_destination()
+                    for app in self.registry.apps.values()
+                ],
+                skip_identical=skip_identical,
+                fsync=fsync,
+            )
+        else:
+            self.sink = sink or FilesystemSink(
+                self.projectdir,
+                skip_identical=skip_identical,
+                fsync=fsync,
+            )
+
+        if self.incremental and not isinstance(self.sink, FilesystemSink):
+            raise ProjectBuildError(
+                "Incremental build is only available with a filesystem sink."
+            )
+
+        self.manifest = BuildManifest(self.projectdir / BuildManifest.FILENAME)
+
+        self.journal = None
+        if (
+            journal and
+            isinstance(self.sink, FilesystemSink) and
+            not isinstance(self.sink, StagedSink)
+        ):
+            self.journal = BuildJournal(self.projectdir / BuildJournal.FILENAME)
+        self.stats = self.get_initial_stats()
+
+        # Jinja environments indexed on template directory
+        self._environments = {}
+        # Field renderer registries indexed on template directory
+        self._field_renderers = {}
+        # Template preflight kept between builds to reuse the references it found
+        self._preflight = TemplatePreflight(self)
+        # Fingerprints of targets to build indexed on their manifest key
+        self._fingerprints = {}
+        # Template source hashes indexed on template directory and template name
+        self._template_hashes = {}
+        # Model inventory views indexed on application code and model name
+        self._inventory_views = {}
+        # Attribute signatures indexed on attribute key
+        self._attribute_signatures = {}
+        # Serialized target inputs indexed on their path
+        self._serialized = {}
+        # Fingerprints of full target inputs indexed on their manifest key
+        self._inputs_fingerprints = {}
+        # Fingerprints of applications with all their children indexed on their path
+        self._app_fingerprints = {}
+        # Write-behind pipeline of the running build
+        self._writer = None
 
     def get_jinja_environment(self, template_dir):
         """
         Initialize Jinja environment with the right template directory.
+
+        Environment cache is disabled since the ``TrackingLoader`` holds its own
+        cache to be able to record every loaded templates.
+        """
+        return Environment(
+            loader=TrackingLoader(FileSystemLoader(template_dir)),
+            cache_size=0,
+            bytecode_cache=self.bytecode_cache,
+        )
+
+    def get_app_environment(self, app):
+        """
+        Return the Jinja environment for an application.
+
+        Environment is initialized only once for each template directory, so
+        applications sharing the same template directory share the same environment
+        and compiled templates. A ``FieldRendererRegistry`` is installed in each
+        environment.
         """
-        return Environment(loader=FileSystemLoader(template_dir))
+        if app.template_dir not in self._environments:
+            jinja_env = self.get_jinja_environment(app.template_dir)
+            if self.profiler:
+                self.profiler.watch_environment(jinja_env)
+            registry = FieldRendererRegistry(jinja_env)
+            registry.install()
+
+            self._environments[app.template_dir] = jinja_env
+            self._field_renderers[app.template_dir] = registry
+
+        return self._environments[app.template_dir]
+
+    def get_initial_stats(self):
+        """
+        Return build counters all set to zero.
+        """
+        return {
+            "rendered": 0,
+            "cached": 0,
+            "copied": 0,
+            "skipped": 0,
+            "written": 0,
+            "unchanged": 0,
+        }
+
+    def count_write(self, written):
+        """
+        Increment stats counter depending a module has been written or not.
+        """
+        if written:
+            self.stats["written"] += 1
+        else:
+            self.stats["unchanged"] += 1
+
+    def commit_write(self, target, stat, method, *args, defer=True, size=None,
+                     content_hash=None):
+        """
+        Write a target with a sink method then count it and record it in manifest.
+
+        When the write-behind pipeline is running and ``defer`` is enabled, the write
+        is queued to writer threads and the target is counted and recorded once
+        written. A write which is not deferred is made from the current thread, so
+        queued writes are drained before it when the sink does not support
+        concurrent writes.
+
+        Arguments:
+            target (BuildTarget): Target to write.
+            stat (string): Name of the stats counter to increment for the target.
+            method (callable): Sink method to write with.
+            *args: Arguments for the sink method.
+
+        Keyword Arguments:
+            defer (boolean): Whether the write may be queued.
+            size (object): Size in bytes of the written output for the profiler,
+                either an integer or a callable to get it once written.
+            content_hash (object): Hash of the written output for the journal,
+                either a string or a callable to get it once written. If empty, the
+                journal computes it from the written file.
+        """
+        def timed_write():
+            clock = get_clock()
+            result = method(*args)
+
+            return result, get_elapsed(clock)
+
+        def written(outcome):
+            result, elapsed = outcome
+            if self.profiler:
+                self.profile_target(
+                    target,
+                    "write",
+                    elapsed,
+                    size=size() if callable(size) else size,
+                    written=result,
+                )
+            self.count_write(result)
+            self.stats[stat] += 1
+            self.record_target(
+                target,
+                content_hash=(
+                    content_hash() if callable(content_hash) else content_hash
+                ),
+            )
 
-    def safe_module_write(self, path, content):
+        if self._writer is None or not defer:
+            if self._writer is not None and not self.sink.supports_concurrent_writes:
+                self._writer.flush()
+            written(timed_write())
+        else:
+            self._writer.submit(target.get_path(), written, timed_write)
+
+    def profile_phase(self, name):
         """
-        Safely write content to path even if path parents does not exists yet (they will
-        be created on need).
+        Return a context manager which times a build phase if profiler is enabled.
+
+        Arguments:
+            name (string): Phase name.
         """
-        # Ensure path is always inside the project
-        if not path.is_relative_to(self.projectdir):
-            msg = "Resolved module path is not a child of the project directory: {}"
-            raise ProjectBuildError(msg.format(path))
+        if self.profiler:
+            return self.profiler.phase(name)
 
-        # Create path parents if needed
-        if not path.parent.exists():
-            msg = "          └── Created path parents: {}".format(path.parent)
-            self.logger.debug(msg)
-            path.parent.mkdir(mode=0o755, parents=True)
+        return nullcontext()
 
-        msg = "              Written to: {}".format(path)
-        self.logger.debug(msg)
-        path.write_text(content)
+    def profile_target(self, target, stage, elapsed, **kwargs):
+        """
+        Record target times in profiler.
 
-        return path
+        Arguments:
+            target (BuildTarget): The target.
+            stage (string): Either ``render`` or ``write``.
+            elapsed (tuple): Elapsed wall and CPU times.
+            **kwargs: Extra arguments for ``BuildProfiler.record_target()``.
+        """
+        self.profiler.record_target(
+            target,
+            self.get_target_key(target),
+            stage,
+            *elapsed,
+            **kwargs
+        )
 
     def get_module_path_context(self, module, modelname=None):
         context = {
@@ -78,88 +438,1267 @@ class ProjectBuilder:
 
         return context
 
-    def build_module(self, jinja_env, module, inventories):
-        """
-        Build component module for a model declaration.
+    def get_module_targets(self, module):
         """
-        self.logger.debug("      └── Module pattern : {}".format(
-            module.get_destination()
-        ))
+        Expand a module into its build targets.
+
+        A module with ``once`` enabled is a single target with all application models
+        in its context, else there is a target for each application model.
 
-        self.logger.debug("      └── Module template : {}".format(module.template))
+        Arguments:
+            module (Module): Module to expand.
+
+        Returns:
+            list: ``BuildTarget`` objects for the module.
+        """
+        models = module.component.app.models
 
         if module.once:
-            # Will be built once with the full inventories in context
-            module_destination = (self.projectdir / module.get_destination(
+            destination = (self.projectdir / module.get_destination(
                 self.get_module_path_context(module)
             )).resolve()
-            msg = "          └── For all models: {}".format(module.template)
-            self.logger.debug(msg)
-
-            # Render module template with context and write it to the FS
-            template = jinja_env.get_template(module.template)
-            rendered = template.render(
-                app=module.component.app,
-                component=module.component,
-                module=module,
-                inventories=inventories,
-            )
-            self.safe_module_write(module_destination, rendered)
-        else:
-            self.logger.debug("      └── For models:")
-            for model in inventories:
-                module_destination = (self.projectdir / module.get_destination(
-                    self.get_module_path_context(
-                        module,
-                        modelname=model.module_filename
-                    )
-                )).resolve()
-                msg = "          └── {}: {}".format(model.name, module_destination)
-                self.logger.debug(msg)
-
-                # Render module template with context and write it to the FS
-                template = jinja_env.get_template(module.template)
-                rendered = template.render(
-                    app=module.component.app,
-                    component=module.component,
+
+            return [
+                BuildTarget(
+                    module=module,
+                    destination=destination,
+                    cost=sum([1 + len(model.modelfields) for model in models]) or 1,
+                )
+            ]
+
+        targets = []
+        for model in models:
+            destination = (self.projectdir / module.get_destination(
+                self.get_module_path_context(
+                    module,
+                    modelname=model.module_filename
+                )
+            )).resolve()
+
+            targets.append(
+                BuildTarget(
                     module=module,
-                    model_inventory=model,
+                    destination=destination,
+                    model=model,
+                    cost=1 + len(model.modelfields),
                 )
-                self.safe_module_write(module_destination, rendered)
+            )
+
+        return targets
+
+    def get_targets(self, names=None):
+        """
+        Expand applications into their build targets.
+
+        Keyword Arguments:
+            names (list): Application codes to expand. If empty, all registered
+                applications are expanded.
+
+        Returns:
+            list: ``BuildTarget`` objects in the application tree order.
+        """
+        names = names or self.registry.apps.keys()
+        targets = []
+
+        for appname in names:
+            app = self.registry.apps[appname]
+
+            for component in app.components:
+                codes = set()
 
-        return
+                for module in component.modules:
+                    if module.code in codes:
+                        msg = "Component '{}' has more than one module with code: {}"
+                        raise ProjectBuildError(
+                            msg.format(component.get_path(), module.code)
+                        )
+                    codes.add(module.code)
 
-    def create_component(self, jinja_env, component):
+                    targets.extend(self.get_module_targets(module))
+
+        return targets
+
+    def get_destinations(self, targets):
         """
-        Create a component.
+        Index targets on their destination.
+
+        Arguments:
+            targets (list): ``BuildTarget`` objects.
+
+        Returns:
+            dict: Target indexes indexed on their destination path.
         """
-        self.logger.debug("  └── Component: {}".format(component.name))
+        destinations = {}
+
+        for index, target in enumerate(targets):
+            if target.destination in destinations:
+                other = targets[destinations[target.destination]]
+                msg = "Targets '{}' and '{}' resolve to the same destination: {}"
+                raise ProjectBuildError(msg.format(
+                    other.get_path(),
+                    target.get_path(),
+                    target.destination,
+                ))
 
-        for module in component.modules:
-            self.build_module(jinja_env, module, component.app.models)
+            destinations[target.destination] = index
 
-        return
+        return destinations
 
-    def process(self, names=None):
+    def get_inventory_view(self, model):
         """
-        Create all application components with their modules.
+        Return the inventory view of a model.
+
+        View is computed only once for each model during a build and shared by all
+        the targets of the model.
 
         Arguments:
-            path (string): A path to a declaration file.
+            model (DataModel): Model to get view for.
 
         Returns:
-            something: something
+            InventoryView: The model view.
+        """
+        key = (model.app.code if model.app else None, model.name)
+
+        if key not in self._inventory_views:
+            self._inventory_views[key] = InventoryView.from_model(model)
+
+        return self._inventory_views[key]
+
+    def generate_target(self, target):
+        """
+        Render a build target template chunk by chunk.
+
+        Template context contains the application, component and module. A target for
+        a model has the model as ``model_inventory`` and its ``InventoryView`` as
+        ``inventory_view``. A target with ``once`` enabled has all application models
+        as ``inventories`` and their views as ``inventory_views``.
+
+        With attribute tracking enabled, context objects are wrapped in proxies and
+        the keys of accessed attributes are set in target ``attributes``.
+
+        Arguments:
+            target (BuildTarget): Target to render.
+
+        Yields:
+            string: Rendered template chunks.
+        """
+        jinja_env = self.get_app_environment(target.app)
+
+        context = {
+            "app": target.app,
+            "component": target.component,
+            "module": target.module,
+        }
+
+        try:
+            if target.model is None:
+                # Will be built once with the full inventories in context
+                context["inventories"] = target.app.models
+                context["inventory_views"] = [
+                    self.get_inventory_view(model) for model in target.app.models
+                ]
+            else:
+                context["model_inventory"] = target.model
+                context["inventory_view"] = self.get_inventory_view(target.model)
+
+            recorder = None
+            if self.track_attributes:
+                recorder = AttributeRecorder()
+                if target.model is None:
+                    recorder.record(("app", target.app.code), "models")
+                context = {k: recorder.wrap(v) for k, v in context.items()}
+
+            with jinja_env.loader.track() as dependencies:
+                template = jinja_env.get_template(target.template)
+                if self.template_profiler:
+                    yield from self.generate_traced(template, context)
+                else:
+                    yield from template.generate(**context)
+        except Exception as e:
+            msg = "Unable to render '{}': {}: {}"
+            raise ProjectBuildError(
+                msg.format(target.get_path(), e.__class__.__name__, e)
+            ) from e
+
+        target.dependencies = dependencies
+        target.attributes = recorder.keys if recorder else None
+
+    def generate_traced(self, template, context):
+        """
+        Render a template chunk by chunk with the template profiler tracing.
+
+        Tracing is stopped while a chunk is consumed, so the time spent by the consumer
+        (like writing a streamed chunk) is not accounted to the template.
+
+        Arguments:
+            template (jinja2.Template): Template to render.
+            context (dict): Template context.
+
+        Yields:
+            string: Rendered template chunks.
+        """
+        chunks = template.generate(**context)
+        frame = sys._getframe()
+
+        while True:
+            self.template_profiler.start(boundary=frame)
+            try:
+                chunk = next(chunks, None)
+            finally:
+                self.template_profiler.stop()
+
+            if chunk is None:
+                return
+
+            yield chunk
+
+    def get_module_target(self, path, model=None):
+        """
+        Find the build target of a single module output from its stack path.
+
+        Arguments:
+            path (string): Stack path of a module as ``app@component:module``.
+
+        Keyword Arguments:
+            model (string): Name of the model to render the module for. It is ignored
+                for a module with ``once`` enabled and it is optional when the
+                application has a single model.
+
+        Returns:
+            BuildTarget: The target.
+        """
+        try:
+            module = self.registry.find(path)
+        except ValueError as e:
+            raise ProjectBuildError(
+                "Invalid module path '{}': {}".format(path, e)
+            ) from e
+
+        if not isinstance(module, Module):
+            raise ProjectBuildError(
+                "Path '{}' does not target a module".format(path)
+            )
+
+        targets = self.get_module_targets(module)
+
+        if module.once:
+            return targets[0]
+
+        if model is None and len(targets) == 1:
+            return targets[0]
+
+        for target in targets:
+            if target.model.name == model:
+                return target
+
+        msg = "Module '{}' requires a model name among: {}"
+        raise ProjectBuildError(msg.format(
+            path,
+            ", ".join([target.model.name for target in targets]) or "(no models)",
+        ))
+
+    def render_module(self, path, model=None):
+        """
+        Render a single module output without writing it.
+
+        Only the templates needed by this output are loaded and compiled, so it is
+        fast enough to preview a module after a template change.
+
+        Arguments:
+            path (string): Stack path of a module as ``app@component:module``.
+
+        Keyword Arguments:
+            model (string): Name of the model to render the module for, see
+                ``get_module_target()``.
+
+        Returns:
+            object: Rendered module as a string. A module with ``copy_without_render``
+            enabled returns its template file content as bytes since it may be a
+            binary file.
+        """
+        target = self.get_module_target(path, model=model)
+
+        if target.module.copy_without_render:
+            try:
+                source = self.get_template_filepath(target.app, target.template)
+            except TemplateNotFound as e:
+                msg = "Unable to copy '{}': {}: {}"
+                raise ProjectBuildError(
+                    msg.format(target.get_path(), e.__class__.__name__, e)
+                ) from e
+
+            return source.read_bytes()
+
+        return self.render_target(target)
+
+    def render_target(self, target):
+        """
+        Render a build target template.
+
+        Arguments:
+            target (BuildTarget): Target to render.
+
+        Returns:
+            string: Rendered template.
+        """
+        return "".join(self.generate_target(target))
+
+    def get_target_key(self, target):
+        """
+        Return the target destination relative to the project directory, it is used
+        as the target key in manifest.
+        """
+        return str(target.destination.relative_to(self.projectdir))
+
+    def get_target_inputs(self, target):
+        """
+        Return target inputs.
+
+        Inputs are the application, component and module definitions and either the
+        target model or all the application models for a module with ``once``
+        enabled. Application and component are serialized without their children
+        (their full definitions are covered by ``get_app_fingerprint()``), each
+        input is serialized only once during a build.
+
+        Arguments:
+            target (BuildTarget): Target to get inputs for.
+
+        Returns:
+            list: Inputs serialized with their ``as_dict()`` method.
+        """
+        app = target.app
+
+        if target.model is None:
+            models = [self.get_serialized_model(model) for model in app.models]
+        else:
+            models = self.get_serialized_model(target.model)
+
+        return [
+            self.get_serialized(app.get_path(), app, children=False),
+            self.get_serialized(
+                target.component.get_path(),
+                target.component,
+                children=False,
+            ),
+            self.get_serialized(target.module.get_path(), target.module),
+            models,
+        ]
+
+    def get_serialized(self, key, obj, **kwargs):
+        """
+        Return the serialization of a target input.
+
+        Serializations are computed only once during a build and shared by all
+        targets, they must not be modified.
+
+        Arguments:
+            key (string): Unique key of input object, commonly its path.
+            obj (object): Input object.
+            **kwargs: Arguments for the object ``as_dict()`` method.
+
+        Returns:
+            dict: The serialized input.
+        """
+        if key not in self._serialized:
+            self._serialized[key] = obj.as_dict(**kwargs)
+
+        return self._serialized[key]
+
+    def get_serialized_model(self, model):
+        """
+        Return the serialization of a model as a target input.
+        """
+        return self.get_serialized(
+            "{}#{}".format(model.app.code if model.app else None, model.name),
+            model,
+        )
+
+    def get_target_fingerprint(self, target):
+        """
+        Compute fingerprint of target inputs.
+
+        Models are only included by their names since they are checked apart with
+        the recorded attributes, as templates are checked apart from the recorded
+        dependencies.
+
+        Arguments:
+            target (BuildTarget): Target to compute fingerprint for.
+
+        Returns:
+            string: The fingerprint.
+        """
+        app, component, module, models = self.get_target_inputs(target)
+
+        return self.manifest.fingerprint(
+            app,
+            component,
+            module,
+            [model.name for model in target.app.models]
+            if target.model is None else target.model.name,
+        )
+
+    def get_app_fingerprint(self, app):
+        """
+        Compute fingerprint of an application with all its components, modules and
+        models, without its template directory.
+
+        Target inputs only contain the application and component definitions
+        without their children, this fingerprint covers the sibling models and
+        components that a template may reach from them. It is computed only once
+        for each application during a build.
+
+        Arguments:
+            app (Application): Application to compute fingerprint for.
+
+        Returns:
+            string: The fingerprint.
+        """
+        key = app.get_path()
+
+        if key not in self._app_fingerprints:
+            self._app_fingerprints[key] = self.manifest.fingerprint({
+                k: v
+                for k, v in app.as_dict().items()
+                if k != "template_dir"
+            })
+
+        return self._app_fingerprints[key]
+
+    def get_target_inputs_fingerprint(self, target):
+        """
+        Compute fingerprint of all target inputs, including the full models and the
+        whole application (see ``get_app_fingerprint()``).
+
+        Fingerprint is computed only once for each target during a build.
+
+        Arguments:
+            target (BuildTarget): Target to compute fingerprint for.
+
+        Returns:
+            string: The fingerprint.
+        """
+        key = self.get_target_key(target)
+
+        if key not in self._inputs_fingerprints:
+            self._inputs_fingerprints[key] = self.manifest.fingerprint(
+                *self.get_target_inputs(target),
+                self.get_app_fingerprint(target.app),
+            )
+
+        return self._inputs_fingerprints[key]
+
+    def resolve_reference(self, reference):
+        """
+        Find a registry object from its reference.
+
+        Arguments:
+            reference (list): Object reference as described in
+                ``django_willpower.core.attributes``.
+
+        Returns:
+            object: The registry object.
+        """
+        def find(items, attribute, value):
+            for item in items:
+                if getattr(item, attribute) == value:
+                    return item
+            raise LookupError(":".join(reference))
+
+        kind, appname, *codes = reference
+        app = self.registry.apps[appname]
+
+        if kind == "app":
+            return app
+        elif kind in ("component", "module"):
+            component = find(app.components, "code", codes[0])
+            if kind == "component":
+                return component
+            return find(component.modules, "code", codes[1])
+
+        model = find(app.models, "name", codes[0])
+        if kind == "model":
+            return model
+        elif kind == "view":
+            return self.get_inventory_view(model)
+        elif kind == "field":
+            return find(model.modelfields, "name", codes[1])
+
+        raise LookupError(":".join(reference))
+
+    def get_attribute_signature(self, key):
+        """
+        Return the current signature of an attribute from its key.
+
+        Signatures are computed only once during a build.
+
+        Arguments:
+            key (string): Attribute key.
+
+        Returns:
+            object: Attribute signature. The signature of the whole object attribute
+            ``*`` is the object serialized with its ``as_dict()`` method.
+        """
+        if key not in self._attribute_signatures:
+            *reference, name = key.split(":")
+            obj = self.resolve_reference(reference)
+
+            if name == WHOLE_OBJECT:
+                if reference[0] == "view":
+                    obj = obj.model
+                self._attribute_signatures[key] = obj.as_dict()
+            else:
+                self._attribute_signatures[key] = get_signature(getattr(obj, name))
+
+        return self._attribute_signatures[key]
+
+    def get_attributes_hash(self, target, keys):
+        """
+        Compute the hash of attributes which a target depends on.
+
+        Arguments:
+            target (BuildTarget): The target.
+            keys (iterable): Attribute keys. If ``None``, target depends on all its
+                inputs.
+
+        Returns:
+            string: The hash.
+        """
+        if keys is None:
+            return self.get_target_inputs_fingerprint(target)
+
+        return self.manifest.fingerprint({
+            key: self.get_attribute_signature(key)
+            for key in keys
+        })
+
+    def get_render_key(self, target):
+        """
+        Compute the key of a target in render cache.
+
+        Key is computed from the Willpower version, the template name, the target
+        inputs and the whole application fingerprint (see ``get_app_fingerprint()``)
+        without the application template directory, so the same application stack
+        from another location shares the same keys. Accessed attributes are not
+        recorded for a cached render so any change in application invalidates it.
+
+        Arguments:
+            target (BuildTarget): Target to compute key for.
+
+        Returns:
+            string: The key.
+        """
+        return self.manifest.fingerprint(
+            __version__,
+            target.template,
+            self.get_app_fingerprint(target.app),
+            *self.get_target_inputs(target)[1:],
+        )
+
+    def render_cached_target(self, target):
+        """
+        Get a build target from render cache or render it and store it in cache.
+
+        Arguments:
+            target (BuildTarget): Target to render.
+
+        Returns:
+            tuple: The rendered template and a boolean which is True if it has been
+            got from cache.
+        """
+        key = self.get_render_key(target)
+
+        def template_hash(name):
+            return self.get_template_hash(target.app, name)
+
+        found = self.render_cache.get(key, template_hash)
+        if found:
+            content, target.dependencies = found
+            # Accessed attributes are unknown, target depends on all its inputs
+            target.attributes = None
+            return content.decode("utf-8"), True
+
+        content = self.render_target(target)
+        self.render_cache.set(
+            key,
+            {name: template_hash(name) for name in sorted(target.dependencies)},
+            content.encode("utf-8"),
+        )
+
+        return content, False
+
+    def get_template_filepath(self, app, name):
+        """
+        Return the file path of an application template.
+
+        Arguments:
+            app (Application): Application to get template from.
+            name (string): Template name.
+
+        Returns:
+            pathlib.Path: The template file path.
+        """
+        jinja_env = self.get_app_environment(app)
+
+        for searchpath in jinja_env.loader.loader.searchpath:
+            filepath = Path(searchpath).joinpath(*split_template_path(name))
+            if filepath.is_file():
+                return filepath
+
+        raise TemplateNotFound(name)
+
+    def get_template_hash(self, app, name):
+        """
+        Return the source hash of an application template.
+
+        Hashes are computed once for each template directory and template name from
+        the template file bytes, so it works either for a text template or a binary
+        file to copy.
+
+        Arguments:
+            app (Application): Application to get template from.
+            name (string): Template name.
+
+        Returns:
+            string: The source hash or ``None`` if template does not exist.
+        """
+        key = (app.template_dir, name)
+
+        if key not in self._template_hashes:
+            try:
+                filepath = self.get_template_filepath(app, name)
+            except TemplateNotFound:
+                self._template_hashes[key] = None
+            else:
+                self._template_hashes[key] = self.manifest.source_hash(
+                    filepath.read_bytes()
+                )
+
+        return self._template_hashes[key]
+
+    def is_target_unchanged(self, target):
+        """
+        Check from manifest if a target inputs have changed since its last build.
+
+        Computed fingerprint is kept to be recorded once the target has been written.
+
+        Arguments:
+            target (BuildTarget): Target to check.
+
+        Returns:
+            boolean: True if target does not need to be built again.
+        """
+        if not target.destination.is_relative_to(self.projectdir):
+            return False
+
+        key = self.get_target_key(target)
+        try:
+            fingerprint = self.get_target_fingerprint(target)
+        except Exception:
+            # Let the render raise the right error
+            return False
+
+        self._fingerprints[key] = fingerprint
+
+        return self.manifest.is_unchanged(
+            key,
+            fingerprint,
+            target.destination,
+            lambda name: self.get_template_hash(target.app, name),
+            attributes_hash=lambda keys: self.get_attributes_hash(target, keys),
+        )
+
+    def copy_target(self, target):
+        """
+        Copy a build target template file to its destination without rendering it.
+
+        Arguments:
+            target (BuildTarget): Target to copy.
+
+        Returns:
+            pathlib.Path: The written file path.
+        """
+        self.logger.debug("      └── {} (copy): {}".format(
+            target.get_path(),
+            target.destination
+        ))
+
+        try:
+            source = self.get_template_filepath(target.app, target.template)
+        except TemplateNotFound as e:
+            msg = "Unable to copy '{}': {}: {}"
+            raise ProjectBuildError(
+                msg.format(target.get_path(), e.__class__.__name__, e)
+            ) from e
+
+        target.dependencies = {target.template}
+        # A copied file does not depend on any attribute
+        target.attributes = set()
+        self.commit_write(
+            target,
+            "copied",
+            self.sink.copy,
+            target.destination,
+            source,
+            size=source.stat().st_size if self.profiler else None,
+            # A copy has the same content than its template
+            content_hash=(
+                self.get_template_hash(target.app, target.template)
+                if self.is_journaling() else None
+            ),
+        )
+
+        return target.destination
+
+    def is_journaling(self):
+        """
+        Return True if a journal is opened for the running build.
+        """
+        return bool(self.journal and self.journal.plan)
+
+    def record_target(self, target, content_hash=None):
+        """
+        Record a written target in manifest if incremental mode is enabled and in
+        journal if it is enabled.
+
+        Arguments:
+            target (BuildTarget): Written target.
+
+        Keyword Arguments:
+            content_hash (string): Hash of the written content for the journal.
+        """
+        if self.is_journaling():
+            self.journal.record(
+                self.get_target_key(target),
+                target.get_path(),
+                self.get_target_inputs_fingerprint(target),
+                self.sink.locate(target.destination),
+                templates={
+                    name: self.get_template_hash(target.app, name)
+                    for name in sorted(target.dependencies)
+                },
+                content_hash=content_hash,
+            )
+
+        if self.incremental:
+            key = self.get_target_key(target)
+            keys = None if target.attributes is None else sorted(target.attributes)
+            self.manifest.record(
+                key,
+                self._fingerprints[key],
+                self.sink.locate(target.destination),
+                templates={
+                    name: self.get_template_hash(target.app, name)
+                    for name in sorted(target.dependencies)
+                },
+                attributes={
+                    "keys": keys,
+                    "hash": self.get_attributes_hash(target, keys),
+                },
+            )
+
+    def write_target(self, target, content, cached=False, content_hash=None):
+        """
+        Write rendered target content to its destination.
+
+        Arguments:
+            target (BuildTarget): Target to write.
+            content (object): Rendered target content, either a string, an iterable
+                of string chunks to stream or the ``pathlib.Path`` of a temporary
+                file where target has already been rendered.
+
+        Keyword Arguments:
+            cached (boolean): Whether content has been got from render cache instead
+                of being rendered.
+            content_hash (string): Hash of a temporary file content when it has been
+                computed while rendering it.
+
+        Returns:
+            pathlib.Path: The written file path.
+        """
+        self.logger.debug("      └── {}: {}".format(
+            target.get_path(),
+            target.destination
+        ))
+
+        stat = "cached" if cached else "rendered"
+
+        journaling = self.is_journaling()
+
+        if isinstance(content, str):
+            data = content.encode("utf-8")
+            self.commit_write(
+                target,
+                stat,
+                self.sink.write,
+                target.destination,
+                data,
+                size=len(data),
+                content_hash=BuildJournal.data_hash(data) if journaling else None,
+            )
+        elif isinstance(content, Path):
+            # Never queued so a temporary file is not left behind by a failed build
+            self.commit_write(
+                target,
+                stat,
+                self.sink.commit_temporary,
+                target.destination,
+                content,
+                defer=False,
+                size=content.stat().st_size if self.profiler else None,
+                content_hash=content_hash,
+            )
+        else:
+            size = None
+            if self.profiler:
+                content, size = self.count_chunks(content)
+            if journaling:
+                content, content_hash = BuildJournal.hash_chunks(content)
+
+            # Chunks are rendered while they are written
+            self.commit_write(
+                target,
+                stat,
+                self.sink.stream,
+                target.destination,
+                content,
+                defer=False,
+                size=size,
+                content_hash=content_hash,
+            )
+
+        return target.destination
+
+    def count_chunks(self, chunks):
+        """
+        Count the bytes of streamed chunks.
+
+        Arguments:
+            chunks (iterable): Strings to stream.
+
+        Returns:
+            tuple: A generator of the same chunks and a function which returns the
+            number of bytes of the chunks generated so far.
+        """
+        counter = [0]
+
+        def generate():
+            for chunk in chunks:
+                counter[0] += len(chunk.encode("utf-8"))
+                yield chunk
+
+        return generate(), lambda: counter[0]
+
+    def build_target(self, target):
+        """
+        Render a build target and write it to its destination.
+
+        Arguments:
+            target (BuildTarget): Target to build.
+
+        Returns:
+            pathlib.Path: The written file path.
+        """
+        if target.module.copy_without_render:
+            return self.copy_target(target)
+
+        clock = get_clock()
+        cached = False
+
+        if self.render_cache:
+            content, cached = self.render_cached_target(target)
+        elif self.streaming:
+            content = self.generate_target(target)
+        else:
+            content = self.render_target(target)
+
+        if self.profiler:
+            self.profile_target(target, "render", get_elapsed(clock))
+
+        return self.write_target(target, content, cached=cached)
+
+    def process_parallel(self, targets, indexes, names=None):
+        """
+        Render targets from a process pool and write them from the current process.
+
+        Targets are submitted from the most to the least costly. On the first error
+        all pending targets are cancelled and the error is raised.
+
+        Arguments:
+            targets (list): ``BuildTarget`` objects as returned by ``get_targets()``
+                for the same application ``names``.
+            indexes (list): Indexes of targets to build.
+
+        Keyword Arguments:
+            names (list): Application codes that targets have been expanded from.
+        """
+        ordered = sorted(
+            indexes,
+            key=lambda index: targets[index].cost,
+            reverse=True
+        )
+
+        executor = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_worker,
+            initargs=(
+                self.registry,
+                self.projectdir,
+                names,
+                {
+                    "incremental": self.incremental,
+                    "track_attributes": self.track_attributes,
+                    "streaming": self.streaming and self.sink.supports_temporary,
+                    "bytecode_cache": self.bytecode_cache,
+                    "render_cache": self.render_cache,
+                    "journal": self.is_journaling(),
+                    "template_profiler": (
+                        TemplateProfiler() if self.template_profiler else None
+                    ),
+                },
+            ),
+        )
+        futures = [executor.submit(_render_job, index) for index in ordered]
+        consumed = set()
+
+        try:
+            pending = set(futures)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_EXCEPTION)
+
+                for future in done:
+                    consumed.add(future)
+                    (
+                        index, rendered, dependencies, attributes, cached, elapsed,
+                        stacks, content_hash,
+                    ) = future.result()
+                    targets[index].dependencies = dependencies
+                    targets[index].attributes = attributes
+                    if self.template_profiler:
+                        self.template_profiler.merge(stacks)
+                    if self.profiler:
+                        self.profile_target(targets[index], "render", elapsed)
+                    self.write_target(
+                        targets[index],
+                        rendered,
+                        cached=cached,
+                        content_hash=content_hash,
+                    )
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+            # Remove temporary files from streamed targets left uncommitted
+            for future in futures:
+                if (
+                    future not in consumed and
+                    not future.cancelled() and
+                    future.exception() is None
+                ):
+                    rendered = future.result()[1]
+                    if isinstance(rendered, Path):
+                        rendered.unlink(missing_ok=True)
+
+    def get_plan_fingerprint(self, plan):
+        """
+        Compute fingerprint of the targets selected in a plan, so a journal is only
+        resumed for the same targets.
+
+        Arguments:
+            plan (BuildPlan): The build plan.
+
+        Returns:
+            string: The fingerprint.
+        """
+        return self.manifest.fingerprint(sorted([
+            plan.targets[index].get_path()
+            for index in plan.selected
+        ]))
+
+    def resume_plan(self, plan):
+        """
+        Mark as skipped the targets that an interrupted build has completed.
+
+        Journal entries are only kept for the targets which inputs, templates and
+        written file are unchanged since they have been recorded.
+
+        Arguments:
+            plan (BuildPlan): The build plan.
+
+        Raises:
+            ProjectBuildError: If journal is disabled or has been written for another
+            plan.
+
+        Returns:
+            dict: Valid journal entries indexed on output relative path.
+        """
+        if self.journal is None:
+            raise ProjectBuildError(
+                "Resume is only available with a filesystem sink and without staged "
+                "build."
+            )
+
+        if not self.journal.exists():
+            self.logger.info("No build journal to resume from, building everything")
+            return {}
+
+        self.journal.load()
+        if self.journal.plan != self.get_plan_fingerprint(plan):
+            raise ProjectBuildError(
+                "Build journal does not match the current plan, it can not be "
+                "resumed: {}".format(self.journal.path)
+            )
+
+        completed = {}
+        for index in plan.pending:
+            target = plan.targets[index]
+            key = self.get_target_key(target)
+
+            if self.journal.is_completed(
+                key,
+                self.get_target_inputs_fingerprint(target),
+                self.sink.locate(target.destination),
+                lambda name: self.get_template_hash(target.app, name),
+            ):
+                plan.skipped.add(index)
+                completed[key] = self.journal.entries[key]
+            elif key in self.journal.entries:
+                self.logger.debug("      └── {}: changed since journal".format(
+                    target.get_path()
+                ))
+
+        self.logger.info("Resuming build with {} completed targets".format(
+            len(completed)
+        ))
+
+        return completed
+
+    def get_queries(self, only):
+        """
+        Compile stack queries.
+
+        Arguments:
+            only (list): Queries as strings or ``StackQuery`` objects.
+
+        Returns:
+            list: ``StackQuery`` objects.
+        """
+        queries = []
+
+        for query in only:
+            if not isinstance(query, StackQuery):
+                try:
+                    query = StackQuery(query)
+                except ValueError as e:
+                    raise ProjectBuildError(str(e)) from e
+            queries.append(query)
+
+        return queries
+
+    def plan(self, names=None, only=None, shard=None):
+        """
+        Expand applications into a build plan without rendering anything.
+
+        Planning fails if a component has duplicate module codes or if targets
+        resolve to the same destination. With incremental mode enabled, the manifest
+        is loaded to mark the targets which would be skipped as unchanged.
+
+        Keyword Arguments:
+            names (list): Application codes to plan. If empty, all registered
+                applications are planned.
+            only (list): Stack queries (see ``StackQuery``) to select the targets to
+                build, the other targets are excluded from the plan. Only the
+                applications matched by queries are expanded. If empty, every targets
+                are built.
+            shard (tuple): Shard number (starting from ``1``) and shard count. The
+                selected targets are divided between shards with ``partition()`` and
+                the targets of other shards are excluded from the plan. If empty,
+                every selected targets are built.
+
+        Raises:
+            ProjectBuildError: If shard number is not between ``1`` and shard count.
+
+        Returns:
+            BuildPlan: The build plan.
+        """
+        self._fingerprints = {}
+        self._template_hashes = {}
+        self._inventory_views = {}
+        self._attribute_signatures = {}
+        self._serialized = {}
+        self._inputs_fingerprints = {}
+        self._app_fingerprints = {}
+
+        for registry in self._field_renderers.values():
+            registry.clear()
+
+        queries = self.get_queries(only or [])
+        if queries and not names:
+            names = [
+                code
+                for code in self.registry.apps
+                if any(query.apps.match(code) for query in queries)
+            ]
+            if not names:
+                return BuildPlan(projectdir=self.projectdir, targets=[], names=[])
+
+        targets = self.get_targets(names=names)
+
+        plan = BuildPlan(
+            projectdir=self.projectdir,
+            targets=targets,
+            names=names,
+            destinations=self.get_destinations(targets),
+        )
+
+        if queries:
+            plan.select(queries)
+
+        if shard:
+            try:
+                plan.select_shard(*shard)
+            except ValueError as e:
+                raise ProjectBuildError(str(e)) from e
+
+        if self.incremental:
+            self.manifest.load()
+            for index in plan.pending:
+                if self.is_target_unchanged(plan.targets[index]):
+                    plan.skipped.add(index)
+
+        return plan
+
+    def process(self, names=None, plan=None, only=None, shard=None, resume=False):
+        """
+        Create all application components with their modules.
+
+        Keyword Arguments:
+            names (list): Application codes to build. If empty, all registered
+                applications are built.
+            plan (BuildPlan): A plan previously returned by ``plan()`` to build
+                instead of planning again. When given, ``names``, ``only`` and
+                ``shard`` are ignored.
+            only (list): Stack queries to select the targets to build, see
+                ``plan()``.
+            shard (tuple): Shard number and shard count to build, see ``plan()``. A
+                shard manifest is written at root of the output so shard outputs can
+                be merged and verified with ``merge_shards()``.
+            resume (boolean): Resume an interrupted build from its journal, the
+                targets it has completed are skipped. See ``resume_plan()``.
+
+        Returns:
+            list: Built ``BuildTarget`` objects.
         """
-        names = names or self.registry.apps.keys()
         self.logger.debug("Processing into: {}".format(self.projectdir))
 
-        for appname in names:
-            app = self.registry.apps[appname]
-            self.logger.debug("- Application: {}".format(app.name))
+        self.stats = self.get_initial_stats()
+        with self.profile_phase("plan"):
+            plan = plan or self.plan(names=names, only=only, shard=shard)
+        names = plan.names
+        targets = plan.targets
 
-            # Load a new jinja env for each application since each one has its
-            # own template dir
-            jinja_env = self.get_jinja_environment(app.template_dir)
+        completed = {}
+        if resume:
+            with self.profile_phase("resume"):
+                completed = self.resume_plan(plan)
+        indexes = plan.pending
 
-            for component in app.components:
-                self.create_component(jinja_env, component)
+        for index in sorted(plan.skipped):
+            self.logger.debug("      └── {}: unchanged".format(
+                targets[index].get_path()
+            ))
+        self.stats["skipped"] = len(plan.skipped)
+
+        if self.writers > 0:
+            self._writer = WriteBehind(
+                self.writers if self.sink.supports_concurrent_writes else 1,
+                queue_size=self.write_queue_size,
+            )
+
+        try:
+            if self.preflight:
+                with self.profile_phase("preflight"):
+                    self._preflight.run(
+                        [targets[index] for index in indexes]
+                    )
+
+            with self.profile_phase("prepare"):
+                if self.journal:
+                    self.journal.open(self.get_plan_fingerprint(plan), completed)
+
+                self.sink.prepare([targets[index].destination for index in indexes])
+
+            self.build_targets(targets, indexes, names=names)
+
+            if self._writer:
+                with self.profile_phase("flush"):
+                    self._writer.flush()
+
+            if plan.shard:
+                self.sink.write(
+                    self.projectdir / SHARD_FILENAME,
+                    json.dumps(get_shard_manifest(plan), indent=4).encode("utf-8"),
+                )
+        except BaseException:
+            if self._writer:
+                self._writer.close(cancel=True)
+            self.sink.abort()
+            if self.journal:
+                self.journal.close()
+            raise
+        else:
+            with self.profile_phase("close"):
+                self.sink.close()
+                if self.journal:
+                    self.journal.close(remove=True)
+        finally:
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+
+            with self.profile_phase("finalize"):
+                # Record what have been built even if the build failed
+                if self.incremental:
+                    self.manifest.save()
+
+                if self.bytecode_cache and hasattr(self.bytecode_cache, "prune"):
+                    self.bytecode_cache.prune()
+
+                if self.render_cache:
+                    self.render_cache.prune()
+
+        return targets
+
+    def build_targets(self, targets, indexes, names=None):
+        """
+        Build targets either sequentially or from a process pool depending on
+        ``jobs``.
+
+        Arguments:
+            targets (list): ``BuildTarget`` objects as returned by ``get_targets()``
+                for the same application ``names``.
+            indexes (list): Indexes of targets to build.
+
+        Keyword Arguments:
+            names (list): Application codes that targets have been expanded from.
+        """
+        with self.profile_phase("render"):
+            if self.jobs > 1 and len(indexes) > 1:
+                # Copied targets are not rendered so they are not sent to workers
+                copies = [
+                    index
+                    for index in indexes
+                    if targets[index].module.copy_without_render
+                ]
+                renders = [index for index in indexes if index not in copies]
+
+                for index in copies:
+                    self.copy_target(targets[index])
+
+                self.logger.debug("- Rendering {} targets with {} jobs".format(
+                    len(renders),
+                    self.jobs
+                ))
+                self.process_parallel(targets, renders, names=names)
+            else:
+                for index in indexes:
+                    self.build_target(targets[index])
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+from jinja2 import BytecodeCache
+
+from .. import __pkgname__
+
+
+def get_user_cache_dir(name):
+    """
+    Return a directory path from the user cache directory.
+
+    User cache directory is either given from environment variable
+    ``XDG_CACHE_HOME`` or defaults to ``~/.cache``.
+
+    Arguments:
+        name (string): Directory name to get from the Willpower cache directory.
+
+    Returns:
+        pathlib.Path: The directory path, it may not exist yet.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+
+    return Path(base) / __pkgname__ / name
+
+
+class LRUDirectory:
+    """
+    A directory of cache files with a size limit where the least recently used files
+    are evicted first.
+
+    File access time is not reliable (many filesystems are mounted with ``noatime``)
+    so a cache file modification time is updated each time it is used.
+
+    Arguments:
+        directory (pathlib.Path): Directory where to store cache files. It is created
+            on need.
+
+    Keyword Arguments:
+        max_size (integer): Maximum size in bytes of all cache files. Default to
+            64MiB.
+        pattern (string): Glob pattern of cache files.
+    """
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, directory, max_size=None, pattern="*"):
+        self.directory = Path(directory)
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.pattern = pattern
+
+    def get_files(self):
+        """
+        Return all cache files with their stat result.
+
+        Returns:
+            list: Tuples of file path and ``os.stat_result``, ordered from the least
+            to the most recently used.
+        """
+        if not self.directory.exists():
+            return []
+
+        files = []
+        for path in self.directory.glob(self.pattern):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                # Removed from another process
+                continue
+
+        return sorted(files, key=lambda item: item[1].st_mtime)
+
+    def touch(self, path):
+        """
+        Mark a cache file as recently used.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def read(self, path):
+        """
+        Read a cache file and mark it as recently used.
+
+        Returns:
+            bytes: File content or ``None`` if it does not exist.
+        """
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        self.touch(path)
+
+        return content
+
+    def write(self, path, content):
+        """
+        Write a cache file atomically so concurrent processes never read a partial
+        file.
+        """
+        path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+        temporary = path.with_name(".{}.{}.tmp".format(path.name, uuid.uuid4().hex))
+        temporary.write_bytes(content)
+        os.replace(temporary, path)
+
+    def stats(self):
+        """
+        Return cache statistics.
+
+        Returns:
+            dict: Items ``files`` for the number of cache files, ``size`` for their
+            total size in bytes and ``max_size``.
+        """
+        files = self.get_files()
+
+        return {
+            "files": len(files),
+            "size": sum([stat.st_size for path, stat in files]),
+            "max_size": self.max_size,
+        }
+
+    def prune(self, max_size=None):
+        """
+        Remove least recently used files until cache size is under the size limit.
+
+        Keyword Arguments:
+            max_size (integer): Size limit to use instead of the cache one. ``0``
+                removes every cache files.
+
+        Returns:
+            integer: The number of removed files.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        files = self.get_files()
+        size = sum([stat.st_size for path, stat in files])
+        removed = 0
+
+        for path, stat in files:
+            if size <= max_size:
+                break
+
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+            removed += 1
+
+        return removed
+
+
+class FileBytecodeCache(BytecodeCache):
+    """
+    A persistent Jinja bytecode cache with a size limit.
+
+    Jinja computes a bucket key from template name and file path and checks the
+    bucket checksum against template source, so a changed template is compiled again.
+    Compiled bytecode also embeds the Python bytecode magic number so a cache can be
+    shared between Python versions.
+
+    Arguments:
+        directory (pathlib.Path): Directory where to store compiled templates.
+
+    Keyword Arguments:
+        max_size (integer): Maximum size in bytes of the cache directory, least
+            recently used templates are removed from ``prune()`` to respect it.
+    """
+    FILENAME = "__willpower_jinja_{}.cache"
+
+    def __init__(self, directory, max_size=None):
+        self.storage = LRUDirectory(
+            directory,
+            max_size=max_size,
+            pattern=self.FILENAME.format("*"),
+        )
+
+    @property
+    def directory(self):
+        return self.storage.directory
+
+    def get_bucket_path(self, bucket):
+        return self.storage.directory / self.FILENAME.format(bucket.key)
+
+    def load_bytecode(self, bucket):
+        content = self.storage.read(self.get_bucket_path(bucket))
+
+        if content is not None:
+            bucket.bytecode_from_string(content)
+
+    def dump_bytecode(self, bucket):
+        self.storage.write(self.get_bucket_path(bucket), bucket.bytecode_to_string())
+
+    def clear(self):
+        self.storage.prune(max_size=0)
+
+    def prune(self):
+        """
+        Remove least recently used templates to respect the size limit.
+
+        Returns:
+            integer: The number of removed templates.
+        """
+        return self.storage.prune()
+
+
+class RenderCache:
+    """
+    A persistent content addressed cache of rendered targets with a size limit.
+
+    A rendered target is indexed on a key computed from its render context and
+    template name. Since the templates loaded by a render are only known once it is
+    done, each key has an index file listing the known variants of the render, each
+    variant is the source hash of every loaded templates with the hash of its output.
+    Outputs are stored apart, addressed on the hash of the key and their template
+    sources, so a cache directory can be shared between projects, branches and
+    concurrent builds.
+
+    Arguments:
+        directory (pathlib.Path): Directory where to store cache files.
+
+    Keyword Arguments:
+        max_size (integer): Maximum size in bytes of the cache directory, least
+            recently used files are removed from ``prune()`` to respect it. Default to
+            256MiB.
+    """
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+    INDEX_SUFFIX = ".index"
+    OUTPUT_SUFFIX = ".output"
+    # Maximum number of template variants kept for a key
+    MAX_VARIANTS = 8
+
+    def __init__(self, directory, max_size=None):
+        self.storage = LRUDirectory(
+            directory,
+            max_size=max_size or self.DEFAULT_MAX_SIZE,
+            pattern="[0-9a-f]*",
+        )
+
+    @property
+    def directory(self):
+        return self.storage.directory
+
+    def get_output_digest(self, key, templates):
+        """
+        Return the address of an output from its key and template sources.
+        """
+        payload = json.dumps([key, templates], sort_keys=True)
+
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_variants(self, key):
+        """
+        Return the known variants of a key.
+
+        Returns:
+            list: Variants as dictionnaries with items ``templates`` and ``output``.
+        """
+        content = self.storage.read(self.directory / (key + self.INDEX_SUFFIX))
+
+        if content is None:
+            return []
+
+        try:
+            return json.loads(content)["variants"]
+        except (ValueError, KeyError):
+            return []
+
+    def get(self, key, template_hash):
+        """
+        Get a rendered output from cache.
+
+        Arguments:
+            key (string): Render key.
+            template_hash (callable): A function which returns the current source hash
+                of a template from its name, it is used to find the variant which
+                matches the current templates.
+
+        Returns:
+            tuple: The rendered output as bytes and the names of templates it has been
+            rendered from, or ``None`` if there is no output for the current
+            templates.
+        """
+        for variant in self.get_variants(key):
+            if all([
+                template_hash(name) == source_hash
+                for name, source_hash in variant["templates"].items()
+            ]):
+                content = self.storage.read(
+                    self.directory / (variant["output"] + self.OUTPUT_SUFFIX)
+                )
+                if content is None:
+                    return None
+
+                return content, set(variant["templates"].keys())
+
+        return None
+
+    def set(self, key, templates, content):
+        """
+        Store a rendered output in cache.
+
+        Arguments:
+            key (string): Render key.
+            templates (dict): Source hashes of templates loaded to render the output,
+                indexed on template name.
+            content (bytes): Rendered output.
+        """
+        digest = self.get_output_digest(key, templates)
+        self.storage.write(self.directory / (digest + self.OUTPUT_SUFFIX), content)
+
+        variants = [{"templates": templates, "output": digest}] + [
+            variant
+            for variant in self.get_variants(key)
+            if variant["output"] != digest
+        ]
+        self.storage.write(
+            self.directory / (key + self.INDEX_SUFFIX),
+            json.dumps({"variants": variants[:self.MAX_VARIANTS]}).encode("utf-8"),
+        )
+
+    def stats(self):
+        return self.storage.stats()
+
+    def prune(self, max_size=None):
+        """
+        Remove least recently used files to respect the size limit.
+
+        Keyword Arguments:
+            max_size (integer): Size limit to use instead of the cache one.
+
+        Returns:
+            integer: The number of removed files.
+        """
+        return self.storage.prune(max_size=max_size)
+
+    def clear(self):
+        self.storage.prune(max_size=0)
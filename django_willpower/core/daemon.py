@@ -0,0 +1,420 @@
+"""
+Build daemon serving build requests over a Unix socket.
+
+The protocol is made of JSON objects, one per line. A client sends a single request
+and receives a single response before the connection is closed. A request has an
+``action`` item and the items required by the action: ::
+
+    {"action": "build", "config": <CONFIG>, "basedir": <BASEDIR>, "options": {},
+     "only": [], "shard": [<NUMBER>, <COUNT>], "resume": false}
+    {"action": "plan", "config": <CONFIG>, "basedir": <BASEDIR>, "options": {},
+     "only": [], "shard": [<NUMBER>, <COUNT>]}
+    {"action": "render", "config": <CONFIG>, "path": <STACKPATH>, "model": <NAME>}
+    {"action": "ping"}
+    {"action": "shutdown"}
+
+Paths are absolute. Options are the keyword arguments for ``ProjectBuilder`` among
+``ProjectDaemon.BUILDER_OPTIONS``, except ``bytecode_cache`` and ``render_cache``
+which are cache directories (an empty ``bytecode_cache`` disables it, a missing one
+uses the daemon cache) and ``render_cache_size`` which is the render cache maximum
+size in bytes. ``only`` is an optional list of stack queries to
+select targets, ``shard`` an optional shard to build and ``resume`` whether to
+resume an interrupted build. A response has a ``status`` item which is either ``ok``
+with the action result or ``error`` with the exception ``error`` name and its
+``message``. The ``content`` of a rendered module is encoded in base64 with item
+``binary`` enabled when the module is a copied file.
+"""
+import base64
+import json
+import logging
+import os
+import socket
+import socketserver
+from pathlib import Path
+
+from ..exceptions import ProjectBuildError, ProjectValidationError
+from .. import __pkgname__, __version__
+from .builder import ProjectBuilder
+from .caches import FileBytecodeCache, RenderCache, get_user_cache_dir
+from .project import ProjectRegistry
+
+
+# Default socket path, shared by the daemon and its clients
+DEFAULT_SOCKET = get_user_cache_dir("daemon") / "willpower.sock"
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Read a request line, dispatch it to the daemon and write the response line.
+    """
+    def handle(self):
+        line = self.rfile.readline()
+
+        try:
+            request = json.loads(line)
+            response = self.server.daemon.dispatch(request)
+        except Exception as e:
+            response = {
+                "status": "error",
+                "error": e.__class__.__name__,
+                "message": str(e),
+            }
+
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class ProjectDaemon:
+    """
+    A long running process which keeps registries, builders and their Jinja
+    environments warm between requests.
+
+    Registries are indexed on their configuration file and loaded again only when one
+    of their source files has changed. Builders are indexed on configuration file,
+    project directory and options. Requests are handled one at a time.
+
+    Arguments:
+        socket_path (pathlib.Path): Path of the Unix socket to listen on.
+
+    Keyword Arguments:
+        bytecode_cache (jinja2.BytecodeCache): A bytecode cache shared by every
+            builders. Default is no cache.
+    """
+    # Builder options which can be given from a request
+    BUILDER_OPTIONS = (
+        "jobs",
+        "incremental",
+        "track_attributes",
+        "skip_identical",
+        "streaming",
+        "staged",
+        "render_cache",
+        "render_cache_size",
+        "bytecode_cache",
+        "preflight",
+        "writers",
+        "fsync",
+    )
+
+    def __init__(self, socket_path, bytecode_cache=None):
+        self.logger = logging.getLogger(__pkgname__)
+
+        self.socket_path = Path(socket_path)
+        self.bytecode_cache = bytecode_cache
+        self.server = None
+        self._running = False
+
+        # Registries and their sources signature indexed on configuration path
+        self._registries = {}
+        # Builders indexed on configuration path, project directory and options
+        self._builders = {}
+        # Render caches indexed on directory and maximum size
+        self._render_caches = {}
+        # Bytecode caches from requests indexed on directory
+        self._bytecode_caches = {}
+
+    def get_sources_signature(self, sources):
+        """
+        Return the modification time and size of registry source files.
+
+        Arguments:
+            sources (list): Source file paths.
+
+        Returns:
+            list: Tuples of path, modification time and size.
+        """
+        signature = []
+
+        for path in sources:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                signature.append((str(path), None, None))
+            else:
+                signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+
+        return signature
+
+    def get_registry(self, config):
+        """
+        Return the registry for a configuration file, loaded again only if one of its
+        sources has changed.
+
+        Arguments:
+            config (pathlib.Path): Configuration file path.
+
+        Returns:
+            tuple: The registry and a boolean which is True if it has been loaded
+            for this call.
+        """
+        cached = self._registries.get(config)
+        if cached:
+            registry, signature = cached
+            if self.get_sources_signature(registry.sources) == signature:
+                return registry, False
+
+        registry = ProjectRegistry()
+        registry.load_configuration(config)
+        self._registries[config] = (
+            registry,
+            self.get_sources_signature(registry.sources),
+        )
+
+        return registry, True
+
+    def get_builder(self, config, basedir, options):
+        """
+        Return a warm builder for a configuration, project directory and options.
+
+        Arguments:
+            config (pathlib.Path): Configuration file path.
+            basedir (pathlib.Path): Project directory.
+            options (dict): Builder options.
+
+        Returns:
+            ProjectBuilder: The builder, its registry is the current one.
+        """
+        unknown = set(options) - set(self.BUILDER_OPTIONS)
+        if unknown:
+            raise ProjectBuildError(
+                "Unknown builder options: {}".format(", ".join(sorted(unknown)))
+            )
+
+        registry, loaded = self.get_registry(config)
+        key = (config, basedir, json.dumps(options, sort_keys=True))
+
+        options = dict(options)
+        max_size = options.pop("render_cache_size", None)
+        if options.get("render_cache"):
+            cache_key = (Path(options["render_cache"]), max_size)
+            if cache_key not in self._render_caches:
+                self._render_caches[cache_key] = RenderCache(
+                    cache_key[0],
+                    max_size=max_size,
+                )
+            options["render_cache"] = self._render_caches[cache_key]
+
+        if "bytecode_cache" not in options:
+            options["bytecode_cache"] = self.bytecode_cache
+        elif options["bytecode_cache"]:
+            directory = Path(options["bytecode_cache"])
+            if directory not in self._bytecode_caches:
+                self._bytecode_caches[directory] = FileBytecodeCache(directory)
+            options["bytecode_cache"] = self._bytecode_caches[directory]
+        else:
+            options["bytecode_cache"] = None
+
+        builder = self._builders.get(key)
+        if builder is None or (loaded and options.get("staged")):
+            # Staged sink is initialized from registry applications
+            builder = ProjectBuilder(registry, basedir, **options)
+            self._builders[key] = builder
+        else:
+            builder.registry = registry
+
+        return builder
+
+    def action_ping(self, request):
+        return {"version": __version__, "pid": os.getpid()}
+
+    def action_build(self, request):
+        builder = self.get_builder(
+            Path(request["config"]).resolve(),
+            Path(request["basedir"]).resolve(),
+            request.get("options", {}),
+        )
+        builder.process(
+            only=request.get("only"),
+            shard=request.get("shard"),
+            resume=request.get("resume", False),
+        )
+
+        return {"stats": builder.stats}
+
+    def action_plan(self, request):
+        builder = self.get_builder(
+            Path(request["config"]).resolve(),
+            Path(request["basedir"]).resolve(),
+            request.get("options", {}),
+        )
+
+        plan = builder.plan(only=request.get("only"), shard=request.get("shard"))
+
+        return {"plan": plan.as_dict()}
+
+    def action_render(self, request):
+        builder = self.get_builder(
+            Path(request["config"]).resolve(),
+            Path(request.get("basedir") or ".").resolve(),
+            {},
+        )
+
+        content = builder.render_module(request["path"], model=request.get("model"))
+
+        if isinstance(content, bytes):
+            return {
+                "content": base64.b64encode(content).decode("ascii"),
+                "binary": True,
+            }
+
+        return {"content": content, "binary": False}
+
+    def action_shutdown(self, request):
+        self._running = False
+
+        return {}
+
+    def dispatch(self, request):
+        """
+        Execute a request.
+
+        Arguments:
+            request (dict): The request payload.
+
+        Returns:
+            dict: The response payload.
+        """
+        action = getattr(self, "action_{}".format(request.get("action")), None)
+        if action is None:
+            raise ValueError("Unknown action: {}".format(request.get("action")))
+
+        self.logger.debug("Request: {}".format(request))
+
+        response = action(request)
+        response["status"] = "ok"
+
+        return response
+
+    def serve(self):
+        """
+        Listen on socket and serve requests until a shutdown request.
+
+        A socket file left from a daemon which is not running anymore is removed.
+        """
+        if self.socket_path.exists():
+            if DaemonClient(self.socket_path).is_running():
+                raise ProjectBuildError(
+                    "A daemon is already running on: {}".format(self.socket_path)
+                )
+            self.socket_path.unlink()
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.server = socketserver.UnixStreamServer(
+            str(self.socket_path),
+            DaemonRequestHandler,
+        )
+        self.server.daemon = self
+        self._running = True
+
+        try:
+            while self._running:
+                self.server.handle_request()
+        finally:
+            self.server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+
+
+class DaemonClient:
+    """
+    Send requests to a running ``ProjectDaemon``.
+
+    Arguments:
+        socket_path (pathlib.Path): Path of the daemon Unix socket.
+
+    Keyword Arguments:
+        timeout (float): Seconds to wait for a response. Default is no timeout since
+            a build may be long. It is not used for pings.
+    """
+    # Exceptions which are raised again from an error response
+    EXCEPTIONS = {
+        "ProjectBuildError": ProjectBuildError,
+        "ProjectValidationError": ProjectValidationError,
+    }
+
+    # Seconds to wait for a ping response, a busy daemon is considered as not running
+    PING_TIMEOUT = 2
+
+    def __init__(self, socket_path, timeout=None):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+
+    def request(self, action, **payload):
+        """
+        Send a request and return its response.
+
+        Arguments:
+            action (string): Action name.
+            **payload: Request items.
+
+        Raises:
+            ConnectionError: If the daemon can not be reached.
+
+        Returns:
+            dict: The response payload. An error response is raised with the same
+            exception class than in daemon for Willpower errors or else as a
+            ``ProjectBuildError``.
+        """
+        payload["action"] = action
+
+        return self.send(payload, timeout=self.timeout)
+
+    def send(self, payload, timeout=None):
+        """
+        Send a request payload and return its response, see ``request()``.
+
+        Arguments:
+            payload (dict): Request payload with its action.
+
+        Keyword Arguments:
+            timeout (float): Seconds to wait for a response. Default is no timeout.
+
+        Raises:
+            ConnectionError: If the daemon can not be reached.
+            TimeoutError: If the daemon has not answered in time.
+
+        Returns:
+            dict: The response payload.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            try:
+                connection.connect(str(self.socket_path))
+            except (FileNotFoundError, OSError) as e:
+                raise ConnectionError(
+                    "Unable to reach daemon on {}: {}".format(self.socket_path, e)
+                ) from e
+
+            connection.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+
+            with connection.makefile("rb") as stream:
+                line = stream.readline()
+
+        if not line:
+            raise ConnectionError("Daemon closed connection without response")
+
+        response = json.loads(line)
+
+        if response.get("status") != "ok":
+            exception = self.EXCEPTIONS.get(response.get("error"), ProjectBuildError)
+            raise exception(response.get("message"))
+
+        return response
+
+    def ping(self):
+        """
+        Ping the daemon without waiting more than ``PING_TIMEOUT``.
+
+        Returns:
+            dict: The ping response with the daemon ``version`` and ``pid``, or
+            ``None`` if no daemon has answered in time.
+        """
+        try:
+            return self.send({"action": "ping"}, timeout=self.PING_TIMEOUT)
+        except (ConnectionError, TimeoutError):
+            return None
+
+    def is_running(self):
+        """
+        Return True if a daemon answers on socket.
+        """
+        return self.ping() is not None
@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
+
+
+# Field kinds which are relations to another model
+RELATION_KINDS = ("ForeignKey", "ManyToManyField", "OneToOneField")
+
+
+@dataclass(frozen=True)
+class InventoryView:
+    """
+    Immutable view of a model inventory with facts precomputed for templates.
+
+    A view is computed once for each model in a build and given to every templates
+    rendered for this model, so templates do not have to loop over model fields again
+    and again to find them.
+
+    Arguments:
+        model (DataModel): The model this view has been computed from.
+        fields (tuple): All model fields.
+        fields_by_kind (mappingproxy): Tuples of fields indexed on their kind, in the
+            order of their first appearance.
+        relation_fields (tuple): Fields which are relation to another model.
+        choice_fields (tuple): Fields with a list of choices.
+        auto_update_fields (tuple): Fields to update with current date on save.
+        required_fields (tuple): Required fields.
+        targets (mappingproxy): Resolved relation targets indexed on field name, with
+            the pattern ``{appname}`` replaced by the model application code and in
+            lowercase.
+        imports (mappingproxy): Tuples of names to import in the model module
+            indexed on the module to import them from, as needed by the model fields:
+            ``timezone`` for fields with an automatic date, value validators and
+            choice functions from the ``..choices`` module.
+    """
+    model: Any
+    fields: tuple
+    fields_by_kind: MappingProxyType
+    relation_fields: tuple
+    choice_fields: tuple
+    auto_update_fields: tuple
+    required_fields: tuple
+    targets: MappingProxyType
+    imports: MappingProxyType
+
+    @property
+    def name(self):
+        return self.model.name
+
+    @property
+    def kinds(self):
+        """
+        Tuple of field kinds used by the model.
+        """
+        return tuple(self.fields_by_kind.keys())
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Compute an inventory view from a model.
+
+        Arguments:
+            model (DataModel): The model to compute view from.
+
+        Returns:
+            InventoryView: The view.
+        """
+        fields = tuple(model.modelfields)
+        appname = model.app.code if model.app else ""
+
+        fields_by_kind = {}
+        for item in fields:
+            fields_by_kind.setdefault(item.kind, []).append(item)
+
+        relation_fields = tuple([
+            item for item in fields
+            if item.kind in RELATION_KINDS
+        ])
+        choice_fields = tuple([item for item in fields if item.choices_list])
+        auto_update_fields = tuple([item for item in fields if item.auto_update])
+
+        return cls(
+            model=model,
+            fields=fields,
+            fields_by_kind=MappingProxyType({
+                kind: tuple(items)
+                for kind, items in fields_by_kind.items()
+            }),
+            relation_fields=relation_fields,
+            choice_fields=choice_fields,
+            auto_update_fields=auto_update_fields,
+            required_fields=tuple([item for item in fields if item.required]),
+            targets=MappingProxyType({
+                item.name: item.target.format(appname=appname).lower()
+                for item in relation_fields
+                if item.target
+            }),
+            imports=MappingProxyType(
+                cls.get_imports(fields, choice_fields, auto_update_fields)
+            ),
+        )
+
+    @staticmethod
+    def get_imports(fields, choice_fields, auto_update_fields):
+        """
+        Compute the names to import in a model module for its fields.
+
+        Arguments:
+            fields (tuple): All model fields.
+            choice_fields (tuple): Fields with a list of choices.
+            auto_update_fields (tuple): Fields to update with current date on save.
+
+        Returns:
+            dict: Tuples of names indexed on the module to import them from.
+        """
+        imports = {}
+
+        if auto_update_fields or any([
+            item.auto_creation for item in fields
+            if item.kind == "DateTimeField"
+        ]):
+            imports["django.utils"] = ("timezone",)
+
+        validators = []
+        if any([item.min_value for item in fields]):
+            validators.append("MinValueValidator")
+        if any([item.max_value for item in fields]):
+            validators.append("MaxValueValidator")
+        if validators:
+            imports["django.core.validators"] = tuple(validators)
+
+        if choice_fields:
+            imports["..choices"] = tuple([
+                name.format(item.name)
+                for item in choice_fields
+                for name in ("get_{}_choices", "get_{}_default")
+            ])
+
+        return imports
@@ -0,0 +1,241 @@
+import hashlib
+import json
+
+from .. import __version__
+
+
+class BuildJournal:
+    """
+    Journal of the targets completed by a running build, so an interrupted build can
+    be resumed without building again what has already been written.
+
+    The journal is a JSON lines file stored in the project directory. Its first line
+    is a header with the Willpower version and the fingerprint of the planned
+    targets, each following line is a completed target appended and flushed as soon
+    as it has been written. The file is removed once the build is finished, so a
+    journal only exists after a failed or interrupted build.
+
+    Arguments:
+        path (pathlib.Path): Path to the journal file. It does not have to exist yet.
+
+    Attributes:
+        entries (dict): Completed targets indexed on output relative path, each entry
+            is a dictionnary with item ``target`` for the target stack path,
+            ``inputs`` for the fingerprint of target inputs, ``templates`` for the
+            source hash of every templates loaded to render it and ``hash`` for the
+            hash of the written file content.
+    """
+    FILENAME = ".willpower-journal.jsonl"
+
+    # Size of chunks read to hash a file
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.plan = None
+        self.entries = {}
+        self._file = None
+
+    @classmethod
+    def file_hash(cls, path):
+        """
+        Compute the hash of a file content.
+
+        Arguments:
+            path (pathlib.Path): File path.
+
+        Returns:
+            string: SHA256 hexadecimal digest or ``None`` if file does not exist.
+        """
+        digest = hashlib.sha256()
+
+        try:
+            with path.open("rb") as fp:
+                for chunk in iter(lambda: fp.read(cls.CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def data_hash(data):
+        """
+        Compute the hash of a content, it is the same than the hash of a file with
+        this content.
+
+        Arguments:
+            data (bytes): Content.
+
+        Returns:
+            string: SHA256 hexadecimal digest.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def hash_chunks(chunks):
+        """
+        Compute the hash of a content from its chunks while they are consumed.
+
+        Arguments:
+            chunks (iterable): Strings of the content.
+
+        Returns:
+            tuple: A generator of the same chunks and a function which returns the
+            hash of the chunks generated so far.
+        """
+        digest = hashlib.sha256()
+
+        def generate():
+            for chunk in chunks:
+                digest.update(chunk.encode("utf-8"))
+                yield chunk
+
+        return generate(), digest.hexdigest
+
+    def exists(self):
+        """
+        Return True if a journal has been left by a previous build.
+        """
+        return self.path.exists()
+
+    def load(self):
+        """
+        Load plan fingerprint and entries from journal file if it exists and has been
+        written from the same Willpower version.
+
+        A line which can not be decoded, like the last line from a build killed while
+        writing it, is ignored. When a target has many entries the last one wins.
+
+        Returns:
+            BuildJournal: Return itself for chaining.
+        """
+        self.plan = None
+        self.entries = {}
+
+        if not self.path.exists():
+            return self
+
+        with self.path.open("r") as fp:
+            lines = fp.read().splitlines()
+
+        header = {}
+        for number, line in enumerate(lines):
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            if number == 0:
+                header = payload
+                if header.get("version") != __version__:
+                    return self
+                self.plan = header.get("plan")
+            elif self.plan and isinstance(payload, dict) and "key" in payload:
+                self.entries[payload.pop("key")] = payload
+
+        return self
+
+    def is_completed(self, key, inputs, path, template_hash):
+        """
+        Check if a journal entry is still valid for a target.
+
+        Arguments:
+            key (string): Output relative path.
+            inputs (string): Current fingerprint of target inputs.
+            path (pathlib.Path): Output file path.
+            template_hash (callable): A function which takes a template name and
+                return its current source hash or ``None`` if template does not
+                exist anymore.
+
+        Returns:
+            boolean: True if target has an entry with the same inputs fingerprint,
+            every recorded templates are unchanged and output file still has the
+            recorded content.
+        """
+        entry = self.entries.get(key)
+
+        if not entry or entry.get("inputs") != inputs:
+            return False
+
+        for name, recorded in entry.get("templates", {}).items():
+            if template_hash(name) != recorded:
+                return False
+
+        return self.file_hash(path) == entry.get("hash")
+
+    def open(self, plan, entries=None):
+        """
+        Start a new journal file for a plan.
+
+        Arguments:
+            plan (string): Fingerprint of the planned targets.
+
+        Keyword Arguments:
+            entries (dict): Entries from a previous journal to keep, commonly the ones
+                which are still valid when resuming a build.
+        """
+        self.close()
+
+        self.plan = plan
+        self.entries = {}
+
+        self.path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+        self._file = self.path.open("w")
+        self._file.write(
+            json.dumps({"version": __version__, "plan": plan}, sort_keys=True) + "\n"
+        )
+
+        for key, entry in sorted((entries or {}).items()):
+            self.append(key, entry)
+
+        self._file.flush()
+
+    def append(self, key, entry):
+        """
+        Append an entry to journal file.
+        """
+        self.entries[key] = entry
+        self._file.write(json.dumps(dict(entry, key=key), sort_keys=True) + "\n")
+
+    def record(self, key, target, inputs, path, templates=None, content_hash=None):
+        """
+        Record a completed target once it has been written. Entry is flushed right
+        away so it survives to the build process.
+
+        Arguments:
+            key (string): Output relative path.
+            target (string): Target stack path.
+            inputs (string): Fingerprint of target inputs.
+            path (pathlib.Path): Written output file path.
+
+        Keyword Arguments:
+            templates (dict): Source hash of every templates loaded to render output,
+                indexed on template name.
+            content_hash (string): Hash of the written content when it is already
+                known, so the file is not read again. Default is to compute it from
+                the file.
+        """
+        self.append(key, {
+            "target": target,
+            "inputs": inputs,
+            "templates": templates or {},
+            "hash": content_hash or self.file_hash(path),
+        })
+        self._file.flush()
+
+    def close(self, remove=False):
+        """
+        Close journal file.
+
+        Keyword Arguments:
+            remove (boolean): Remove journal file, commonly once build is finished.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if remove:
+            self.path.unlink(missing_ok=True)
+            self.plan = None
+            self.entries = {}
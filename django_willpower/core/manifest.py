@@ -0,0 +1,181 @@
+import hashlib
+import json
+
+from .. import __version__
+from ..utils.jsons import ExtendedJsonEncoder
+
+
+class BuildManifest:
+    """
+    Manifest of built outputs with the fingerprint of their inputs.
+
+    The manifest is a JSON file stored in the project directory, each entry is indexed
+    on an output path relative to the project directory. A manifest written from
+    another version of Willpower is ignored since templates context may have changed.
+
+    Arguments:
+        path (pathlib.Path): Path to the manifest file. It does not have to exist yet.
+
+    Attributes:
+        entries (dict): Manifest entries indexed on output relative path, each entry
+            is a dictionnary with item ``fingerprint``, ``size``, ``templates`` and
+            ``attributes``. Templates are the dependency graph of output, it is a
+            dictionnary of the source hash of every templates loaded to render the
+            output, indexed on template name. Attributes is a dictionnary with item
+            ``keys`` for the keys of model attributes accessed to render the output
+            and ``hash`` for the hash of their values.
+    """
+    FILENAME = ".willpower-manifest.json"
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    @staticmethod
+    def fingerprint(*items):
+        """
+        Compute a fingerprint from given items.
+
+        Arguments:
+            *items (any): Items to include in fingerprint, they must be JSON
+                serializable with ``ExtendedJsonEncoder``.
+
+        Returns:
+            string: SHA256 hexadecimal digest.
+        """
+        payload = json.dumps(items, cls=ExtendedJsonEncoder, sort_keys=True)
+
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def source_hash(source):
+        """
+        Compute a hash from a template source.
+
+        Arguments:
+            source (bytes): Template file content.
+
+        Returns:
+            string: SHA256 hexadecimal digest.
+        """
+        return hashlib.sha256(source).hexdigest()
+
+    def load(self):
+        """
+        Load entries from manifest file if it exists and has been written from the same
+        Willpower version.
+
+        Returns:
+            BuildManifest: Return itself for chaining.
+        """
+        self.entries = {}
+
+        if self.path.exists():
+            try:
+                payload = json.loads(self.path.read_text())
+            except json.JSONDecodeError:
+                payload = {}
+
+            if payload.get("version") == __version__:
+                self.entries = payload.get("entries", {})
+
+        return self
+
+    def save(self):
+        """
+        Write manifest entries to the manifest file.
+        """
+        self.path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(
+                {"version": __version__, "entries": self.entries},
+                indent=4,
+                sort_keys=True,
+            )
+        )
+
+    def is_unchanged(self, key, fingerprint, path, template_hash,
+                     attributes_hash=None):
+        """
+        Check if an output is still up to date.
+
+        Arguments:
+            key (string): Output relative path.
+            fingerprint (string): Current fingerprint of output inputs.
+            path (pathlib.Path): Output absolute path.
+            template_hash (callable): A function which takes a template name and
+                return its current source hash or ``None`` if template does not
+                exist anymore.
+
+        Keyword Arguments:
+            attributes_hash (callable): A function which takes the recorded attribute
+                keys and return the current hash of their values. It may raise
+                ``LookupError`` if an attribute object does not exist anymore.
+
+        Returns:
+            boolean: True if the recorded fingerprint is the same than given one,
+            every recorded templates and attributes are unchanged and output file
+            still exists with its recorded size.
+        """
+        entry = self.entries.get(key)
+
+        if not entry or entry["fingerprint"] != fingerprint:
+            return False
+
+        for name, recorded in entry.get("templates", {}).items():
+            if template_hash(name) != recorded:
+                return False
+
+        if attributes_hash:
+            attributes = entry.get("attributes")
+            if not attributes:
+                return False
+
+            try:
+                if attributes_hash(attributes["keys"]) != attributes["hash"]:
+                    return False
+            except LookupError:
+                return False
+
+        try:
+            return path.stat().st_size == entry["size"]
+        except FileNotFoundError:
+            return False
+
+    def record(self, key, fingerprint, path, templates=None, attributes=None):
+        """
+        Record an output fingerprint once it has been written.
+
+        Arguments:
+            key (string): Output relative path.
+            fingerprint (string): Fingerprint of output inputs.
+            path (pathlib.Path): Written output absolute path.
+
+        Keyword Arguments:
+            templates (dict): Source hash of every templates loaded to render output,
+                indexed on template name.
+            attributes (dict): Keys of attributes accessed to render output and the
+                hash of their values.
+        """
+        self.entries[key] = {
+            "fingerprint": fingerprint,
+            "size": path.stat().st_size,
+            "templates": templates or {},
+            "attributes": attributes or {},
+        }
+
+    def get_dependents(self, name):
+        """
+        Return every outputs that have loaded a template.
+
+        Arguments:
+            name (string): Template name.
+
+        Returns:
+            list: Output relative paths.
+        """
+        return sorted([
+            key
+            for key, entry in self.entries.items()
+            if name in entry.get("templates", {})
+        ])
@@ -0,0 +1,245 @@
+from jinja2 import TemplateNotFound, TemplateSyntaxError, meta, nodes
+
+from ..exceptions import ProjectBuildError
+from .renderers import FieldRendererRegistry
+
+
+# Name of the global function which renders fields with their kind template
+FIELD_RENDERER = "render_field"
+
+
+def format_template_error(name, error):
+    """
+    Format the error message of a template which can not be compiled.
+
+    Arguments:
+        name (string): Template name.
+        error (Exception): Error raised when template has been compiled.
+
+    Returns:
+        string: Error message.
+    """
+    if isinstance(error, TemplateSyntaxError):
+        return "Template '{}' line {}: {}".format(name, error.lineno, error.message)
+
+    return "Template '{}': {}: {}".format(name, error.__class__.__name__, error)
+
+
+def find_template_references(ast):
+    """
+    Find the templates referenced from a parsed template.
+
+    Arguments:
+        ast (jinja2.nodes.Template): Parsed template.
+
+    Returns:
+        tuple: The names of templates it references with ``include``, ``import``,
+        ``from`` and ``extends`` tags, a boolean which is True if it calls the
+        field renderer and a boolean which is True if it references a template from
+        a variable, like ``{% include field.modelfield_template %}``.
+    """
+    references = set()
+    dynamic = False
+    for reference in meta.find_referenced_templates(ast):
+        if reference:
+            references.add(reference)
+        else:
+            dynamic = True
+
+    renders_fields = any(
+        node.name == FIELD_RENDERER for node in ast.find_all(nodes.Name)
+    )
+
+    return sorted(references), renders_fields, dynamic
+
+
+class TemplatePreflight:
+    """
+    Load and compile every template that a build would need, before rendering
+    anything.
+
+    Checked templates are the templates of modules to build, the templates they
+    reference with ``include``, ``import``, ``from`` and ``extends`` tags (when their
+    name is a constant) and, if one of them renders fields with ``render_field()``
+    or references a template from a variable (like the field template with
+    ``{% include field.modelfield_template %}``), the template of every field from
+    application models. Files of modules with
+    ``copy_without_render`` are only checked to exist.
+
+    Templates are loaded from the builder environments, so they are compiled (or
+    loaded from bytecode cache) only once for both preflight and rendering. A
+    preflight can be run again for the next builds of the same builder, then the
+    template references are only parsed again for the templates which have been
+    reloaded because their file changed.
+
+    Arguments:
+        builder (ProjectBuilder): The builder to check templates for.
+    """
+    def __init__(self, builder):
+        self.builder = builder
+        # Check results of the current run indexed on template directory and template
+        # name, so the templates shared by applications are reported only once
+        self._results = {}
+        # Loaded template with its references, indexed like results and kept
+        # between runs
+        self._references = {}
+
+    def check_template(self, app, name):
+        """
+        Load a template from the application environment and find its references.
+
+        Arguments:
+            app (Application): The application template comes from.
+            name (string): Template name.
+
+        Raises:
+            jinja2.TemplateNotFound: If template does not exist.
+
+        Returns:
+            tuple: Template references, a boolean which is True if it calls the field
+            renderer, a boolean which is True if it references a template from a
+            variable and the error message if template is invalid or ``None``.
+        """
+        jinja_env = self.builder.get_app_environment(app)
+        key = (app.template_dir, name)
+
+        try:
+            template = jinja_env.get_template(name)
+        except TemplateNotFound as e:
+            # Only the checked template is missing, not one that it loads
+            if e.name != name:
+                return [], False, False, format_template_error(name, e)
+            raise
+        except Exception as e:
+            return [], False, False, format_template_error(name, e)
+
+        # Environment loader gives the same template object until its file changes
+        cached = self._references.get(key)
+        if cached is None or cached[0] is not template:
+            source, filename, uptodate = jinja_env.loader.get_source(jinja_env, name)
+            cached = (
+                template,
+                *find_template_references(jinja_env.parse(source, name, filename)),
+            )
+            self._references[key] = cached
+
+        return (*cached[1:], None)
+
+    def check_app(self, app, modules):
+        """
+        Check the templates of some modules from an application.
+
+        Arguments:
+            app (Application): The application.
+            modules (list): Modules to check.
+
+        Returns:
+            list: Error messages.
+        """
+        errors = []
+        # Templates to check indexed on their name with the reason they are needed
+        pending = {}
+        checked = set()
+        renders_fields = False
+        fields_added = False
+
+        for module in modules:
+            if module.copy_without_render:
+                try:
+                    self.builder.get_template_filepath(app, module.template)
+                except TemplateNotFound:
+                    errors.append("File of module '{}' does not exist: {}".format(
+                        module.get_path(), module.template
+                    ))
+            else:
+                pending.setdefault(
+                    module.template,
+                    "Template of module '{}'".format(module.get_path())
+                )
+
+        # The field renderer registry only installs utils when its template exists
+        if "utils" in self.builder.get_app_environment(app).globals:
+            pending.setdefault(FieldRendererRegistry.UTILS_TEMPLATE, "Utils template")
+
+        while pending:
+            for name, origin in sorted(pending.items()):
+                checked.add(name)
+
+                if (app.template_dir, name) in self._results:
+                    continue
+
+                try:
+                    references, uses_fields, dynamic, error = self.check_template(
+                        app, name
+                    )
+                except TemplateNotFound:
+                    errors.append("{} does not exist: {}".format(origin, name))
+                    self._results[(app.template_dir, name)] = ([], False)
+                    continue
+
+                if error:
+                    errors.append(error)
+                # A template name from a variable may be any field template
+                self._results[(app.template_dir, name)] = (
+                    references,
+                    uses_fields or dynamic,
+                )
+
+            current = pending
+            pending = {}
+
+            for name in sorted(current):
+                references, uses_fields = self._results[(app.template_dir, name)]
+                renders_fields = renders_fields or uses_fields
+
+                for reference in references:
+                    if reference not in checked:
+                        pending.setdefault(
+                            reference,
+                            "Template referenced from '{}'".format(name)
+                        )
+
+            if renders_fields and not fields_added:
+                fields_added = True
+                for model in app.models:
+                    for field in model.modelfields:
+                        if field.modelfield_template not in checked:
+                            pending.setdefault(
+                                field.modelfield_template,
+                                "Template of field '{}.{}.{}'".format(
+                                    app.code, model.name, field.name
+                                )
+                            )
+
+        return errors
+
+    def run(self, targets):
+        """
+        Check the templates needed to build some targets.
+
+        Arguments:
+            targets (list): ``BuildTarget`` objects.
+
+        Raises:
+            ProjectBuildError: With every problems found, if any.
+        """
+        self._results = {}
+
+        modules = {}
+        for target in targets:
+            modules.setdefault(target.app.code, {})[id(target.module)] = target.module
+
+        errors = []
+        for appname, app_modules in modules.items():
+            errors.extend(self.check_app(
+                self.builder.registry.apps[appname],
+                list(app_modules.values()),
+            ))
+
+        if errors:
+            raise ProjectBuildError(
+                "Preflight found {} errors:\n{}".format(
+                    len(errors),
+                    "\n".join(["- {}".format(error) for error in errors]),
+                )
+            )
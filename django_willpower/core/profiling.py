@@ -0,0 +1,596 @@
+"""
+Build profiling records where the time of a build goes: in which phase, application,
+component, template and output file, along with the bytes written.
+
+Template profiling goes deeper and records the time spent on each template source
+line during renders.
+"""
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from .. import __version__
+
+
+def get_clock():
+    """
+    Return the current wall time and CPU time of the current thread.
+
+    Returns:
+        tuple: Wall and CPU times in seconds.
+    """
+    return time.perf_counter(), time.thread_time()
+
+
+def get_elapsed(clock):
+    """
+    Return times elapsed since a clock.
+
+    Arguments:
+        clock (tuple): Times as returned by ``get_clock()``.
+
+    Returns:
+        tuple: Elapsed wall and CPU times in seconds.
+    """
+    wall, cpu = get_clock()
+
+    return wall - clock[0], cpu - clock[1]
+
+
+def new_timing():
+    return {"count": 0, "wall": 0.0, "cpu": 0.0}
+
+
+def add_timing(timing, wall, cpu):
+    """
+    Add elapsed times to a timing.
+    """
+    timing["count"] += 1
+    timing["wall"] += wall
+    timing["cpu"] += cpu
+
+
+def round_timings(payload):
+    """
+    Round every times from a report to the microsecond, so reports are readable and
+    can be compared.
+    """
+    if isinstance(payload, dict):
+        return {
+            key: (
+                round(value, 6)
+                if key in ("wall", "cpu") else round_timings(value)
+            )
+            for key, value in payload.items()
+        }
+
+    return payload
+
+
+class BuildProfiler:
+    """
+    Record wall and CPU times of a build.
+
+    Phases are timed with the CPU time of the whole process, targets and template
+    compilations are timed with the CPU time of the thread which runs them. Target
+    renders from worker processes are timed in their worker. Templates compiled in
+    worker processes are not recorded.
+
+    A target render time includes the compilation of the templates it loads for the
+    first time. A streamed target is rendered while it is written, so its render time
+    is included in its write time.
+
+    Attributes:
+        phases (dict): Timings indexed on phase name.
+        targets (dict): Target profiles indexed on target stack path.
+        compilations (dict): Compilation timings indexed on template name.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.targets = {}
+        self.compilations = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager to time a build phase. A phase timed many times accumulates
+        its times.
+
+        Arguments:
+            name (string): Phase name.
+        """
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        try:
+            yield
+        finally:
+            add_timing(
+                self.phases.setdefault(name, new_timing()),
+                time.perf_counter() - wall,
+                time.process_time() - cpu,
+            )
+
+    def record_target(self, target, destination, stage, wall, cpu, size=None,
+                      written=None):
+        """
+        Record times of a target stage.
+
+        Arguments:
+            target (BuildTarget): The target.
+            destination (string): Target destination relative to project directory.
+            stage (string): Either ``render`` or ``write``.
+            wall (float): Elapsed wall time in seconds.
+            cpu (float): Elapsed CPU time in seconds.
+
+        Keyword Arguments:
+            size (integer): Size in bytes of the target output.
+            written (boolean): Whether output has been written or left unchanged.
+        """
+        profile = self.targets.get(target.get_path())
+        if profile is None:
+            profile = self.targets[target.get_path()] = {
+                "app": target.app.code,
+                "component": "{}@{}".format(target.app.code, target.component.code),
+                "template": target.template,
+                "destination": destination,
+                "render": new_timing(),
+                "write": new_timing(),
+                "bytes": 0,
+                "written": False,
+            }
+
+        add_timing(profile[stage], wall, cpu)
+
+        if size is not None:
+            profile["bytes"] = size
+        if written is not None:
+            profile["written"] = written
+
+    def record_compile(self, name, wall, cpu):
+        """
+        Record times of a template compilation.
+        """
+        add_timing(self.compilations.setdefault(name, new_timing()), wall, cpu)
+
+    def watch_environment(self, environment):
+        """
+        Time every template compilation from a Jinja environment.
+
+        Arguments:
+            environment (jinja2.Environment): The environment to watch.
+        """
+        compile_template = environment.compile
+
+        def timed_compile(source, name=None, filename=None, raw=False,
+                          defer_init=False):
+            clock = get_clock()
+            try:
+                return compile_template(source, name, filename, raw, defer_init)
+            finally:
+                self.record_compile(name, *get_elapsed(clock))
+
+        environment.compile = timed_compile
+
+    @staticmethod
+    def get_target_time(profile):
+        """
+        Return the total wall time of a target profile.
+        """
+        return profile["render"]["wall"] + profile["write"]["wall"]
+
+    def get_report(self):
+        """
+        Build the profiling report.
+
+        Returns:
+            dict: Report with Willpower ``version``, ``phases`` timings, ``totals``
+            for all targets and compilations, aggregated timings for ``apps``,
+            ``components`` and ``templates`` and ``targets`` profiles. Aggregations
+            have a ``render`` and ``write`` timing, the ``bytes`` of their outputs and
+            the ``written`` bytes. Templates also have a ``compile`` timing. Times
+            are in seconds.
+        """
+        def new_aggregate():
+            return {
+                "targets": 0,
+                "render": new_timing(),
+                "write": new_timing(),
+                "bytes": 0,
+                "written": 0,
+            }
+
+        def aggregate(bucket, profile):
+            bucket["targets"] += 1
+            for stage in ("render", "write"):
+                bucket[stage]["count"] += profile[stage]["count"]
+                bucket[stage]["wall"] += profile[stage]["wall"]
+                bucket[stage]["cpu"] += profile[stage]["cpu"]
+            bucket["bytes"] += profile["bytes"]
+            if profile["written"]:
+                bucket["written"] += profile["bytes"]
+
+        totals = new_aggregate()
+        totals["compile"] = new_timing()
+        apps = {}
+        components = {}
+        templates = {}
+
+        for path, profile in sorted(self.targets.items()):
+            aggregate(totals, profile)
+            aggregate(apps.setdefault(profile["app"], new_aggregate()), profile)
+            aggregate(
+                components.setdefault(profile["component"], new_aggregate()),
+                profile
+            )
+            aggregate(
+                templates.setdefault(profile["template"], new_aggregate()),
+                profile
+            )
+
+        for name, timing in sorted(self.compilations.items()):
+            totals["compile"]["count"] += timing["count"]
+            totals["compile"]["wall"] += timing["wall"]
+            totals["compile"]["cpu"] += timing["cpu"]
+            templates.setdefault(name, new_aggregate())["compile"] = dict(timing)
+
+        for bucket in templates.values():
+            bucket.setdefault("compile", new_timing())
+
+        return round_timings({
+            "version": __version__,
+            "phases": self.phases,
+            "totals": totals,
+            "apps": apps,
+            "components": components,
+            "templates": templates,
+            "targets": self.targets,
+        })
+
+    def get_slowest_targets(self, top=10):
+        """
+        Return the slowest targets.
+
+        Keyword Arguments:
+            top (integer): Maximum number of targets to return.
+
+        Returns:
+            list: Tuples of target stack path and its profile, from the slowest.
+        """
+        return sorted(
+            self.targets.items(),
+            key=lambda item: (-self.get_target_time(item[1]), item[0])
+        )[:top]
+
+    def get_summary(self, top=10):
+        """
+        Return a human readable summary with phases timings and the slowest targets.
+
+        Keyword Arguments:
+            top (integer): Number of slowest targets to display.
+
+        Returns:
+            string: The summary.
+        """
+        report = self.get_report()
+        lines = ["Phases:"]
+
+        for name, timing in report["phases"].items():
+            lines.append("  {:<14} {:>9.3f}s wall {:>9.3f}s cpu".format(
+                name, timing["wall"], timing["cpu"]
+            ))
+
+        totals = report["totals"]
+        lines.append(
+            "Targets: {} rendered in {:.3f}s, written in {:.3f}s, {} bytes "
+            "({} written), {} templates compiled in {:.3f}s".format(
+                totals["targets"],
+                totals["render"]["wall"],
+                totals["write"]["wall"],
+                totals["bytes"],
+                totals["written"],
+                totals["compile"]["count"],
+                totals["compile"]["wall"],
+            )
+        )
+
+        slowest = self.get_slowest_targets(top=top)
+        if slowest:
+            lines.append("Slowest targets:")
+            for path, profile in slowest:
+                lines.append(
+                    "  {:>9.3f}s (render {:.3f}s, write {:.3f}s) {:>9} bytes "
+                    "{}".format(
+                        self.get_target_time(profile),
+                        profile["render"]["wall"],
+                        profile["write"]["wall"],
+                        profile["bytes"],
+                        path,
+                    )
+                )
+
+        return "\n".join(lines)
+
+    def save(self, path):
+        """
+        Write the JSON report to a file.
+
+        Arguments:
+            path (pathlib.Path): File path.
+        """
+        path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.get_report(), indent=4, sort_keys=True))
+
+
+class TemplateProfiler:
+    """
+    Attribute the render time of templates to their source lines.
+
+    While tracing, every line executed from a compiled Jinja template is mapped back
+    to its template source line and the time until the next template event is
+    accounted to the stack of template frames at this line. So the time spent in
+    Python code called from a template line (filters, globals, the field renderer)
+    is accounted to this line. Included templates, field templates and macros
+    appear as frames under the line which includes or calls them. Frame labels are
+    ``<template>:<line>`` or ``<template>:<function>:<line>`` for macros (as
+    ``<name>()``) and blocks.
+
+    Tracing uses ``sys.settrace()`` so renders are much slower while profiling, only
+    the relative times are meaningful. Timings are aggregated over every traced
+    renders.
+
+    Attributes:
+        stacks (dict): Time in seconds indexed on stacks, each stack is a tuple of
+            frame labels from the outermost template to the innermost.
+    """
+    def __init__(self):
+        self.stacks = {}
+        # Template informations indexed on code object, None for other code
+        self._codes = {}
+        # Frame where tracing has been started, stack walks stop on it
+        self._boundary = None
+        self._previous = None
+        self._current = None
+        self._last = None
+
+    def __getstate__(self):
+        # Code objects are not picklable and are only valid for the current process
+        state = self.__dict__.copy()
+        state.update({
+            "_codes": {},
+            "_boundary": None,
+            "_previous": None,
+            "_current": None,
+        })
+
+        return state
+
+    def get_code_info(self, frame):
+        """
+        Return template informations for the code of a frame.
+
+        Arguments:
+            frame (frame): A frame.
+
+        Returns:
+            tuple: Template name, function label (or ``None`` for the template root)
+            and the debug informations which map compiled lines to template lines. It
+            is ``None`` if frame does not run code compiled from a template.
+        """
+        code = frame.f_code
+
+        try:
+            return self._codes[code]
+        except KeyError:
+            pass
+
+        info = None
+        namespace = frame.f_globals
+
+        if (
+            namespace.get("__file__") == code.co_filename and
+            "environment" in namespace and
+            "debug_info" in namespace
+        ):
+            debug_info = [
+                tuple(int(value) for value in item.split("="))
+                for item in namespace["debug_info"].split("&")
+                if item
+            ]
+
+            function = None
+            if code.co_name == "macro":
+                # Macros are called through the 'Macro' object which knows their name
+                caller = frame.f_back.f_locals.get("self") if frame.f_back else None
+                function = "{}()".format(getattr(caller, "name", "macro"))
+            elif code.co_name != "root":
+                function = code.co_name
+
+            info = (namespace.get("name") or code.co_filename, function, debug_info)
+
+        self._codes[code] = info
+
+        return info
+
+    def get_label(self, frame, info):
+        """
+        Return the label of a template frame with its current template line.
+        """
+        name, function, debug_info = info
+
+        line = 1
+        for template_line, code_line in reversed(debug_info):
+            if code_line <= frame.f_lineno:
+                line = template_line
+                break
+
+        if function:
+            return "{}:{}:{}".format(name, function, line)
+
+        return "{}:{}".format(name, line)
+
+    def get_stack(self, frame):
+        """
+        Return the stack of template frame labels from a frame.
+
+        Returns:
+            tuple: Labels from the outermost template frame.
+        """
+        labels = []
+
+        while frame is not None and frame is not self._boundary:
+            info = self.get_code_info(frame)
+            if info:
+                labels.append(self.get_label(frame, info))
+            frame = frame.f_back
+
+        return tuple(reversed(labels))
+
+    def account(self):
+        """
+        Account the time elapsed since the last event to the current stack.
+        """
+        now = time.perf_counter()
+
+        if self._current:
+            self.stacks[self._current] = (
+                self.stacks.get(self._current, 0.0) + now - self._last
+            )
+
+        self._last = now
+
+    def trace_call(self, frame, event, arg):
+        """
+        Global trace function, only frames from templates are traced.
+        """
+        if self.get_code_info(frame) is None:
+            return None
+
+        return self.trace_template(frame, event, arg)
+
+    def trace_template(self, frame, event, arg):
+        """
+        Local trace function of template frames.
+        """
+        self.account()
+
+        if event == "return":
+            # Includes a generator frame suspended on a yield
+            self._current = self.get_stack(frame.f_back)
+        else:
+            self._current = self.get_stack(frame)
+
+        # Exclude tracing time
+        self._last = time.perf_counter()
+
+        return self.trace_template
+
+    def start(self, boundary=None):
+        """
+        Start tracing template renders from the current thread.
+
+        Keyword Arguments:
+            boundary (frame): Frame which renders templates, stack walks stop on
+                it. Default is to walk up to the outermost frame.
+        """
+        self._boundary = boundary
+        self._previous = sys.gettrace()
+        self._current = None
+        self._last = time.perf_counter()
+        sys.settrace(self.trace_call)
+
+    def stop(self):
+        """
+        Stop tracing and restore the previous trace function.
+        """
+        sys.settrace(self._previous)
+        self.account()
+        self._boundary = None
+        self._previous = None
+        self._current = None
+
+    def merge(self, stacks):
+        """
+        Add stack times, commonly the ones recorded from another process.
+
+        Arguments:
+            stacks (dict): Times indexed on stacks.
+        """
+        for stack, elapsed in stacks.items():
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed
+
+    def pop_stacks(self):
+        """
+        Return recorded stack times and reset them.
+
+        Returns:
+            dict: Times indexed on stacks.
+        """
+        stacks, self.stacks = self.stacks, {}
+
+        return stacks
+
+    def get_lines(self, top=None):
+        """
+        Return the self time of template lines, it is the time of stacks where the
+        line is the innermost frame.
+
+        Keyword Arguments:
+            top (integer): Maximum number of lines to return.
+
+        Returns:
+            list: Tuples of frame label and time in seconds, from the slowest.
+        """
+        lines = {}
+
+        for stack, elapsed in self.stacks.items():
+            lines[stack[-1]] = lines.get(stack[-1], 0.0) + elapsed
+
+        return sorted(lines.items(), key=lambda item: (-item[1], item[0]))[:top]
+
+    def get_collapsed(self):
+        """
+        Return recorded stacks in the collapsed stack format of flame graph tools.
+
+        Each line is a stack of frame labels separated by ``;`` followed by a space
+        and the stack time in microseconds. Stacks under a microsecond are dropped.
+
+        Returns:
+            string: Collapsed stacks sorted by stack.
+        """
+        lines = []
+
+        for stack, elapsed in sorted(self.stacks.items()):
+            microseconds = round(elapsed * 1000000)
+            if microseconds:
+                lines.append("{} {}".format(";".join(stack), microseconds))
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def get_summary(self, top=10):
+        """
+        Return a human readable summary of the template lines with the largest self
+        time.
+
+        Keyword Arguments:
+            top (integer): Number of lines to display.
+
+        Returns:
+            string: The summary.
+        """
+        lines = ["Slowest template lines:"]
+
+        for label, elapsed in self.get_lines(top=top):
+            lines.append("  {:>9.3f}ms {}".format(elapsed * 1000, label))
+
+        return "\n".join(lines)
+
+    def save(self, path):
+        """
+        Write collapsed stacks to a file.
+
+        Arguments:
+            path (pathlib.Path): File path.
+        """
+        path.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+        path.write_text(self.get_collapsed())
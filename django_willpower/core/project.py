@@ -12,6 +12,9 @@ class ProjectRegistry:
 
     Attributes:
         apps (dict): A dictionnary of registered ``Application`` objects.
+        sources (list): Resolved paths of every files read by
+            ``load_configuration()``, the configuration file itself and the
+            declarations and appstack files it references.
     """
     # Required field for an 'apps' item
     _APP_CONF_REQUIRED_ITEMS = [
@@ -24,6 +27,7 @@ class ProjectRegistry:
 
     def __init__(self, apps=None):
         self.apps = apps or {}
+        self.sources = []
 
     def add_application(self, appconfig, template_dir, name=None, code=None,
                         destination=None):
@@ -151,7 +155,7 @@ class ProjectRegistry:
         # Delegate Component and Module search to 'Application.find()'
         return self.apps[app].find(path)
 
-    def load_configuration(self, payload):
+    def load_configuration(self, payload, names=None):
         """
         Load and validate a project configuration.
 
@@ -193,6 +197,11 @@ class ProjectRegistry:
                 Obviously the list from ``apps`` can contains one or many application
                 definitions.
 
+        Keyword Arguments:
+            names (list): Application codes to load. Other applications are not
+                validated and their declarations and appstack files are not read.
+                If empty, all applications are loaded.
+
         Returns:
             object: The given payload possibly altered with some special paths resolved
                 as include content.
@@ -203,6 +212,7 @@ class ProjectRegistry:
                     "Unable to find given project configuration file path: {}"
                 )
                 raise ProjectValidationError(msg.format(payload.resolve()))
+            self.sources.append(payload.resolve())
             payload = json.loads(payload.read_text())
 
         if not isinstance(payload, dict):
@@ -218,8 +228,17 @@ class ProjectRegistry:
             )
             raise ProjectValidationError(msg)
 
+        if names:
+            unknown = [name for name in names if name not in payload["apps"]]
+            if unknown:
+                msg = "Project configuration has no application: {}"
+                raise ProjectValidationError(msg.format(", ".join(unknown)))
+
         # Resolve apps values
         for appcode, appdata in payload["apps"].items():
+            if names and appcode not in names:
+                continue
+
             # Check app code
             if not appcode.isidentifier():
                 msg = (
@@ -256,6 +275,7 @@ class ProjectRegistry:
                         appdata["declarations"].resolve()
                     ))
 
+                self.sources.append(appdata["declarations"].resolve())
                 appdata["declarations"] = json.loads(
                     appdata["declarations"].read_text()
                 )
@@ -272,6 +292,7 @@ class ProjectRegistry:
                         appdata["appstack"].resolve()
                     ))
 
+                self.sources.append(appdata["appstack"].resolve())
                 appdata["appstack"] = json.loads(
                     appdata["appstack"].read_text()
                 )
@@ -0,0 +1,133 @@
+from jinja2 import TemplateNotFound, pass_context
+
+
+class TrackedModule:
+    """
+    Proxy to the module of a template loaded once and used from every renders.
+
+    The template does not go through the loader anymore once it is loaded so the
+    proxy records its name as a dependency of the current render each time one of
+    the module attributes (like a macro) is resolved.
+
+    Arguments:
+        module (jinja2.environment.TemplateModule): The template module.
+        name (string): The template name to record.
+        loader (jinja2.BaseLoader): The environment loader, names are only recorded
+            when it has a ``record`` method like ``TrackingLoader``.
+    """
+    def __init__(self, module, name, loader):
+        self._module = module
+        self._name = name
+        self._record = getattr(loader, "record", None)
+
+    def __getattr__(self, attr):
+        if self._record:
+            self._record(self._name)
+
+        return getattr(self._module, attr)
+
+
+class FieldRendererRegistry:
+    """
+    Registry of model field templates for a Jinja environment.
+
+    Including a field template with ``{% include field.modelfield_template %}`` looks
+    up the template for every field of every model. Instead the registry resolves
+    and compiles the template of a field kind only once per build and renders fields
+    with it from the ``render_field`` global function: ::
+
+        {% for field in inventory_view.fields %}{{ render_field(field) }}
+        {% endfor %}
+
+    Field templates are rendered with the context of the calling template plus the
+    ``field`` variable, just like an include. A field with a custom
+    ``modelfield_template`` is rendered with its own template which is also compiled
+    only once.
+
+    The macros from ``_utils.jinja`` template (if it exists in template directory) are
+    loaded once and available in every templates as the ``utils`` global. The utils
+    template is recorded as a dependency of the renders which use one of its macros,
+    either directly or from a field template.
+
+    Arguments:
+        environment (jinja2.Environment): The environment to load templates from.
+    """
+    TEMPLATE_PATTERN = "models/fields/{}.py"
+    UTILS_TEMPLATE = "_utils.jinja"
+
+    def __init__(self, environment):
+        self.environment = environment
+        # Compiled field templates indexed on field kind
+        self.renderers = {}
+        # Compiled custom field templates indexed on template name
+        self.custom_renderers = {}
+
+    def install(self):
+        """
+        Register the ``render_field`` function and the ``utils`` macros in
+        environment globals.
+        """
+        self.environment.globals["render_field"] = self.render
+
+        try:
+            utils = self.environment.get_template(self.UTILS_TEMPLATE)
+        except TemplateNotFound:
+            self.environment.globals.pop("utils", None)
+        else:
+            self.environment.globals["utils"] = TrackedModule(
+                utils.module, self.UTILS_TEMPLATE, self.environment.loader
+            )
+
+    def clear(self):
+        """
+        Forget compiled templates so changed templates are loaded again for the next
+        build.
+        """
+        self.renderers = {}
+        self.custom_renderers = {}
+        self.install()
+
+    def get_template(self, field):
+        """
+        Return the compiled template for a field.
+
+        Arguments:
+            field (Field): Field to get template for.
+
+        Returns:
+            jinja2.Template: The field template.
+        """
+        if field.modelfield_template == self.TEMPLATE_PATTERN.format(field.kind):
+            registry, key = self.renderers, field.kind
+        else:
+            registry, key = self.custom_renderers, field.modelfield_template
+
+        if key not in registry:
+            registry[key] = self.environment.get_template(field.modelfield_template)
+
+        return registry[key]
+
+    @pass_context
+    def render(self, context, field):
+        """
+        Render a field with its template.
+
+        Arguments:
+            context (jinja2.runtime.Context): Context of the calling template.
+            field (Field): Field to render.
+
+        Returns:
+            string: Rendered field.
+        """
+        template = self.get_template(field)
+
+        # Templates used without the loader still have to be tracked
+        record = getattr(self.environment.loader, "record", None)
+        if record:
+            record(template.name)
+
+        return self.environment.concat(
+            template.root_render_func(
+                template.new_context(context.get_all(), True, {"field": field})
+            )
+        )
@@ -0,0 +1,326 @@
+"""
+Sharded builds divide the targets of a same plan between many nodes, each one builds
+its shard into its own output. Every shard output contains a shard manifest which
+allows to merge all outputs once they have been gathered and verify that no target is
+missing or duplicated.
+"""
+import json
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+from ..exceptions import ProjectBuildError
+from .. import __version__
+from .manifest import BuildManifest
+from .sinks import FilesystemSink
+
+
+# Name of the shard manifest file written at root of a shard output
+SHARD_FILENAME = ".willpower-shard.json"
+
+
+def parse_shard(value):
+    """
+    Parse a shard definition.
+
+    Arguments:
+        value (string): Shard number and shard count divided by ``/``, like ``2/5``.
+
+    Returns:
+        tuple: Shard number and shard count as integers.
+    """
+    try:
+        number, count = [int(item) for item in value.split("/")]
+    except ValueError:
+        raise ValueError(
+            "Invalid shard '{}', it must be like 'I/N'".format(value)
+        )
+
+    if count < 1 or not 1 <= number <= count:
+        raise ValueError(
+            "Invalid shard '{}', number must be between 1 and {}".format(
+                value, max(count, 1)
+            )
+        )
+
+    return number, count
+
+
+def is_relative_name(name):
+    """
+    Check that a target name from a shard manifest is a relative path which can not
+    point outside of the directory it is joined to.
+
+    Arguments:
+        name (string): Target name.
+
+    Returns:
+        boolean: True if name is not empty, is not absolute (including Windows drives
+        and roots) and does not contain any ``..`` part.
+    """
+    if not isinstance(name, str) or not name:
+        return False
+
+    for path in (PurePosixPath(name), PureWindowsPath(name)):
+        if path.is_absolute() or path.anchor or ".." in path.parts:
+            return False
+
+    return True
+
+
+def get_plan_fingerprint(plan):
+    """
+    Compute the fingerprint of the targets divided between shards.
+
+    Arguments:
+        plan (BuildPlan): A plan restricted to a shard.
+
+    Returns:
+        string: The fingerprint.
+    """
+    indexes = set().union(*plan.shards)
+
+    return BuildManifest.fingerprint(sorted([
+        plan.targets[index].get_path()
+        for index in indexes
+    ]))
+
+
+def get_shard_manifest(plan):
+    """
+    Return the shard manifest of a plan restricted to a shard.
+
+    Arguments:
+        plan (BuildPlan): A plan restricted to a shard.
+
+    Returns:
+        dict: Shard manifest with Willpower version, fingerprint of all sharded
+        targets, shard number and count, total number of sharded targets and the
+        destinations of shard targets relative to the project directory.
+    """
+    number, count = plan.shard
+
+    return {
+        "version": __version__,
+        "plan": get_plan_fingerprint(plan),
+        "shard": number,
+        "count": count,
+        "total": sum([len(indexes) for indexes in plan.shards]),
+        "targets": sorted([
+            PurePosixPath(
+                plan.targets[index].destination.relative_to(plan.projectdir)
+            ).as_posix()
+            for index in plan.shards[number - 1]
+        ]),
+    }
+
+
+class ShardOutput:
+    """
+    Read access to a shard output, either a directory, a ZIP archive or a gzipped
+    TAR archive.
+
+    Arguments:
+        path (pathlib.Path): Path to the shard output.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+
+        if self.path.is_dir():
+            self.kind = "dir"
+        elif zipfile.is_zipfile(self.path):
+            self.kind = "zip"
+        elif tarfile.is_tarfile(self.path):
+            self.kind = "tar"
+        else:
+            raise ProjectBuildError(
+                "Shard output is not a directory or an archive: {}".format(self.path)
+            )
+
+        self._archive = None
+        if self.kind == "zip":
+            self._archive = zipfile.ZipFile(self.path)
+            self._names = set(self._archive.namelist())
+        elif self.kind == "tar":
+            self._archive = tarfile.open(self.path, "r:*")
+            self._names = {
+                member.name for member in self._archive.getmembers()
+                if member.isfile()
+            }
+
+        self.manifest = self.read_manifest()
+
+    def exists(self, name):
+        """
+        Return True if the output contains a file with given relative name.
+        """
+        if self.kind == "dir":
+            # A symbolic link must not expose a file from outside of the output
+            path = (self.path / name).resolve()
+            return path.is_relative_to(self.path.resolve()) and path.is_file()
+
+        return name in self._names
+
+    def read(self, name):
+        """
+        Return the content of a file from output.
+
+        Arguments:
+            name (string): File name relative to the output root.
+
+        Returns:
+            bytes: File content.
+        """
+        if self.kind == "dir":
+            return (self.path / name).read_bytes()
+        elif self.kind == "zip":
+            return self._archive.read(name)
+
+        return self._archive.extractfile(name).read()
+
+    def read_manifest(self):
+        """
+        Read the shard manifest.
+
+        Returns:
+            dict: The shard manifest.
+        """
+        if not self.exists(SHARD_FILENAME):
+            raise ProjectBuildError(
+                "Shard output has no shard manifest: {}".format(self.path)
+            )
+
+        try:
+            manifest = json.loads(self.read(SHARD_FILENAME))
+        except json.JSONDecodeError as e:
+            raise ProjectBuildError(
+                "Invalid shard manifest from {}: {}".format(self.path, e)
+            ) from e
+
+        return manifest
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+
+
+def verify_shards(outputs):
+    """
+    Verify that shard outputs make a complete build.
+
+    Arguments:
+        outputs (list): ``ShardOutput`` objects.
+
+    Raises:
+        ProjectBuildError: With all the problems found, if any.
+    """
+    errors = []
+
+    if not outputs:
+        raise ProjectBuildError("No shard outputs to merge")
+
+    reference = outputs[0].manifest
+    for output in outputs:
+        for key in ("version", "plan", "count", "total"):
+            if output.manifest.get(key) != reference.get(key):
+                errors.append(
+                    "Shard {} has a different {} than shard {}".format(
+                        output.path, key, outputs[0].path
+                    )
+                )
+
+    numbers = [output.manifest.get("shard") for output in outputs]
+    for number in sorted(set(numbers)):
+        if numbers.count(number) > 1:
+            errors.append("Shard {} is given more than once".format(number))
+    missing = set(range(1, reference.get("count", 0) + 1)) - set(numbers)
+    if missing:
+        errors.append("Missing shards: {}".format(
+            ", ".join([str(number) for number in sorted(missing)])
+        ))
+
+    owners = {}
+    for output in outputs:
+        for name in output.manifest.get("targets", []):
+            if not is_relative_name(name):
+                errors.append("Target {} from shard {} is not a relative path".format(
+                    name, output.path
+                ))
+                continue
+
+            if name in owners:
+                errors.append("Target {} is in shards {} and {}".format(
+                    name, owners[name], output.path
+                ))
+            owners[name] = output.path
+
+            if not output.exists(name):
+                errors.append("Target {} is missing from shard {}".format(
+                    name, output.path
+                ))
+
+    if not errors and len(owners) != reference.get("total"):
+        errors.append("Shards have {} targets instead of {}".format(
+            len(owners), reference.get("total")
+        ))
+
+    if errors:
+        raise ProjectBuildError(
+            "Shards can not be merged:\n" + "\n".join(
+                ["- {}".format(error) for error in errors]
+            )
+        )
+
+
+def merge_shards(paths, destination, skip_identical=True):
+    """
+    Merge shard outputs into a project directory once they have been verified.
+
+    Only the targets listed in shard manifests are copied, shard manifests are not.
+    Target paths are resolved (following symbolic links) before being checked to be
+    inside the project directory.
+
+    Arguments:
+        paths (list): Paths of shard outputs, directories or archives.
+        destination (pathlib.Path): Project directory where to merge outputs.
+
+    Keyword Arguments:
+        skip_identical (boolean): Do not write a file which already has the same
+            content.
+
+    Returns:
+        dict: Numbers of merged ``shards``, of ``written`` files and of
+        ``unchanged`` files.
+    """
+    outputs = []
+    stats = {"shards": 0, "written": 0, "unchanged": 0}
+
+    try:
+        for path in paths:
+            outputs.append(ShardOutput(path))
+
+        verify_shards(outputs)
+
+        sink = FilesystemSink(destination, skip_identical=skip_identical)
+        files = [
+            (output, name)
+            for output in outputs
+            for name in output.manifest["targets"]
+        ]
+        paths = [(sink.projectdir / name).resolve() for output, name in files]
+        sink.prepare(paths)
+
+        for (output, name), path in zip(files, paths):
+            if output.kind == "dir":
+                written = sink.copy(path, output.path / name)
+            else:
+                written = sink.write(path, output.read(name))
+            stats["written" if written else "unchanged"] += 1
+
+        sink.close()
+        stats["shards"] = len(outputs)
+    finally:
+        for output in outputs:
+            output.close()
+
+    return stats
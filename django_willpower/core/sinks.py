@@ -0,0 +1,703 @@
+"""
+Output sinks are where the builder writes rendered modules.
+
+Every sink checks that a module path is inside the project directory before writing
+it, whatever the sink stores files to.
+"""
+import io
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import uuid
+import zipfile
+from pathlib import Path
+
+from ..exceptions import ProjectBuildError
+from ..utils.files import (
+    copy_file, exchange_paths, fsync_path, is_identical_content, is_identical_file,
+)
+from .. import __pkgname__
+
+
+# Buffer size for streamed writes
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Available policies to flush written files to disk
+FSYNC_POLICIES = ("none", "file", "build")
+
+
+class BaseSink:
+    """
+    Base output sink.
+
+    A sink must at least implement the ``write()`` method.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory, every written paths must be
+            inside it.
+
+    Attributes:
+        supports_temporary (boolean): Whether the sink implements
+            ``stream_to_temporary()`` and ``commit_temporary()`` so worker processes
+            can stream modules into temporary files which are committed from the
+            main process.
+        supports_concurrent_writes (boolean): Whether sink methods can be called
+            from many threads at once. Else writes from a write-behind pipeline are
+            made by a single thread and the builder waits for them before writing
+            from its own thread.
+    """
+    supports_temporary = False
+    supports_concurrent_writes = False
+
+    def __init__(self, projectdir):
+        self.logger = logging.getLogger(__pkgname__)
+        self.projectdir = projectdir.resolve()
+
+    def check_path(self, path):
+        """
+        Ensure a module path is inside the project directory.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+
+        Returns:
+            pathlib.Path: The path relative to the project directory.
+        """
+        if not path.is_relative_to(self.projectdir):
+            msg = "Resolved module path is not a child of the project directory: {}"
+            raise ProjectBuildError(msg.format(path))
+
+        return path.relative_to(self.projectdir)
+
+    def prepare(self, paths):
+        """
+        Prepare sink before writing modules.
+
+        Default implementation only checks every paths, a sink which needs to create
+        something for the paths should override it.
+
+        Arguments:
+            paths (iterable): Absolute module paths that will be written.
+        """
+        for path in paths:
+            self.check_path(path)
+
+    def write(self, path, data):
+        """
+        Write data to a module path.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+            data (bytes): Content to write.
+
+        Returns:
+            boolean: True if data has been written or False if it was left unchanged.
+        """
+        raise NotImplementedError
+
+    def stream(self, path, chunks):
+        """
+        Write chunks to a module path.
+
+        Default implementation joins all chunks and write them at once, a sink which
+        is able to write data progressively should override it.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+            chunks (iterable): Strings to write.
+
+        Returns:
+            boolean: True if data has been written or False if it was left unchanged.
+        """
+        return self.write(path, "".join(chunks).encode("utf-8"))
+
+    def copy(self, path, source):
+        """
+        Copy a file to a module path.
+
+        Default implementation reads the whole file and write it, a sink which is
+        able to copy files more efficiently should override it.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+            source (pathlib.Path): File to copy.
+
+        Returns:
+            boolean: True if file has been written or False if it was left unchanged.
+        """
+        return self.write(path, source.read_bytes())
+
+    def close(self):
+        """
+        Finalize sink once every modules have been written.
+        """
+        pass
+
+    def abort(self):
+        """
+        Finalize sink after a failed build.
+        """
+        self.close()
+
+
+class FilesystemSink(BaseSink):
+    """
+    Write modules as files in the project directory.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory.
+
+    Keyword Arguments:
+        skip_identical (boolean): If enabled, a module is not written when its file
+            already has exactly the same content, so its modification time is left
+            untouched. Default is enabled.
+        fsync (string): Policy to flush written files to disk, one of
+            ``FSYNC_POLICIES``. With ``none`` it is left to the operating system,
+            with ``file`` each file is flushed once written (before being renamed to
+            its destination if written through a temporary file) and with ``build``
+            every written files are flushed once when sink is closed. With ``file``
+            and ``build`` the directories of written files are flushed when sink is
+            closed. Default is ``none``.
+    """
+    supports_temporary = True
+    supports_concurrent_writes = True
+
+    def __init__(self, projectdir, skip_identical=True, fsync="none"):
+        super().__init__(projectdir)
+
+        if fsync not in FSYNC_POLICIES:
+            raise ProjectBuildError(
+                "Invalid fsync policy '{}', it must be one of: {}".format(
+                    fsync, ", ".join(FSYNC_POLICIES)
+                )
+            )
+
+        self.skip_identical = skip_identical
+        self.fsync = fsync
+        # Directories known to exist
+        self.directories = set()
+        # Written files and their directories to flush on close
+        self._unsynced_files = set()
+        self._unsynced_directories = set()
+
+    def locate(self, path):
+        """
+        Return the file path where a module path is written.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+
+        Returns:
+            pathlib.Path: The file path, it is the same than the module path.
+        """
+        self.check_path(path)
+
+        return path
+
+    def make_directory(self, directory):
+        """
+        Create a directory with its parents if it is not known to exist yet.
+
+        Arguments:
+            directory (pathlib.Path): Directory path.
+        """
+        if directory in self.directories:
+            return
+
+        if not directory.exists():
+            msg = "          └── Created path parents: {}".format(directory)
+            self.logger.debug(msg)
+            directory.mkdir(mode=0o755, parents=True, exist_ok=True)
+
+        self.directories.add(directory)
+
+    def prepare(self, paths):
+        """
+        Create once every parent directories of module paths, so writing a module
+        does not have to check its parents anymore.
+
+        Directories known from a previous build with the same sink are checked again
+        since they may have been removed in the meantime.
+        """
+        self.directories = set()
+
+        for directory in sorted({self.locate(path).parent for path in paths}):
+            self.make_directory(directory)
+
+    def ensure_path(self, path):
+        """
+        Ensure a module path is inside the project directory and create parents of
+        its file path if they do not exist yet.
+
+        Arguments:
+            path (pathlib.Path): Absolute module path.
+
+        Returns:
+            pathlib.Path: The file path where module is written.
+        """
+        filepath = self.locate(path)
+        self.make_directory(filepath.parent)
+
+        return filepath
+
+    def flush_file(self, filepath):
+        """
+        Flush a file to disk right after it has been written if fsync policy is
+        ``file``.
+
+        Arguments:
+            filepath (pathlib.Path): Written file, possibly a temporary file.
+        """
+        if self.fsync == "file":
+            fsync_path(filepath)
+
+    def track_written(self, filepath):
+        """
+        Remember a file written at its final location to flush it or its directory
+        on close, depending on fsync policy.
+
+        Arguments:
+            filepath (pathlib.Path): Written file.
+        """
+        if self.fsync == "build":
+            self._unsynced_files.add(filepath)
+        if self.fsync != "none":
+            self._unsynced_directories.add(filepath.parent)
+
+    def sync(self):
+        """
+        Flush to disk the written files and directories left by fsync policy.
+        """
+        for path in sorted(self._unsynced_files) + sorted(self._unsynced_directories):
+            try:
+                fsync_path(path)
+            except FileNotFoundError:
+                pass
+
+        self._unsynced_files = set()
+        self._unsynced_directories = set()
+
+    def write_file(self, filepath, data):
+        """
+        Write data to a file.
+        """
+        filepath.write_bytes(data)
+        self.flush_file(filepath)
+
+    def write(self, path, data):
+        filepath = self.ensure_path(path)
+
+        if self.skip_identical and is_identical_content(filepath, data):
+            msg = "              Unchanged: {}".format(filepath)
+            self.logger.debug(msg)
+            return False
+
+        msg = "              Written to: {}".format(filepath)
+        self.logger.debug(msg)
+        self.write_file(filepath, data)
+        self.track_written(filepath)
+
+        return True
+
+    def get_temporary_path(self, filepath):
+        """
+        Return a new unique temporary path next to a file path.
+        """
+        return filepath.with_name(
+            ".{}.{}.tmp".format(filepath.name, uuid.uuid4().hex)
+        )
+
+    def stream_to_temporary(self, path, chunks):
+        """
+        Write chunks into a new temporary file next to a module path.
+
+        Arguments:
+            path (pathlib.Path): The module path.
+            chunks (iterable): Strings to write.
+
+        Returns:
+            pathlib.Path: The temporary file path.
+        """
+        filepath = self.ensure_path(path)
+
+        temporary = self.get_temporary_path(filepath)
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+
+        try:
+            with open(fd, "wb", buffering=STREAM_BUFFER_SIZE) as fp:
+                for chunk in chunks:
+                    fp.write(chunk.encode("utf-8"))
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+
+        return temporary
+
+    def commit_temporary(self, path, temporary):
+        """
+        Atomically replace a module path with a temporary file.
+
+        If ``skip_identical`` is enabled and path already has the same content, the
+        temporary file is just removed. Else the temporary file is flushed to disk
+        before being renamed if fsync policy is ``file``, whatever the process which
+        has written it.
+
+        Arguments:
+            path (pathlib.Path): The module path.
+            temporary (pathlib.Path): The temporary file path.
+
+        Returns:
+            boolean: True if module has been written or False if it was left
+            unchanged.
+        """
+        filepath = self.locate(path)
+
+        if self.skip_identical and is_identical_file(temporary, filepath):
+            msg = "              Unchanged: {}".format(filepath)
+            self.logger.debug(msg)
+            temporary.unlink()
+            return False
+
+        if filepath.exists():
+            shutil.copymode(filepath, temporary)
+
+        msg = "              Written to: {}".format(filepath)
+        self.logger.debug(msg)
+        self.flush_file(temporary)
+        os.replace(temporary, filepath)
+        self.track_written(filepath)
+
+        return True
+
+    def stream(self, path, chunks):
+        """
+        Write chunks to a temporary file which is atomically renamed to module path
+        once fully written.
+        """
+        return self.commit_temporary(path, self.stream_to_temporary(path, chunks))
+
+    def copy(self, path, source):
+        """
+        Copy a file to a temporary file which is atomically renamed to module path.
+
+        File is copied from kernel side when possible, see
+        ``django_willpower.utils.files.copy_file``.
+        """
+        filepath = self.ensure_path(path)
+
+        if self.skip_identical and is_identical_file(source, filepath):
+            msg = "              Unchanged: {}".format(filepath)
+            self.logger.debug(msg)
+            return False
+
+        temporary = self.get_temporary_path(filepath)
+
+        try:
+            copy_file(source, temporary)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
+
+        return self.commit_temporary(path, temporary)
+
+    def close(self):
+        """
+        Flush written files and directories depending on fsync policy.
+        """
+        self.sync()
+
+
+def _link_or_copy(source, destination):
+    """
+    Copy function for ``shutil.copytree()`` which makes hard links when possible.
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class StagedSink(FilesystemSink):
+    """
+    Write modules into staging directories which are swapped with their application
+    destination once every modules have been written.
+
+    A staging directory is a sibling of its application destination and starts as a
+    hard linked copy of it, so files not managed by the builder are kept and
+    unchanged files stay the same. Since staged files may be hard links to the live
+    files, they are always replaced and never written in place.
+
+    So consumers watching an application destination never see a partially built
+    tree and an aborted build leaves previous output intact.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory.
+        destinations (list): Absolute paths of application destinations. A module path
+            which is not inside any of them is directly written to its destination.
+
+    Keyword Arguments:
+        skip_identical (boolean): See ``FilesystemSink``.
+        fsync (string): See ``FilesystemSink``, staged files are flushed before
+            staging directories are swapped.
+    """
+    supports_temporary = False
+
+    def __init__(self, projectdir, destinations, skip_identical=True, fsync="none"):
+        super().__init__(projectdir, skip_identical=skip_identical, fsync=fsync)
+        # Deepest destinations first so a nested destination wins over its parents
+        self.destinations = sorted(
+            {Path(item).resolve() for item in destinations},
+            key=lambda item: len(item.parts),
+            reverse=True,
+        )
+        # Staging directories indexed on their destination
+        self.stagings = {}
+        # Destinations with at least a written module
+        self.changed = set()
+
+    def get_destination(self, path):
+        """
+        Return the application destination which contains a module path.
+
+        Returns:
+            pathlib.Path: The destination or ``None`` if path is not inside any
+            application destination.
+        """
+        for destination in self.destinations:
+            if path.is_relative_to(destination):
+                return destination
+
+        return None
+
+    def stage(self, destination):
+        """
+        Return the staging directory for a destination, it is created at first call.
+        """
+        if destination not in self.stagings:
+            staging = destination.with_name(
+                ".{}.staging-{}".format(destination.name, uuid.uuid4().hex)
+            )
+            destination.parent.mkdir(mode=0o755, parents=True, exist_ok=True)
+
+            if destination.exists():
+                shutil.copytree(
+                    destination,
+                    staging,
+                    symlinks=True,
+                    copy_function=_link_or_copy,
+                )
+            else:
+                staging.mkdir(mode=0o755)
+
+            self.logger.debug("          └── Staging: {}".format(staging))
+            self.stagings[destination] = staging
+
+        return self.stagings[destination]
+
+    def locate(self, path):
+        """
+        Return the file path where a module path is written, it is inside the staging
+        directory of its application destination.
+        """
+        self.check_path(path)
+        destination = self.get_destination(path)
+
+        if destination is None:
+            return path
+
+        return self.stage(destination) / path.relative_to(destination)
+
+    def write(self, path, data):
+        written = super().write(path, data)
+
+        if written:
+            self.changed.add(self.get_destination(path))
+
+        return written
+
+    def commit_temporary(self, path, temporary):
+        written = super().commit_temporary(path, temporary)
+
+        if written:
+            self.changed.add(self.get_destination(path))
+
+        return written
+
+    def write_file(self, filepath, data):
+        """
+        Write data to a temporary file which replaces the file path.
+        """
+        temporary = self.get_temporary_path(filepath)
+        temporary.write_bytes(data)
+        self.flush_file(temporary)
+
+        if filepath.exists():
+            shutil.copymode(filepath, temporary)
+
+        os.replace(temporary, filepath)
+
+    def close(self):
+        """
+        Swap every staging directories with their destination and remove the previous
+        destination contents. A staging directory without any written module is just
+        removed.
+        """
+        self.sync()
+
+        for destination, staging in self.stagings.items():
+            if destination.exists() and destination not in self.changed:
+                shutil.rmtree(staging)
+                continue
+
+            self.logger.debug("- Swap staging into: {}".format(destination))
+
+            if destination.exists():
+                exchange_paths(staging, destination)
+                shutil.rmtree(staging)
+            else:
+                os.rename(staging, destination)
+
+            if self.fsync != "none":
+                fsync_path(destination.parent)
+
+        self.stagings = {}
+        self.changed = set()
+        self.directories = set()
+
+    def abort(self):
+        """
+        Remove every staging directories.
+        """
+        for staging in self.stagings.values():
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.stagings = {}
+        self.changed = set()
+        self.directories = set()
+
+
+class MemorySink(BaseSink):
+    """
+    Store modules in memory without any disk access.
+
+    Attributes:
+        files (dict): Written module contents as bytes indexed on their path relative
+            to the project directory (as a string).
+    """
+    supports_concurrent_writes = True
+
+    def __init__(self, projectdir):
+        super().__init__(projectdir)
+        self.files = {}
+
+    def write(self, path, data):
+        name = str(self.check_path(path))
+
+        if self.files.get(name) == data:
+            return False
+
+        self.files[name] = data
+
+        return True
+
+
+class ZipSink(BaseSink):
+    """
+    Write modules into a single ZIP archive.
+
+    Archive member names are module paths relative to the project directory.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory.
+        archive (pathlib.Path): Path where to write the archive file. Its parent
+            directory must exist.
+    """
+    def __init__(self, projectdir, archive):
+        super().__init__(projectdir)
+        self.archive = archive
+        self._zipfile = zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, path, data):
+        self._zipfile.writestr(str(self.check_path(path)), data)
+
+        return True
+
+    def stream(self, path, chunks):
+        name = str(self.check_path(path))
+
+        with self._zipfile.open(name, "w", force_zip64=True) as fp:
+            for chunk in chunks:
+                fp.write(chunk.encode("utf-8"))
+
+        return True
+
+    def copy(self, path, source):
+        self._zipfile.write(source, str(self.check_path(path)))
+
+        return True
+
+    def close(self):
+        self._zipfile.close()
+
+    def abort(self):
+        self._zipfile.close()
+        self.archive.unlink(missing_ok=True)
+
+
+class TarSink(BaseSink):
+    """
+    Write modules into a single gzipped TAR archive.
+
+    Since a TAR member size must be known before adding it, streamed chunks are
+    spooled into a temporary file which is kept in memory until it gets too large.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory.
+        archive (pathlib.Path): Path where to write the archive file. Its parent
+            directory must exist.
+    """
+    def __init__(self, projectdir, archive):
+        super().__init__(projectdir)
+        self.archive = archive
+        self._tarfile = tarfile.open(archive, "w:gz")
+
+    def add_member(self, name, fileobj, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mode = 0o644
+        self._tarfile.addfile(info, fileobj)
+
+    def write(self, path, data):
+        name = str(self.check_path(path))
+        self.add_member(name, io.BytesIO(data), len(data))
+
+        return True
+
+    def stream(self, path, chunks):
+        name = str(self.check_path(path))
+
+        with tempfile.SpooledTemporaryFile(max_size=STREAM_BUFFER_SIZE * 16) as fp:
+            for chunk in chunks:
+                fp.write(chunk.encode("utf-8"))
+            size = fp.tell()
+            fp.seek(0)
+            self.add_member(name, fp, size)
+
+        return True
+
+    def copy(self, path, source):
+        name = str(self.check_path(path))
+
+        with source.open("rb") as fp:
+            self.add_member(name, fp, source.stat().st_size)
+
+        return True
+
+    def close(self):
+        self._tarfile.close()
+
+    def abort(self):
+        self._tarfile.close()
+        self.archive.unlink(missing_ok=True)
@@ -0,0 +1,282 @@
+import heapq
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class BuildTarget:
+    """
+    A single output to build, it is either a module rendered for a model or a module
+    rendered once for all application models.
+
+    Arguments:
+        module (Module): The module to render.
+        destination (pathlib.Path): The resolved absolute path where to write the
+            rendered module.
+
+    Keyword Arguments:
+        model (DataModel): The model to render module for. It is empty for a module
+            with ``once`` enabled.
+        cost (integer): Estimated rendering cost of this target, it is only used to
+            schedule the longest targets first. Default to ``1``.
+        dependencies (set): Names of every templates loaded to render this target. It
+            is filled once the target has been rendered.
+        attributes (set): Keys of every model attributes accessed to render this
+            target when attribute tracking is enabled. It is filled once the target
+            has been rendered, ``None`` means the target depends on all its inputs.
+    """
+    module: Any = field(repr=False)
+    destination: Path
+    model: Any = field(default=None, repr=False)
+    cost: int = 1
+    dependencies: set = field(default_factory=set, repr=False)
+    attributes: set = field(default=None, repr=False)
+
+    @property
+    def app(self):
+        return self.module.component.app
+
+    @property
+    def component(self):
+        return self.module.component
+
+    @property
+    def template(self):
+        return self.module.template
+
+    def get_path(self):
+        """
+        Return target path in the application tree.
+
+        Returns:
+            string: The module path followed by the model name if any, divided by
+                ``#`` character.
+        """
+        if self.model is None:
+            return self.module.get_path()
+
+        return "{module_path}#{model}".format(
+            module_path=self.module.get_path(),
+            model=self.model.name,
+        )
+
+    def as_dict(self):
+        """
+        Return target attributes as a dict without the full objects.
+
+        Returns:
+            dict: Target application, component, module and model codes with the
+            template name, destination path and cost.
+        """
+        return {
+            "path": self.get_path(),
+            "app": self.app.code,
+            "component": self.component.code,
+            "module": self.module.code,
+            "model": None if self.model is None else self.model.name,
+            "template": self.template,
+            "destination": str(self.destination),
+            "copy": self.module.copy_without_render,
+            "cost": self.cost,
+        }
+
+
+@dataclass
+class BuildPlan:
+    """
+    Every targets that a build would process, expanded from the registry without
+    rendering anything.
+
+    Arguments:
+        projectdir (pathlib.Path): The project directory where targets are written.
+        targets (list): ``BuildTarget`` objects in the application tree order.
+
+    Keyword Arguments:
+        names (list): Application codes that targets have been expanded from. Empty
+            means all registered applications.
+        skipped (set): Indexes of targets that have not changed since the previous
+            build and would be skipped.
+        excluded (set): Indexes of targets which are not selected by the stack
+            queries given to ``select()`` or which belong to another shard.
+        shard (tuple): Shard number (starting from ``1``) and shard count when the
+            plan has been restricted to a shard with ``select_shard()``.
+        shards (list): The partition of selected targets between all shards, as
+            returned by ``partition()``, when the plan has been restricted to a shard.
+        destinations (dict): Target indexes indexed on their destination path.
+    """
+    projectdir: Path
+    targets: list
+    names: list = None
+    skipped: set = field(default_factory=set)
+    excluded: set = field(default_factory=set)
+    shard: tuple = None
+    shards: list = field(default=None, repr=False)
+    destinations: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def directories(self):
+        """
+        Set of parent directories of all target destinations.
+        """
+        return {path.parent for path in self.destinations}
+
+    @property
+    def selected(self):
+        """
+        Indexes of targets which are not excluded, either to build or to skip, in the
+        application tree order.
+        """
+        return [
+            index
+            for index in range(len(self.targets))
+            if index not in self.excluded
+        ]
+
+    @property
+    def pending(self):
+        """
+        Indexes of targets to build, in the application tree order.
+        """
+        return [
+            index
+            for index in range(len(self.targets))
+            if index not in self.skipped and index not in self.excluded
+        ]
+
+    def get_index(self):
+        """
+        Index targets on their stack path parts.
+
+        A target for a module with ``once`` enabled is indexed on every models of its
+        application.
+
+        Returns:
+            tuple: Sets of target indexes indexed on application code, then component
+            code and finally module code and sets of target indexes indexed on model
+            name.
+        """
+        tree = {}
+        models = {}
+
+        for index, target in enumerate(self.targets):
+            tree.setdefault(target.app.code, {}).setdefault(
+                target.component.code, {}
+            ).setdefault(target.module.code, set()).add(index)
+
+            if target.model is None:
+                names = [model.name for model in target.app.models]
+            else:
+                names = [target.model.name]
+
+            for name in names:
+                models.setdefault(name, set()).add(index)
+
+        return tree, models
+
+    def select(self, queries):
+        """
+        Exclude the targets which are not selected by any of given queries.
+
+        Arguments:
+            queries (list): ``StackQuery`` objects.
+        """
+        tree, models = self.get_index()
+
+        selected = set()
+        for query in queries:
+            selected.update(query.select(tree, models=models))
+
+        self.excluded = set(range(len(self.targets))) - selected
+
+    def partition(self, count):
+        """
+        Partition the selected targets into shards with balanced costs.
+
+        Targets are assigned from the most to the least costly to the least loaded
+        shard, ties are broken on target path and shard order so the partition is the
+        same on every node which plans the same build. A module with ``once`` enabled
+        is a single target so it is never divided between shards.
+
+        Arguments:
+            count (integer): Number of shards.
+
+        Returns:
+            list: A set of target indexes for each shard.
+        """
+        candidates = sorted(
+            [
+                index
+                for index in range(len(self.targets))
+                if index not in self.excluded
+            ],
+            key=lambda index: (
+                -self.targets[index].cost,
+                self.targets[index].get_path(),
+            ),
+        )
+
+        shards = [set() for i in range(count)]
+        loads = [(0, i) for i in range(count)]
+
+        for index in candidates:
+            load, shard = heapq.heappop(loads)
+            shards[shard].add(index)
+            heapq.heappush(loads, (load + self.targets[index].cost, shard))
+
+        return shards
+
+    def select_shard(self, number, count):
+        """
+        Exclude the targets which do not belong to a shard.
+
+        Arguments:
+            number (integer): Shard number, starting from ``1``.
+            count (integer): Number of shards.
+        """
+        if count < 1 or not 1 <= number <= count:
+            raise ValueError(
+                "Invalid shard {}/{}, it must be between 1 and {}".format(
+                    number, count, max(count, 1)
+                )
+            )
+
+        shards = self.partition(count)
+        for i, indexes in enumerate(shards):
+            if i != number - 1:
+                self.excluded |= indexes
+
+        self.shard = (number, count)
+        self.shards = shards
+
+    def as_dict(self):
+        """
+        Return plan as a dict which can be serialized to JSON.
+
+        Target destinations are made relative to the project directory when
+        possible.
+
+        Returns:
+            dict: Project directory, number of targets to build, to skip and excluded
+            and the targets list where each target has additional ``skip`` and
+            ``exclude`` items.
+        """
+        targets = []
+        for index, target in enumerate(self.targets):
+            payload = target.as_dict()
+            if target.destination.is_relative_to(self.projectdir):
+                payload["destination"] = str(
+                    target.destination.relative_to(self.projectdir)
+                )
+            payload["skip"] = index in self.skipped
+            payload["exclude"] = index in self.excluded
+            targets.append(payload)
+
+        return {
+            "projectdir": str(self.projectdir),
+            "build": len(self.pending),
+            "skip": len(self.skipped),
+            "exclude": len(self.excluded),
+            "shard": list(self.shard) if self.shard else None,
+            "targets": targets,
+        }
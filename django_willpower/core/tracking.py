@@ -0,0 +1,88 @@
+import threading
+from contextlib import contextmanager
+
+from jinja2 import BaseLoader
+
+
+class TrackingLoader(BaseLoader):
+    """
+    A Jinja loader wrapper which records every templates loaded during a render.
+
+    Jinja environment cache would bypass the loader for already loaded templates so
+    this loader holds its own template cache and the environment must be initialized
+    with ``cache_size=0`` to ensure every template loading goes through it, including
+    the ones from ``include``, ``import`` and ``extends`` tags.
+
+    Usage sample: ::
+
+        loader = TrackingLoader(FileSystemLoader(template_dir))
+        env = Environment(loader=loader, cache_size=0)
+
+        with loader.track() as templates:
+            env.get_template("models/module.py").render(**context)
+
+        print(templates)
+
+    Arguments:
+        loader (jinja2.BaseLoader): The loader to wrap.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.has_source_access = loader.has_source_access
+        self._templates = {}
+        self._local = threading.local()
+
+    def get_source(self, environment, template):
+        return self.loader.get_source(environment, template)
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+    def load(self, environment, name, globals=None):
+        """
+        Load template from cache or from wrapped loader and record its name into every
+        active tracking sets.
+        """
+        self.record(name)
+
+        template = self._templates.get(name)
+
+        if template is None or not template.is_up_to_date:
+            template = self.loader.load(environment, name, globals)
+            self._templates[name] = template
+        elif globals:
+            template.globals.update(globals)
+
+        return template
+
+    def record(self, *names):
+        """
+        Record template names into every active tracking sets.
+
+        It is used for templates which have been loaded once and are used again
+        without going through the loader.
+        """
+        for tracked in getattr(self._local, "stack", []):
+            tracked.update(names)
+
+    @contextmanager
+    def track(self):
+        """
+        Context manager to record loaded templates.
+
+        Tracking is local to the current thread and may be nested, a template loaded
+        inside a nested tracking is recorded in every active sets.
+
+        Yields:
+            set: The set of loaded template names, it is filled during the context.
+        """
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+
+        tracked = set()
+        self._local.stack.append(tracked)
+
+        try:
+            yield tracked
+        finally:
+            self._local.stack.pop()
@@ -0,0 +1,507 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from ..exceptions import ProjectBuildError, ProjectValidationError
+from .. import __pkgname__
+from .builder import ProjectBuilder
+from .project import ProjectRegistry
+
+
+class PollingWatcher:
+    """
+    Watch files and directory trees for changes by comparing their modification time
+    and size at regular interval.
+
+    It works everywhere but its cost grows with the number of watched files, see
+    ``InotifyWatcher`` for a watcher driven by kernel events.
+
+    Arguments:
+        paths (list): Files and directories to watch, directories are watched
+            recursively.
+
+    Keyword Arguments:
+        interval (float): Seconds to wait between two polls. Default to ``0.5``.
+    """
+    def __init__(self, paths, interval=0.5):
+        self.interval = interval
+        self.paths = set()
+        self._snapshot = {}
+        self.set_paths(paths)
+
+    def set_paths(self, paths):
+        """
+        Change watched paths, changes from the previous paths are forgotten.
+
+        Arguments:
+            paths (list): Files and directories to watch.
+        """
+        self.paths = {Path(path).resolve() for path in paths}
+        self._snapshot = self.get_snapshot()
+
+    def get_snapshot(self):
+        """
+        Return the modification time and size of every watched files.
+
+        Returns:
+            dict: Tuple of modification time and size indexed on file path.
+        """
+        snapshot = {}
+
+        for path in self.paths:
+            if path.is_dir():
+                files = [item for item in path.rglob("*") if item.is_file()]
+            else:
+                files = [path]
+
+            for item in files:
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[item] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def wait(self, timeout=None):
+        """
+        Wait for changes.
+
+        Keyword Arguments:
+            timeout (float): Maximum seconds to wait for. If ``None``, wait until there
+                is a change.
+
+        Returns:
+            set: Paths of created, modified or removed files. It is empty if there was
+            no change before timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            snapshot = self.get_snapshot()
+            changes = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+
+            if changes:
+                return changes
+
+            if deadline is None:
+                delay = self.interval
+            else:
+                delay = min(self.interval, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+
+            time.sleep(delay)
+
+    def close(self):
+        """
+        Release watcher resources.
+        """
+        self._snapshot = {}
+
+
+class InotifyWatcher:
+    """
+    Watch files and directory trees for changes from Linux inotify events.
+
+    Watched files are observed from their parent directory, so a file replaced by an
+    editor with a rename is still tracked. Directories created inside a watched tree
+    are watched too.
+
+    Arguments:
+        paths (list): Files and directories to watch, directories are watched
+            recursively.
+
+    Raises:
+        OSError: If inotify is not available on this system.
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_ISDIR = 0x40000000
+
+    MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+        IN_CREATE | IN_DELETE
+    )
+
+    # Header of an event: watch descriptor, mask, cookie and name length
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, paths):
+        if not sys.platform.startswith("linux"):
+            raise OSError("Inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Unable to initialize inotify")
+
+        self.paths = set()
+        # Watched directories indexed on their watch descriptor
+        self._directories = {}
+        self.set_paths(paths)
+
+    def add_directory(self, path):
+        """
+        Add an inotify watch on a directory.
+
+        Arguments:
+            path (pathlib.Path): Directory path.
+        """
+        descriptor = self._libc.inotify_add_watch(
+            self._fd,
+            os.fsencode(path),
+            self.MASK
+        )
+        if descriptor >= 0:
+            self._directories[descriptor] = path
+
+    def set_paths(self, paths):
+        """
+        Change watched paths, pending events from the previous paths are dropped.
+
+        Arguments:
+            paths (list): Files and directories to watch.
+        """
+        for descriptor in self._directories:
+            self._libc.inotify_rm_watch(self._fd, descriptor)
+        self._directories = {}
+        self.read_events()
+
+        self.paths = {Path(path).resolve() for path in paths}
+
+        directories = set()
+        for path in self.paths:
+            if path.is_dir():
+                directories.add(path)
+                directories.update(
+                    item for item in path.rglob("*") if item.is_dir()
+                )
+            else:
+                directories.add(path.parent)
+
+        for directory in sorted(directories):
+            self.add_directory(directory)
+
+    def is_watched(self, path):
+        """
+        Return True if path is a watched file or is inside a watched directory.
+        """
+        return any(
+            path == item or (item in path.parents)
+            for item in self.paths
+        )
+
+    def read_events(self):
+        """
+        Read pending events.
+
+        Returns:
+            set: Paths of watched files concerned by events.
+        """
+        changes = set()
+
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changes
+
+            offset = 0
+            while offset < len(buffer):
+                descriptor, mask, cookie, length = self.EVENT_HEADER.unpack_from(
+                    buffer,
+                    offset
+                )
+                offset += self.EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                directory = self._directories.get(descriptor)
+                if directory is None:
+                    continue
+
+                path = directory / os.fsdecode(name) if name else directory
+                if not self.is_watched(path):
+                    continue
+
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        # Files may have been created before the directory is watched
+                        self.add_directory(path)
+                        for item in path.rglob("*"):
+                            if item.is_dir():
+                                self.add_directory(item)
+                            else:
+                                changes.add(item)
+                    continue
+
+                changes.add(path)
+
+    def wait(self, timeout=None):
+        """
+        Wait for changes.
+
+        Keyword Arguments:
+            timeout (float): Maximum seconds to wait for. If ``None``, wait until there
+                is a change.
+
+        Returns:
+            set: Paths of created, modified or removed files. It is empty if there was
+            no change before timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            delay = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], delay)
+            if not ready:
+                return set()
+
+            changes = self.read_events()
+            if changes:
+                return changes
+
+    def close(self):
+        """
+        Release watcher resources.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._directories = {}
+
+
+def get_watcher(paths, polling=False, interval=0.5):
+    """
+    Return the best available watcher.
+
+    Arguments:
+        paths (list): Files and directories to watch.
+
+    Keyword Arguments:
+        polling (boolean): Force the polling watcher even if inotify is available.
+        interval (float): Polling interval in seconds.
+
+    Returns:
+        object: An ``InotifyWatcher`` if available, else a ``PollingWatcher``.
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+
+    return PollingWatcher(paths, interval=interval)
+
+
+class ProjectWatcher:
+    """
+    Build a project again each time its configuration or templates change.
+
+    The registry is loaded once and only loaded again when one of its configuration
+    files changes. The builder is kept between builds with incremental mode enabled,
+    so Jinja environments, compiled templates and the manifest are warm and only the
+    outputs affected by a change are rendered again.
+
+    Arguments:
+        config (pathlib.Path): Project configuration file.
+        projectdir (pathlib.Path): Project directory.
+
+    Keyword Arguments:
+        debounce (float): Seconds without any change to wait for before building, so
+            a burst of changes triggers a single build. Default to ``0.2``.
+        polling (boolean): Force the polling watcher. Default is to use inotify when
+            available.
+        interval (float): Polling interval in seconds. Default to ``0.5``.
+        builder_options (dict): Extra keyword arguments for ``ProjectBuilder``.
+
+    Attributes:
+        registry (ProjectRegistry): Last valid project registry.
+        builder (ProjectBuilder): The warm project builder.
+        watcher (object): The files watcher.
+    """
+    def __init__(self, config, projectdir, debounce=0.2, polling=False,
+                 interval=0.5, builder_options=None):
+        self.logger = logging.getLogger(__pkgname__)
+
+        self.config = config.resolve()
+        self.projectdir = projectdir
+        self.debounce = debounce
+        self.polling = polling
+        self.interval = interval
+        self.builder_options = builder_options or {}
+
+        self.registry = None
+        self.builder = None
+        self.watcher = None
+
+    def load_registry(self):
+        """
+        Load project registry from configuration.
+
+        Returns:
+            ProjectRegistry: The loaded registry.
+        """
+        registry = ProjectRegistry()
+        registry.load_configuration(self.config)
+
+        return registry
+
+    def get_watched_paths(self):
+        """
+        Return paths to watch from the current registry.
+
+        Returns:
+            list: Configuration files and every application template directories.
+        """
+        paths = {self.config}
+
+        if self.registry:
+            paths.update(self.registry.sources)
+            paths.update(app.template_dir for app in self.registry.apps.values())
+
+        return sorted(paths)
+
+    def get_builder(self):
+        """
+        Initialize a project builder for the current registry.
+
+        Returns:
+            ProjectBuilder: The project builder.
+        """
+        return ProjectBuilder(
+            self.registry,
+            self.projectdir,
+            incremental=True,
+            **self.builder_options
+        )
+
+    def start(self):
+        """
+        Load registry and initialize builder and watcher.
+        """
+        self.registry = self.load_registry()
+        self.builder = self.get_builder()
+        self.watcher = get_watcher(
+            self.get_watched_paths(),
+            polling=self.polling,
+            interval=self.interval,
+        )
+
+    def build(self):
+        """
+        Build project and log stats with elapsed time.
+
+        Returns:
+            dict: Build stats.
+        """
+        start = time.perf_counter()
+        self.builder.process()
+        elapsed = time.perf_counter() - start
+
+        self.logger.info((
+            "Built in {elapsed:.3f}s: rendered {rendered}, cached {cached}, copied "
+            "{copied}, skipped {skipped} unchanged"
+        ).format(elapsed=elapsed, **self.builder.stats))
+
+        return self.builder.stats
+
+    def rebuild(self, changes):
+        """
+        Build project again after some changes.
+
+        Registry is loaded again if a configuration file has changed. If the new
+        configuration is invalid, the error is logged and nothing is built. With a
+        staged build, the builder is initialized again since its staged sink is
+        initialized from the registry application destinations.
+
+        Arguments:
+            changes (set): Paths of changed files.
+
+        Returns:
+            dict: Build stats or ``None`` if configuration is invalid.
+        """
+        sources = set(self.registry.sources) | {self.config}
+
+        if changes & sources:
+            try:
+                registry = self.load_registry()
+            except ProjectValidationError as e:
+                self.logger.error(str(e))
+                return None
+
+            self.registry = registry
+            if self.builder_options.get("staged"):
+                self.builder = self.get_builder()
+            else:
+                self.builder.registry = registry
+            self.watcher.set_paths(self.get_watched_paths())
+
+        return self.build()
+
+    def wait_changes(self, timeout=None):
+        """
+        Wait for changes and gather the following ones until nothing has changed
+        during the debounce delay.
+
+        Keyword Arguments:
+            timeout (float): Maximum seconds to wait for the first change. If
+                ``None``, wait until there is a change.
+
+        Returns:
+            set: Paths of changed files.
+        """
+        changes = self.watcher.wait(timeout=timeout)
+
+        if changes:
+            while True:
+                more = self.watcher.wait(timeout=self.debounce)
+                if not more:
+                    break
+                changes |= more
+
+        return changes
+
+    def run(self):
+        """
+        Build project then build it again on each change until interrupted.
+
+        Build errors are logged and do not stop watching.
+        """
+        self.start()
+
+        try:
+            changes = None
+            while True:
+                try:
+                    if changes is None:
+                        self.build()
+                    else:
+                        self.rebuild(changes)
+                except ProjectBuildError as e:
+                    self.logger.error(str(e))
+
+                changes = self.wait_changes()
+
+                self.logger.info("Changed: {}".format(
+                    ", ".join(sorted(str(path) for path in changes))
+                ))
+        finally:
+            self.watcher.close()
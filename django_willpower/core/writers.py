@@ -0,0 +1,113 @@
+"""
+Write-behind pipeline to write rendered modules from threads while the builder keeps
+rendering the next ones.
+"""
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from ..exceptions import ProjectBuildError
+
+
+class WriteBehind:
+    """
+    Run sink writes from a pool of writer threads.
+
+    Writes are collected in the same order they have been submitted: the callback of
+    a write is only called once every previous writes have been collected, from the
+    thread which submits or flushes writes. So stats and manifest are updated from a
+    single thread and the reported error is always the one from the oldest failed
+    write, whatever the order writer threads finish in.
+
+    Arguments:
+        workers (integer): Number of writer threads.
+
+    Keyword Arguments:
+        queue_size (integer): Maximum number of writes submitted and not collected
+            yet. Once reached, submitting a write blocks until the oldest write is
+            done, so rendering can not get too far ahead of a slow filesystem and
+            rendered contents do not pile up in memory. Default is 16 writes for each
+            worker.
+    """
+    def __init__(self, workers, queue_size=None):
+        self.workers = workers
+        self.queue_size = queue_size or workers * 16
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="willpower-writer",
+        )
+        # Tuples of future, label and callback in submission order
+        self._pending = collections.deque()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, label, callback, func, *args):
+        """
+        Queue a write.
+
+        Arguments:
+            label (string): Name of written item used in error message, commonly a
+                target stack path.
+            callback (callable): Function called with the write result once it has
+                been collected.
+            func (callable): Function which performs the write.
+            *args: Arguments for the write function.
+
+        Raises:
+            ProjectBuildError: If a previous write has failed.
+        """
+        while len(self._pending) >= self.queue_size:
+            self.collect(block=True)
+
+        self._pending.append((self._executor.submit(func, *args), label, callback))
+        self.collect()
+
+    def collect(self, block=False):
+        """
+        Collect completed writes in submission order and call their callback.
+
+        Collecting stops at the first write which is not done yet.
+
+        Keyword Arguments:
+            block (boolean): Wait for the oldest write to be done before collecting.
+
+        Raises:
+            ProjectBuildError: With the error of the oldest failed write.
+        """
+        while self._pending:
+            future, label, callback = self._pending[0]
+            if not block and not future.done():
+                return
+            block = False
+
+            self._pending.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                msg = "Unable to write '{}': {}: {}"
+                raise ProjectBuildError(
+                    msg.format(label, e.__class__.__name__, e)
+                ) from e
+
+            callback(result)
+
+    def flush(self):
+        """
+        Wait for every submitted writes and collect them.
+
+        Raises:
+            ProjectBuildError: With the error of the oldest failed write.
+        """
+        while self._pending:
+            self.collect(block=True)
+
+    def close(self, cancel=False):
+        """
+        Stop writer threads once running writes are done.
+
+        Keyword Arguments:
+            cancel (boolean): Cancel the writes which have not been started yet.
+                Uncollected writes are dropped without calling their callback.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+        self._pending.clear()
@@ -1,6 +1,6 @@
 from django.utils.translation import gettext_lazy as _
 
-{% for model_inventory in inventories %}{% for field in model_inventory.modelfields %}{% if field.choices_list %}
+{% for view in inventory_views %}{% for field in view.choice_fields %}
 def get_{{ field.name }}_choices():
     return [{% for item in field.choices_list %}
         ("{{ item }}", _("{{ item }}")),{% endfor %}
@@ -8,5 +8,5 @@ def get_{{ field.name }}_choices():
 
 def get_{{ field.name }}_default():
     return get_{{ field.name }}_choices()[0][0]
-{% endif %}{% endfor %}{% endfor %}
+{% endfor %}{% endfor %}
 
@@ -1,4 +1,4 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.BooleanField(
         _("{{ field.label }}"),
         {{ utils.attribute_bool_or_string('default', field.default) }}{% if field.required %}
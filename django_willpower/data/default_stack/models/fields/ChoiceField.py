@@ -1,4 +1,4 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.CharField(
         _("{{ field.label }}"),
         choices=get_{{ field.name }}_choices(),
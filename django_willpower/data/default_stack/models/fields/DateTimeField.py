@@ -1,4 +1,4 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.DateTimeField(
         _("{{ field.label }}"),
         max_length=255,{% if field.unique %}
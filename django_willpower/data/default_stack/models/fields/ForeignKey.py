@@ -1,6 +1,6 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.ForeignKey(
-        "{{ field.target.format(appname=model_inventory.app.code)|lower }}",
+        "{{ inventory_view.targets[field.name] }}",
         on_delete={% if field.on_delete %}{{ field.on_delete }}{% else %}models.CASCADE{% endif %},
         verbose_name=_("{{ field.label }}"),{% if field.related_name %}
         related_name="{{ field.related_name }}",{% endif %}{% if field.unique %}
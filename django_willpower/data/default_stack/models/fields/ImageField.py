@@ -1,4 +1,4 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.ImageField(
         _("{{ field.label }}"),
         {{ utils.attribute_value_coerced_string('default', field.default) }}
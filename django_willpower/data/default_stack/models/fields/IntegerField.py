@@ -1,4 +1,4 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.IntegerField(
         _("{{ field.label }}"),
         {{ utils.attribute_value_coerced_number('default', field.default, field.nullable) }}{% if field.min_value or field.max_value %}
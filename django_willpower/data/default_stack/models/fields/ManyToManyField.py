@@ -1,6 +1,6 @@
-{% import '_utils.jinja' as utils %}
+
     {{ field.name }} = models.ManyToManyField(
-        "{{ field.target.format(appname=model_inventory.app.code)|lower }}",
+        "{{ inventory_view.targets[field.name] }}",
         verbose_name=_("{{ field.label }}"),{% if field.related_name %}
         related_name="{{ field.related_name }}s",{% endif %}{% if not field.required %}
         blank=True,{% endif %}
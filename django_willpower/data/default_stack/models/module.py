@@ -1,11 +1,10 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
-from django.utils import timezone
-from django.core.validators import MinValueValidator, MaxValueValidator
-
-{% for field in model_inventory.modelfields %}{% if field.choices_list %}
-from ..choices import get_{{ field.name }}_choices, get_{{ field.name }}_default{% endif %}{% endfor %}
+{% for module, names in inventory_view.imports.items() if not module.startswith(".") %}from {{ module }} import {{ names|join(", ") }}
+{% endfor %}
+{% for module, names in inventory_view.imports.items() if module.startswith(".") %}
+from {{ module }} import {{ names|join(", ") }}{% endfor %}
 
 
 class {{ model_inventory.name }}(models.Model):
@@ -15,7 +14,7 @@ class {{ model_inventory.name }}(models.Model):
     Attributes:
 {% for field in model_inventory.modelfields %}        {{ field.name }} ({{ field.kind }}): {% if field.required %}Required{% else %}Optional{% endif %}
 {% endfor %}    """
-{% for field in model_inventory.modelfields %}{% include field.modelfield_template %}
+{% for field in inventory_view.fields %}{{ render_field(field) }}
 {% endfor %}
     class Meta:
         verbose_name = _("{{ model_inventory.name }}")
@@ -38,7 +37,7 @@ class {{ model_inventory.name }}(models.Model):
         return reverse("{{ model_inventory.app.code }}:{{ model_inventory.module_name }}-detail", kwargs={"{{ model_inventory.module_name }}_pk": self.id})
 
     def save(self, *args, **kwargs):
-{% for field in model_inventory.modelfields %}{% if field.auto_update %}        self.{{ field.name }} = timezone.now()
-{% endif %}{% endfor %}
+{% for field in inventory_view.auto_update_fields %}        self.{{ field.name }} = timezone.now()
+{% endfor %}
         super().save(*args, **kwargs)
 
@@ -0,0 +1,228 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import shutil
+
+
+COMPARE_CHUNK_SIZE = 64 * 1024
+
+# Constants for renameat2 system call
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+# Linux ioctl request to clone a file (reflink)
+FICLONE = 0x40049409
+
+_LIBC = None
+
+
+def _get_libc():
+    """
+    Return the C library loaded with ctypes or None if it can not be loaded.
+    """
+    global _LIBC
+
+    if _LIBC is None:
+        try:
+            _LIBC = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        except OSError:
+            _LIBC = False
+
+    return _LIBC or None
+
+
+def is_identical_content(path, data, chunk_size=COMPARE_CHUNK_SIZE):
+    """
+    Check if a file content is byte identical to given data.
+
+    File size is checked first so a different content length never involves reading
+    the file, then file is compared chunk by chunk and stop on the first difference.
+
+    Arguments:
+        path (pathlib.Path): File path to compare. It does not have to exist.
+        data (bytes): Data to compare to.
+
+    Keyword Arguments:
+        chunk_size (integer): Size of chunks to read from file.
+
+    Returns:
+        boolean: True if file exists and has exactly the same content than data.
+    """
+    try:
+        if path.stat().st_size != len(data):
+            return False
+    except FileNotFoundError:
+        return False
+
+    view = memoryview(data)
+    position = 0
+
+    with path.open("rb") as fp:
+        while position < len(data):
+            chunk = fp.read(chunk_size)
+            if not chunk or view[position:position + len(chunk)] != chunk:
+                return False
+            position += len(chunk)
+
+        # File may have grown since the size check
+        return not fp.read(1)
+
+
+def is_identical_file(path, other, chunk_size=COMPARE_CHUNK_SIZE):
+    """
+    Check if two files have byte identical contents.
+
+    File sizes are checked first, then files are compared chunk by chunk and stop on
+    the first difference.
+
+    Arguments:
+        path (pathlib.Path): File path to compare. It does not have to exist.
+        other (pathlib.Path): The other file path to compare. It does not have to
+            exist.
+
+    Keyword Arguments:
+        chunk_size (integer): Size of chunks to read from files.
+
+    Returns:
+        boolean: True if both files exist and have exactly the same content.
+    """
+    try:
+        if path.stat().st_size != other.stat().st_size:
+            return False
+    except FileNotFoundError:
+        return False
+
+    with path.open("rb") as fp, other.open("rb") as other_fp:
+        while True:
+            chunk = fp.read(chunk_size)
+            if chunk != other_fp.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+def exchange_paths(path, other):
+    """
+    Swap two existing paths.
+
+    On Linux this is done atomically with the ``renameat2()`` system call and its
+    ``RENAME_EXCHANGE`` flag. Where it is not available, paths are swapped with three
+    renames through a temporary name.
+
+    Arguments:
+        path (pathlib.Path): A path to swap.
+        other (pathlib.Path): The other path to swap, it must be on the same
+            filesystem.
+    """
+    renameat2 = getattr(_get_libc(), "renameat2", None)
+
+    if renameat2 is not None:
+        result = renameat2(
+            AT_FDCWD, os.fsencode(path), AT_FDCWD, os.fsencode(other), RENAME_EXCHANGE
+        )
+        if result == 0:
+            return
+
+        code = ctypes.get_errno()
+        # Filesystem or kernel does not support exchange, fallback to renames
+        if code not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise OSError(code, os.strerror(code), str(path))
+
+    swap = path.with_name(path.name + ".swap")
+    os.rename(path, swap)
+    os.rename(other, path)
+    os.rename(swap, other)
+
+
+def fsync_path(path):
+    """
+    Flush a file or a directory to disk.
+
+    Syncing a directory makes durable the creation, removal and renaming of its
+    entries.
+
+    Arguments:
+        path (pathlib.Path): File or directory path.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def copy_file(source, destination):
+    """
+    Copy a file content to a new file without going through Python buffers when
+    possible.
+
+    Copy methods are tried in this order:
+
+    * A reflink (copy on write clone) with ``FICLONE`` ioctl on Linux filesystems
+      which support it (Btrfs, XFS, etc..), no data is copied at all;
+    * A kernel side copy with ``os.copy_file_range()``;
+    * A kernel side copy with ``os.sendfile()``;
+    * Finally a regular copy with ``shutil.copyfileobj()``.
+
+    Arguments:
+        source (pathlib.Path): File to copy.
+        destination (pathlib.Path): File path to create, it must not exist yet.
+    """
+    with source.open("rb") as src, destination.open("xb") as dst:
+        if _reflink(src.fileno(), dst.fileno()):
+            return
+
+        size = os.fstat(src.fileno()).st_size
+
+        for method in (_copy_file_range, _sendfile):
+            try:
+                method(src.fileno(), dst.fileno(), size)
+            except (AttributeError, OSError):
+                # Method is not available or not supported for these files, reset
+                # file positions and try the next one
+                os.lseek(src.fileno(), 0, os.SEEK_SET)
+                os.ftruncate(dst.fileno(), 0)
+                os.lseek(dst.fileno(), 0, os.SEEK_SET)
+            else:
+                return
+
+        shutil.copyfileobj(src, dst)
+
+
+def _reflink(source_fd, destination_fd):
+    """
+    Try to clone a file with ``FICLONE`` ioctl.
+
+    Returns:
+        boolean: True if file has been cloned.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    try:
+        fcntl.ioctl(destination_fd, FICLONE, source_fd)
+    except OSError:
+        return False
+
+    return True
+
+
+def _copy_file_range(source_fd, destination_fd, size):
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(source_fd, destination_fd, size - copied)
+        if sent == 0:
+            break
+        copied += sent
+
+
+def _sendfile(source_fd, destination_fd, size):
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(destination_fd, source_fd, copied, size - copied)
+        if sent == 0:
+            break
+        copied += sent
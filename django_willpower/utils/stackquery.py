@@ -0,0 +1,202 @@
+import fnmatch
+import re
+
+
+# Characters which make a pattern a glob instead of a literal name
+GLOB_CHARACTERS = set("*?[")
+
+# Query syntax, every part is optional
+QUERY_REGEX = re.compile(
+    r"^(?:(?P<apps>[^@:#]*)@)?"
+    r"(?P<components>[^@:#]*)"
+    r"(?::(?P<modules>[^@:#]*))?"
+    r"(?:#(?P<models>[^@:#]*))?$"
+)
+
+
+def split_list(value):
+    """
+    Split a comma separated list, ignoring the commas inside braces.
+
+    Arguments:
+        value (string): Comma separated list.
+
+    Returns:
+        list: Non empty items.
+    """
+    items = []
+    current = ""
+    depth = 0
+
+    for character in value:
+        if character == "{":
+            depth += 1
+        elif character == "}":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("Unbalanced braces in: {}".format(value))
+        elif character == "," and depth == 0:
+            items.append(current)
+            current = ""
+            continue
+
+        current += character
+
+    if depth != 0:
+        raise ValueError("Unbalanced braces in: {}".format(value))
+
+    items.append(current)
+
+    return [item.strip() for item in items if item.strip()]
+
+
+def expand_braces(pattern):
+    """
+    Expand brace alternatives from a pattern, like a shell does.
+
+    Sample: ``app{views,urls}`` is expanded to ``appviews`` and ``appurls``.
+
+    Arguments:
+        pattern (string): Pattern to expand.
+
+    Returns:
+        list: Expanded patterns.
+    """
+    match = re.search(r"\{([^{}]*)\}", pattern)
+    if not match:
+        return [pattern]
+
+    expanded = []
+    for option in match.group(1).split(","):
+        expanded.extend(expand_braces(
+            pattern[:match.start()] + option + pattern[match.end():]
+        ))
+
+    return expanded
+
+
+class PatternSet:
+    """
+    A compiled list of names and glob patterns for a single query part.
+
+    Literal names are looked up directly from index keys, only glob patterns are
+    matched against every keys.
+
+    Arguments:
+        value (string): Comma separated list of names or globs with possible braces
+            alternatives. An empty value matches everything.
+    """
+    def __init__(self, value):
+        self.literals = set()
+        self.globs = []
+        self.everything = False
+
+        for item in split_list(value or "*"):
+            for pattern in expand_braces(item):
+                if pattern == "*":
+                    self.everything = True
+                elif GLOB_CHARACTERS & set(pattern):
+                    self.globs.append(re.compile(fnmatch.translate(pattern)))
+                else:
+                    self.literals.add(pattern)
+
+    def match(self, name):
+        """
+        Return True if name matches one of the patterns.
+        """
+        return (
+            self.everything or
+            name in self.literals or
+            any(regex.match(name) for regex in self.globs)
+        )
+
+    def select(self, keys):
+        """
+        Return the matching keys.
+
+        Arguments:
+            keys (collection): Keys to select from, commonly an index dictionnary.
+
+        Returns:
+            list: Matching keys.
+        """
+        if self.everything:
+            return list(keys)
+
+        if not self.globs:
+            return [key for key in sorted(self.literals) if key in keys]
+
+        return [key for key in keys if self.match(key)]
+
+
+class StackQuery:
+    """
+    A compiled query to select targets from their stack path.
+
+    Query syntax is an extension of stack path syntax: ::
+
+        [apps@]components[:modules][#models]
+
+    Where each part is a comma separated list of names or glob patterns (with ``*``,
+    ``?`` and ``[...]``) and may contain brace alternatives like ``app{views,urls}``.
+    An empty or missing part matches everything. Samples:
+
+    * ``blog,cms@app{views,urls}:*`` for every modules of components ``appviews`` and
+      ``appurls`` from applications ``blog`` and ``cms``;
+    * ``*@appadmins:module`` for module ``module`` of component ``appadmins`` from
+      every applications;
+    * ``#Article`` for every modules rendered for model ``Article``, including the
+      modules rendered once for all models of an application which has a model
+      ``Article``.
+
+    Arguments:
+        query (string): The query to compile.
+
+    Raises:
+        ValueError: If query is invalid.
+    """
+    def __init__(self, query):
+        match = QUERY_REGEX.match(query.strip())
+        if not match:
+            raise ValueError("Invalid stack query: {}".format(query))
+
+        self.query = query
+        self.apps = PatternSet(match.group("apps"))
+        self.components = PatternSet(match.group("components"))
+        self.modules = PatternSet(match.group("modules"))
+        self.models = PatternSet(match.group("models"))
+
+    def __repr__(self):
+        return "<StackQuery {}>".format(self.query)
+
+    def select(self, tree, models=None):
+        """
+        Select target indexes from an index.
+
+        Arguments:
+            tree (dict): Sets of target indexes indexed on application code, then
+                component code and finally module code.
+
+        Keyword Arguments:
+            models (dict): Sets of target indexes indexed on model name. Required
+                unless the query has no model part.
+
+        Returns:
+            set: Selected target indexes.
+        """
+        selected = set()
+
+        for app in self.apps.select(tree):
+            components = tree[app]
+            for component in self.components.select(components):
+                modules = components[component]
+                for module in self.modules.select(modules):
+                    selected.update(modules[module])
+
+        if not self.models.everything:
+            by_models = set()
+            for name in self.models.select(models):
+                by_models.update(models[name])
+            selected &= by_models
+
+        return selected
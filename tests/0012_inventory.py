@@ -0,0 +1,71 @@
+import dataclasses
+
+import pytest
+
+from django_willpower.core import Application, DataModel, Field, InventoryView
+
+
+def test_inventory_view():
+    """
+    Inventory view should group model fields by their features.
+    """
+    app = Application(name="Blog", code="blog")
+    model = DataModel(
+        name="Article",
+        app=app,
+        modelfields=[
+            Field(name="title", required=True),
+            Field(name="status", kind="ChoiceField", choices_list=["draft", "online"]),
+            Field(name="blog", kind="ForeignKey", target="{appname}.Blog"),
+            Field(name="tags", kind="ManyToManyField", target="tags.Tag"),
+            Field(name="updated", kind="DateTimeField", auto_update=True),
+            Field(name="subtitle"),
+        ]
+    )
+
+    view = InventoryView.from_model(model)
+
+    assert view.name == "Article"
+    assert view.kinds == (
+        "CharField", "ChoiceField", "ForeignKey", "ManyToManyField", "DateTimeField",
+    )
+    assert [item.name for item in view.fields_by_kind["CharField"]] == [
+        "title",
+        "subtitle",
+    ]
+    assert [item.name for item in view.relation_fields] == ["blog", "tags"]
+    assert [item.name for item in view.choice_fields] == ["status"]
+    assert [item.name for item in view.auto_update_fields] == ["updated"]
+    assert [item.name for item in view.required_fields] == ["title"]
+    assert dict(view.targets) == {"blog": "blog.blog", "tags": "tags.tag"}
+    assert dict(view.imports) == {
+        "django.utils": ("timezone",),
+        "..choices": ("get_status_choices", "get_status_default"),
+    }
+
+    # View can not be modified
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        view.fields = ()
+
+    with pytest.raises(TypeError):
+        view.fields_by_kind["CharField"] = ()
+
+
+def test_inventory_view_imports():
+    """
+    Inventory view imports should only contain the names needed by model fields.
+    """
+    model = DataModel(
+        name="Rating",
+        modelfields=[
+            Field(name="score", kind="IntegerField", min_value=1, max_value=5),
+            Field(name="created", kind="DateTimeField", auto_creation=True),
+        ]
+    )
+    assert dict(InventoryView.from_model(model).imports) == {
+        "django.utils": ("timezone",),
+        "django.core.validators": ("MinValueValidator", "MaxValueValidator"),
+    }
+
+    model = DataModel(name="Tag", modelfields=[Field(name="title")])
+    assert dict(InventoryView.from_model(model).imports) == {}
@@ -224,3 +224,52 @@ def test_load_configuration_resolving(settings, load_json):
     assert module.component.code == "appviews"
     assert module.code == "init"
     assert module.component.app.get_model("Blog").readonly_fields == ["created"]
+
+
+def test_load_configuration_names(settings):
+    """
+    Loader should only load the applications with given codes and never read the
+    files of other applications.
+    """
+    project = ProjectRegistry()
+
+    project.load_configuration(
+        {
+            "apps": {
+                "blog": {
+                    "name": "Blog",
+                    "destination": "blog",
+                    "template_dir": (
+                        settings.configs_path / "appstack_single_component"
+                    ),
+                    "declarations": settings.configs_path / "models_basic_blog.json",
+                    "appstack": (
+                        settings.configs_path / "appstack_single_component"
+                        / "appstack.json"
+                    )
+                },
+                "other": {
+                    "name": "Other",
+                    "destination": "other",
+                    "template_dir": "nope",
+                    "declarations": "nope.json",
+                    "appstack": "nope.json",
+                },
+            },
+        },
+        names=["blog"],
+    )
+
+    assert list(project.apps.keys()) == ["blog"]
+    assert project.sources == [
+        (settings.configs_path / "models_basic_blog.json").resolve(),
+        (settings.configs_path / "appstack_single_component/appstack.json").resolve(),
+    ]
+
+    with pytest.raises(ProjectValidationError) as excinfo:
+        ProjectRegistry().load_configuration(
+            {"apps": {"blog": {}}},
+            names=["cms"],
+        )
+
+    assert str(excinfo.value) == "Project configuration has no application: cms"
@@ -0,0 +1,73 @@
+import pytest
+
+from django_willpower.utils.stackquery import StackQuery, expand_braces, split_list
+
+
+def test_split_list():
+    """
+    Lists should be splitted on commas which are not inside braces.
+    """
+    assert split_list("blog, cms,") == ["blog", "cms"]
+    assert split_list("app{views,urls},foo") == ["app{views,urls}", "foo"]
+
+    with pytest.raises(ValueError):
+        split_list("app{views")
+
+    with pytest.raises(ValueError):
+        split_list("app}views{")
+
+
+def test_expand_braces():
+    """
+    Braces alternatives should be expanded like a shell does.
+    """
+    assert expand_braces("foo") == ["foo"]
+    assert expand_braces("app{views,urls}") == ["appviews", "appurls"]
+    assert expand_braces("{a,b}{1,2}") == ["a1", "a2", "b1", "b2"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", [0, 1, 2, 3, 4, 5]),
+    ("*", [0, 1, 2, 3, 4, 5]),
+    ("blog@", [0, 1, 2, 3]),
+    ("blog,cms@app{views,urls}:*", [0, 1, 2, 4]),
+    ("*@appviews:init", [2]),
+    ("*@app*:module", [0, 1, 3, 4, 5]),
+    ("c?s@appviews", [4]),
+    ("#Article", [1, 2, 3]),
+    ("blog@appviews#Blog,Page", [0, 2]),
+    ("nope@appviews", []),
+    ("blog@appviews:nope", []),
+])
+def test_stack_query(query, expected):
+    """
+    Queries should select the target indexes matched by all their parts.
+    """
+    tree = {
+        "blog": {
+            "appviews": {"module": {0, 1}, "init": {2}},
+            "appadmins": {"module": {3}},
+        },
+        "cms": {
+            "appviews": {"module": {4}},
+            "appplugins": {"module": {5}},
+        },
+    }
+    models = {
+        "Blog": {0, 2},
+        "Article": {1, 2, 3},
+        "Page": {4, 5},
+    }
+
+    assert sorted(StackQuery(query).select(tree, models=models)) == expected
+
+
+def test_stack_query_invalid():
+    """
+    Invalid queries should raise an error when compiled.
+    """
+    with pytest.raises(ValueError):
+        StackQuery("a@b@c")
+
+    with pytest.raises(ValueError):
+        StackQuery("blog@app{views")
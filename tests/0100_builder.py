@@ -1,10 +1,15 @@
+import json
 import logging
 import os
+import shutil
 from pathlib import Path
 
+import pytest
+
 from django_willpower import __pkgname__
 from django_willpower.core import ProjectRegistry
 from django_willpower.core.builder import ProjectBuilder
+from django_willpower.exceptions import ProjectBuildError
 
 
 def test_build_process(caplog, load_json, settings, tmp_path):
@@ -66,3 +71,602 @@ def test_build_process(caplog, load_json, settings, tmp_path):
         "the-cms/plugins/page.py",
         "the-cms/views/page.py",
     ]
+
+
+def get_built_files(path):
+    """
+    Shortcut to get a dict of all built files contents indexed on their relative path.
+    """
+    built_files = {}
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            filepath = Path(root) / name
+            built_files[str(filepath.relative_to(path))] = filepath.read_text()
+
+    return built_files
+
+
+def test_build_targets(project_registry, tmp_path):
+    """
+    Builder should expand applications into build targets with their resolved
+    destination and an estimated cost.
+    """
+    builder = ProjectBuilder(project_registry(), tmp_path)
+
+    assert [
+        (
+            target.get_path(),
+            str(target.destination.relative_to(tmp_path)),
+            target.cost,
+        )
+        for target in builder.get_targets()
+    ] == [
+        ("blog@appviews:module#Blog", "the-blog/views/blog.py", 3),
+        ("blog@appviews:module#Article", "the-blog/views/article.py", 4),
+        ("blog@appviews:init", "the-blog/views/__init__.py", 7),
+        ("cms@appviews:module#Page", "the-cms/views/page.py", 4),
+        ("cms@applugins:module#Page", "the-cms/plugins/page.py", 4),
+    ]
+
+    # Targets can be restricted to some applications
+    assert [
+        target.get_path()
+        for target in builder.get_targets(names=["cms"])
+    ] == [
+        "cms@appviews:module#Page",
+        "cms@applugins:module#Page",
+    ]
+
+
+def test_build_plan(project_registry, tmp_path):
+    """
+    Plan should list targets without rendering anything and mark the unchanged ones
+    in incremental mode, then it can be built as is.
+    """
+    project = project_registry()
+    projectdir = tmp_path / "project"
+
+    builder = ProjectBuilder(project, projectdir, incremental=True)
+    plan = builder.plan()
+    assert not projectdir.exists()
+    assert plan.skipped == set()
+    assert plan.pending == [0, 1, 2, 3, 4]
+    assert plan.as_dict()["targets"][0] == {
+        "path": "blog@appviews:module#Blog",
+        "app": "blog",
+        "component": "appviews",
+        "module": "module",
+        "model": "Blog",
+        "template": "views/module.py",
+        "destination": "the-blog/views/blog.py",
+        "copy": False,
+        "cost": 3,
+        "skip": False,
+        "exclude": False,
+    }
+
+    builder.process(plan=plan)
+    assert builder.stats["rendered"] == 5
+
+    # Plan does not need to load template of a changed target
+    project.find("cms@applugins:module").template = "plugins/other.py"
+    plan = ProjectBuilder(project, projectdir, incremental=True).plan(
+        names=["cms"]
+    )
+    assert plan.pending == [1]
+    payload = plan.as_dict()
+    assert (payload["build"], payload["skip"]) == (1, 1)
+    assert [item["skip"] for item in payload["targets"]] == [True, False]
+
+
+def test_build_plan_conflicts(project_registry, tmp_path):
+    """
+    Planning should fail on duplicate module codes and on targets with the same
+    destination.
+    """
+    project = project_registry()
+    plan = ProjectBuilder(project, tmp_path).plan()
+    assert plan.directories == {
+        tmp_path / "the-blog" / "views",
+        tmp_path / "the-cms" / "views",
+        tmp_path / "the-cms" / "plugins",
+    }
+    assert plan.destinations[tmp_path / "the-cms" / "plugins" / "page.py"] == 4
+
+    project.find("cms@applugins").directory = "views"
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, tmp_path).plan()
+
+    assert str(excinfo.value) == (
+        "Targets 'cms@appviews:module#Page' and 'cms@applugins:module#Page' resolve "
+        "to the same destination: {}"
+    ).format(tmp_path / "the-cms" / "views" / "page.py")
+
+    project = project_registry()
+    project.find("blog@appviews:init").code = "module"
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, tmp_path).process()
+
+    assert str(excinfo.value) == (
+        "Component 'blog@appviews' has more than one module with code: module"
+    )
+    assert not (tmp_path / "the-blog").exists()
+
+
+def test_build_inventory_views(project_registry, tmp_path):
+    """
+    Inventory view of a model should be computed once and shared by all its targets.
+    """
+    project = project_registry()
+    builder = ProjectBuilder(project, tmp_path)
+    model = project.apps["blog"].get_model("Article")
+
+    view = builder.get_inventory_view(model)
+    assert view.model is model
+    assert builder.get_inventory_view(model) is view
+
+    # Views are computed again for a new build
+    builder.plan()
+    assert builder.get_inventory_view(model) is not view
+
+
+def test_build_target_inputs(project_registry, tmp_path):
+    """
+    Target inputs should not include application and component children and should
+    be serialized once for all targets.
+    """
+    project = project_registry()
+    builder = ProjectBuilder(project, tmp_path)
+    blog, article, init = builder.get_targets(names=["blog"])
+
+    app, component, module, model = builder.get_target_inputs(article)
+    assert app["code"] == "blog"
+    assert "components" not in app
+    assert "models" not in app
+    assert component["code"] == "appviews"
+    assert "modules" not in component
+    assert module["code"] == "module"
+    assert model["name"] == "Article"
+
+    # Inputs are shared with the other targets
+    assert builder.get_target_inputs(blog)[0] is app
+    assert builder.get_target_inputs(init)[3][1] is model
+
+    # Inputs are serialized again for a new build
+    builder.plan()
+    assert builder.get_target_inputs(article)[0] is not app
+
+
+def test_build_parallel(project_registry, tmp_path):
+    """
+    Parallel mode should build exactly the same files than the sequential mode.
+    """
+    sequential_dir = tmp_path / "sequential"
+    parallel_dir = tmp_path / "parallel"
+
+    ProjectBuilder(project_registry(), sequential_dir).process()
+    ProjectBuilder(project_registry(), parallel_dir, jobs=3).process()
+
+    sequential_files = get_built_files(sequential_dir)
+    assert len(sequential_files) == 5
+    assert get_built_files(parallel_dir) == sequential_files
+
+
+def test_build_parallel_failfast(project_registry, tmp_path):
+    """
+    Parallel mode should stop on the first error and raise it as a build error.
+    """
+    project = project_registry()
+    project.find("cms@applugins:module").template = "plugins/nope.py"
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, tmp_path, jobs=2, preflight=False).process()
+
+    assert str(excinfo.value).startswith(
+        "Unable to render 'cms@applugins:module#Page': TemplateNotFound: "
+        "'plugins/nope.py' not found"
+    )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_build_incremental(project_registry, tmp_path, jobs):
+    """
+    Incremental mode should only render targets which inputs have changed since the
+    previous build, the same way when targets are rendered from worker processes.
+    """
+    project = project_registry()
+
+    builder = ProjectBuilder(project, tmp_path, incremental=True, jobs=jobs)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 5,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 0,
+        "written": 5,
+        "unchanged": 0,
+    }
+    assert (tmp_path / ".willpower-manifest.json").exists()
+
+    # Nothing changed
+    builder = ProjectBuilder(project, tmp_path, incremental=True, jobs=jobs)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 0,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 5,
+        "written": 0,
+        "unchanged": 0,
+    }
+
+    # A model change invalidates its modules and the modules for all models which
+    # have accessed the changed attribute
+    project.apps["blog"].get_model("Article").view_basename = "Post{}View"
+    builder = ProjectBuilder(project, tmp_path, incremental=True, jobs=jobs)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 2,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 3,
+        "written": 2,
+        "unchanged": 0,
+    }
+
+    # Field labels are not used by any template
+    project.apps["blog"].get_model("Article").modelfields[0].label = "Changed"
+    builder = ProjectBuilder(project, tmp_path, incremental=True, jobs=jobs)
+    builder.process()
+    assert builder.stats["rendered"] == 0
+
+    # Without attribute tracking any model change invalidates every module of its
+    # application since a template may read sibling models
+    coarse_dir = tmp_path / "coarse"
+    ProjectBuilder(
+        project,
+        coarse_dir,
+        incremental=True,
+        track_attributes=False,
+        jobs=jobs,
+    ).process()
+    project.apps["blog"].get_model("Article").modelfields[0].label = "Again"
+    builder = ProjectBuilder(
+        project,
+        coarse_dir,
+        incremental=True,
+        track_attributes=False,
+        jobs=jobs,
+    )
+    builder.process()
+    assert builder.stats == {
+        "rendered": 3,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 2,
+        "written": 0,
+        "unchanged": 3,
+    }
+
+    # A removed output is built again
+    (tmp_path / "the-cms" / "plugins" / "page.py").unlink()
+    builder = ProjectBuilder(project, tmp_path, incremental=True, jobs=jobs)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 1,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 4,
+        "written": 1,
+        "unchanged": 0,
+    }
+    assert (tmp_path / "the-cms" / "plugins" / "page.py").exists()
+
+
+def test_build_incremental_dependencies(settings, tmp_path):
+    """
+    Incremental mode should only render targets that have loaded a changed template,
+    including the ones loaded from 'include' and 'import' tags.
+    """
+    template_dir = tmp_path / "stack"
+    projectdir = tmp_path / "project"
+    shutil.copytree(settings.data_path / "default_stack", template_dir)
+
+    project = ProjectRegistry()
+    project.load_configuration({
+        "apps": {
+            "sample": {
+                "name": "Sample",
+                "destination": "sample",
+                "template_dir": template_dir,
+                "declarations": settings.data_path / "sample_declarations.json",
+                "appstack": template_dir / "appstack.json",
+            },
+        },
+    })
+
+    builder = ProjectBuilder(project, projectdir, incremental=True)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 33,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 0,
+        "written": 33,
+        "unchanged": 0,
+    }
+
+    # Dependency graph has been recorded
+    assert builder.manifest.get_dependents("models/fields/BooleanField.py") == [
+        "sample/models/article.py",
+        "sample/models/comment.py",
+    ]
+    assert builder.manifest.get_dependents("_utils.jinja") == [
+        "sample/models/article.py",
+        "sample/models/blog.py",
+        "sample/models/comment.py",
+    ]
+
+    # Change a field template included from model module template
+    field_template = template_dir / "models" / "fields" / "BooleanField.py"
+    field_template.write_text(field_template.read_text() + "\n    # Changed\n")
+
+    builder = ProjectBuilder(project, projectdir, incremental=True)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 2,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 31,
+        "written": 2,
+        "unchanged": 0,
+    }
+    assert "# Changed" in (projectdir / "sample/models/comment.py").read_text()
+
+    # Change macros imported from field templates
+    utils_template = template_dir / "_utils.jinja"
+    utils_template.write_text(utils_template.read_text() + "\n")
+
+    builder = ProjectBuilder(project, projectdir, incremental=True)
+    builder.process()
+    assert builder.stats == {
+        "rendered": 3,
+        "cached": 0,
+        "copied": 0,
+        "skipped": 30,
+        "written": 0,
+        "unchanged": 3,
+    }
+
+
+def test_build_skip_identical(project_registry, tmp_path):
+    """
+    Builder should not write again a file that already has the same content.
+    """
+    project = project_registry()
+    page_path = tmp_path / "the-cms" / "plugins" / "page.py"
+
+    builder = ProjectBuilder(project, tmp_path)
+    builder.process()
+    assert builder.stats["written"] == 5
+    assert builder.stats["unchanged"] == 0
+
+    # Set an old modification time to check it is left untouched
+    os.utime(page_path, (0, 0))
+    # Change content of a file without changing its size
+    view_path = tmp_path / "the-cms" / "views" / "page.py"
+    view_path.write_text(view_path.read_text().replace("Page", "Paeg"))
+
+    builder = ProjectBuilder(project, tmp_path)
+    builder.process()
+    assert builder.stats["written"] == 1
+    assert builder.stats["unchanged"] == 4
+    assert page_path.stat().st_mtime == 0
+    assert "Paeg" not in view_path.read_text()
+
+    # Files are always written when disabled
+    builder = ProjectBuilder(project, tmp_path, skip_identical=False)
+    builder.process()
+    assert builder.stats["written"] == 5
+    assert builder.stats["unchanged"] == 0
+    assert page_path.stat().st_mtime != 0
+
+
+def test_build_streaming(project_registry, tmp_path):
+    """
+    Streaming mode should build the same files than the default mode without leaving
+    any temporary file and without altering a file when rendering fails.
+    """
+    default_dir = tmp_path / "default"
+    sequential_dir = tmp_path / "sequential"
+    parallel_dir = tmp_path / "parallel"
+
+    ProjectBuilder(project_registry(), default_dir).process()
+    default_files = get_built_files(default_dir)
+
+    builder = ProjectBuilder(
+        project_registry(),
+        sequential_dir,
+        streaming=True
+    )
+    builder.process()
+    assert builder.stats["written"] == 5
+    assert get_built_files(sequential_dir) == default_files
+
+    builder = ProjectBuilder(
+        project_registry(),
+        parallel_dir,
+        streaming=True,
+        jobs=2
+    )
+    builder.process()
+    assert builder.stats["written"] == 5
+    assert get_built_files(parallel_dir) == default_files
+
+    # Identical files are left untouched
+    builder = ProjectBuilder(
+        project_registry(),
+        sequential_dir,
+        streaming=True
+    )
+    builder.process()
+    assert builder.stats["written"] == 0
+    assert builder.stats["unchanged"] == 5
+    assert get_built_files(sequential_dir) == default_files
+
+    # A failing render does not alter the existing file
+    project = project_registry()
+    project.apps["cms"].get_model("Page").view_basename = None
+
+    with pytest.raises(ProjectBuildError):
+        ProjectBuilder(project, sequential_dir, streaming=True).process()
+
+    # Only the journal of the failed build has been added
+    built_files = get_built_files(sequential_dir)
+    assert built_files.pop(".willpower-journal.jsonl")
+    assert built_files == default_files
+
+
+def test_build_copy_without_render(settings, tmp_path):
+    """
+    Module with 'copy_without_render' should be copied as is without any rendering.
+    """
+    template_dir = tmp_path / "stack"
+    projectdir = tmp_path / "project"
+    shutil.copytree(settings.configs_path / "appstack_single_component", template_dir)
+
+    # A binary file which is not valid UTF-8 and would not be valid Jinja template
+    asset = template_dir / "static" / "logo.png"
+    asset.parent.mkdir()
+    asset.write_bytes(b"\x89PNG\r\n\xff\xfe{{ nope }}{% nope %}" * 1000)
+
+    appstack = json.loads((template_dir / "appstack.json").read_text())
+    appstack["components"].append({
+        "name": "Static",
+        "code": "static",
+        "directory": "static",
+        "modules": [
+            {
+                "name": "Logo",
+                "code": "logo",
+                "template": "static/logo.png",
+                "destination_pattern": "logo.png",
+                "once": True,
+                "copy_without_render": True,
+            },
+        ],
+    })
+
+    project = ProjectRegistry()
+    project.load_configuration({
+        "apps": {
+            "blog": {
+                "name": "Blog app",
+                "destination": "the-blog",
+                "template_dir": template_dir,
+                "declarations": settings.configs_path / "models_basic_blog.json",
+                "appstack": appstack,
+            },
+        },
+    })
+
+    for jobs in (1, 2):
+        builddir = projectdir / str(jobs)
+        builder = ProjectBuilder(project, builddir, jobs=jobs, incremental=True)
+        builder.process()
+
+        assert builder.stats["copied"] == 1
+        assert builder.stats["rendered"] == 3
+        assert (
+            builddir / "the-blog" / "static" / "logo.png"
+        ).read_bytes() == asset.read_bytes()
+
+    # Preview of a copied file is its content as is
+    assert builder.render_module("blog@static:logo") == asset.read_bytes()
+
+    # Copied file is skipped with incremental mode
+    builder = ProjectBuilder(project, builddir, incremental=True)
+    builder.process()
+    assert builder.stats["copied"] == 0
+    assert builder.stats["skipped"] == 4
+
+    # Identical file is not written again
+    builder = ProjectBuilder(project, builddir)
+    builder.process()
+    assert builder.stats["copied"] == 1
+    assert builder.stats["written"] == 0
+    assert builder.stats["unchanged"] == 4
+
+    # Changed file is copied again
+    asset.write_bytes(b"\x00\xff")
+    builder = ProjectBuilder(project, builddir, incremental=True)
+    builder.process()
+    assert builder.stats["copied"] == 1
+    assert builder.stats["written"] == 1
+    assert (builddir / "the-blog" / "static" / "logo.png").read_bytes() == b"\x00\xff"
+
+
+def test_render_module(settings, project_registry, tmp_path):
+    """
+    A single module output should be rendered from its stack path without writing
+    anything and with only the templates it needs.
+    """
+    project = project_registry()
+    builder = ProjectBuilder(project, tmp_path)
+
+    content = builder.render_module("blog@appviews:module", model="Article")
+    assert "ArticleIndexView" in content
+    assert list(builder._environments.keys()) == [
+        settings.configs_path / "appstack_single_component"
+    ]
+    assert list(tmp_path.iterdir()) == []
+
+    # Model name is ignored for a module built once
+    assert builder.render_module("blog@appviews:init", model="Nope") == (
+        builder.render_module("blog@appviews:init")
+    )
+
+    # Model name is optional for an application with a single model
+    assert "PageIndexView" in builder.render_module("cms@appviews:module")
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        builder.render_module("blog@appviews:module")
+    assert str(excinfo.value) == (
+        "Module 'blog@appviews:module' requires a model name among: Blog, Article"
+    )
+
+    with pytest.raises(ProjectBuildError):
+        builder.render_module("blog@appviews")
+
+    with pytest.raises(ProjectBuildError):
+        builder.render_module("blog@nope:module")
+
+
+def test_build_only(project_registry, tmp_path):
+    """
+    Builder should only build the targets selected by stack queries and only expand
+    the applications they match.
+    """
+    project = project_registry()
+
+    builder = ProjectBuilder(project, tmp_path)
+    plan = builder.plan(only=["*@appviews:module#Article,Page"])
+    assert plan.names == ["blog", "cms"]
+    assert [plan.targets[index].get_path() for index in plan.pending] == [
+        "blog@appviews:module#Article",
+        "cms@appviews:module#Page",
+    ]
+    assert plan.as_dict()["exclude"] == len(plan.targets) - 2
+
+    builder.process(only=["cms@*"])
+    assert builder.stats["rendered"] == 2
+    assert sorted(get_built_files(tmp_path)) == [
+        "the-cms/plugins/page.py",
+        "the-cms/views/page.py",
+    ]
+
+    plan = builder.plan(only=["nope@*"])
+    assert plan.targets == []
+
+    with pytest.raises(ProjectBuildError):
+        builder.plan(only=["blog@{views"])
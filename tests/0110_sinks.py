@@ -0,0 +1,245 @@
+import os
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from django_willpower.core import (
+    FilesystemSink, MemorySink, ProjectBuilder, TarSink, ZipSink,
+)
+from django_willpower.exceptions import ProjectBuildError
+
+
+def get_built_files(path):
+    """
+    Shortcut to get a dict of all built files contents indexed on their relative path.
+    """
+    built_files = {}
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            filepath = Path(root) / name
+            built_files[str(filepath.relative_to(path))] = filepath.read_bytes()
+
+    return built_files
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_memory_sink(project_registry, tmp_path, streaming):
+    """
+    Memory sink should store the same contents than the filesystem without writing
+    anything.
+    """
+    ProjectBuilder(project_registry(), tmp_path / "files").process()
+    expected = get_built_files(tmp_path / "files")
+
+    sink = MemorySink(tmp_path / "memory")
+    builder = ProjectBuilder(
+        project_registry(),
+        tmp_path / "memory",
+        sink=sink,
+        streaming=streaming,
+    )
+    builder.process()
+
+    assert sink.files == expected
+    assert builder.stats["written"] == 5
+    assert not (tmp_path / "memory").exists()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_zip_sink(project_registry, tmp_path, streaming):
+    """
+    ZIP sink should write every modules into a single archive.
+    """
+    ProjectBuilder(project_registry(), tmp_path / "files").process()
+    expected = get_built_files(tmp_path / "files")
+
+    archive = tmp_path / "project.zip"
+    ProjectBuilder(
+        project_registry(),
+        tmp_path / "project",
+        sink=ZipSink(tmp_path / "project", archive),
+        streaming=streaming,
+    ).process()
+
+    with zipfile.ZipFile(archive) as zf:
+        assert {name: zf.read(name) for name in zf.namelist()} == expected
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_tar_sink(project_registry, tmp_path, streaming):
+    """
+    TAR sink should write every modules into a single gzipped archive.
+    """
+    ProjectBuilder(project_registry(), tmp_path / "files").process()
+    expected = get_built_files(tmp_path / "files")
+
+    archive = tmp_path / "project.tar.gz"
+    ProjectBuilder(
+        project_registry(),
+        tmp_path / "project",
+        sink=TarSink(tmp_path / "project", archive),
+        streaming=streaming,
+        jobs=2,
+    ).process()
+
+    with tarfile.open(archive, "r:gz") as tf:
+        assert {
+            member.name: tf.extractfile(member).read()
+            for member in tf.getmembers()
+        } == expected
+
+
+def test_sink_containment(project_registry, tmp_path):
+    """
+    Every sink should refuse to write a module outside of the project directory and
+    an aborted archive should be removed.
+    """
+    archive = tmp_path / "project.zip"
+    sinks = [
+        MemorySink(tmp_path / "project"),
+        ZipSink(tmp_path / "project", archive),
+        TarSink(tmp_path / "project", tmp_path / "project.tar.gz"),
+    ]
+
+    for sink in sinks:
+        project = project_registry()
+        project.find("cms@applugins:module").destination_pattern = (
+            "../../../{model}.py"
+        )
+
+        with pytest.raises(ProjectBuildError) as excinfo:
+            ProjectBuilder(project, tmp_path / "project", sink=sink).process()
+
+        assert str(excinfo.value) == (
+            "Resolved module path is not a child of the project directory: "
+            "{}/page.py".format(tmp_path)
+        )
+
+    assert not archive.exists()
+    assert not (tmp_path / "project.tar.gz").exists()
+
+    # Incremental mode requires a filesystem sink
+    with pytest.raises(ProjectBuildError):
+        ProjectBuilder(
+            project_registry(),
+            tmp_path / "project",
+            sink=MemorySink(tmp_path / "project"),
+            incremental=True,
+        )
+
+
+def test_filesystem_sink_prepare(monkeypatch, tmp_path):
+    """
+    Filesystem sink should create every parent directories once before writing
+    modules.
+    """
+    projectdir = tmp_path / "project"
+    sink = FilesystemSink(projectdir)
+    paths = [
+        projectdir / "blog" / "views" / "blog.py",
+        projectdir / "blog" / "views" / "article.py",
+        projectdir / "blog" / "models.py",
+    ]
+
+    sink.prepare(paths)
+    assert sink.directories == {projectdir / "blog", projectdir / "blog" / "views"}
+    assert (projectdir / "blog" / "views").is_dir()
+
+    # Writing into a prepared directory does not check it anymore
+    def fail_exists(self):
+        raise AssertionError("Path.exists() should not be called")
+
+    monkeypatch.setattr(Path, "exists", fail_exists)
+    for path in paths:
+        assert sink.write(path, b"content") is True
+    monkeypatch.undo()
+
+    with pytest.raises(ProjectBuildError):
+        sink.prepare([tmp_path / "other.py"])
+
+
+@pytest.mark.parametrize("options", [{}, {"staged": True}])
+def test_filesystem_sink_reused(project_registry, tmp_path, options):
+    """
+    A builder should build again into a project directory which has been removed
+    since its previous build.
+    """
+    projectdir = tmp_path / "project"
+    builder = ProjectBuilder(project_registry(), projectdir, **options)
+
+    builder.process()
+    shutil.rmtree(projectdir)
+    builder.process()
+
+    assert builder.stats["written"] == 5
+    assert (projectdir / "the-blog" / "views" / "blog.py").is_file()
+
+
+def test_staged_sink(project_registry, tmp_path):
+    """
+    Staged build should swap application destinations once every modules are written,
+    keep files not managed by builder and leave previous output intact on failure.
+    """
+    ProjectBuilder(project_registry(), tmp_path).process()
+    previous = get_built_files(tmp_path)
+
+    # Some file not managed by builder
+    (tmp_path / "the-blog" / "custom.py").write_text("custom")
+    page_inode = (tmp_path / "the-cms" / "plugins" / "page.py").stat().st_ino
+
+    # An aborted build leaves previous output intact without any staging directory
+    project = project_registry()
+    project.apps["blog"].get_model("Article").name = "Post"
+    project.find("cms@applugins:module").template = "plugins/nope.py"
+
+    with pytest.raises(ProjectBuildError):
+        ProjectBuilder(project, tmp_path, staged=True).process()
+
+    assert sorted([item.name for item in tmp_path.iterdir()]) == [
+        "the-blog",
+        "the-cms",
+    ]
+    assert get_built_files(tmp_path) == dict(previous, **{
+        "the-blog/custom.py": b"custom"
+    })
+
+    # Successful build swaps destinations
+    project.find("cms@applugins:module").template = "plugins/module.py"
+    builder = ProjectBuilder(project, tmp_path, staged=True)
+    builder.process()
+
+    assert sorted([item.name for item in tmp_path.iterdir()]) == [
+        "the-blog",
+        "the-cms",
+    ]
+    assert builder.stats["written"] == 2
+    assert builder.stats["unchanged"] == 3
+    assert (tmp_path / "the-blog" / "custom.py").read_text() == "custom"
+    assert "from ..models import Post\n" in (
+        tmp_path / "the-blog" / "views" / "article.py"
+    ).read_text()
+    # Unchanged file is the same file
+    assert (tmp_path / "the-cms" / "plugins" / "page.py").stat().st_ino == page_inode
+
+    # Nothing changed so destinations are not swapped
+    blog_inode = (tmp_path / "the-blog").stat().st_ino
+    builder = ProjectBuilder(project, tmp_path, staged=True)
+    builder.process()
+    assert builder.stats["written"] == 0
+    assert (tmp_path / "the-blog").stat().st_ino == blog_inode
+    assert sorted([item.name for item in tmp_path.iterdir()]) == [
+        "the-blog",
+        "the-cms",
+    ]
+
+    # A staged build can not use another sink
+    with pytest.raises(ProjectBuildError):
+        ProjectBuilder(
+            project,
+            tmp_path,
+            sink=MemorySink(tmp_path),
+            staged=True
+        )
@@ -0,0 +1,218 @@
+import json
+import os
+import shutil
+
+import pytest
+from jinja2 import Environment
+
+from django_willpower.core import FileBytecodeCache, ProjectBuilder, RenderCache
+from django_willpower.core.caches import LRUDirectory
+
+
+def get_shared_registry(project_registry, settings, template_dir=None):
+    """
+    Shortcut to get a registry with the blog and CMS applications sharing the same
+    template directory.
+    """
+    return project_registry(
+        template_dir=template_dir or settings.data_path / "default_stack",
+        declarations=settings.data_path / "sample_declarations.json",
+    )
+
+
+def get_built_files(path):
+    """
+    Shortcut to get a dict of all built files contents indexed on their relative path.
+    """
+    return {
+        str(filepath.relative_to(path)): filepath.read_text()
+        for filepath in path.rglob("*")
+        if filepath.is_file()
+    }
+
+
+def test_lru_directory(tmp_path):
+    """
+    Cache directory should evict least recently used files first.
+    """
+    storage = LRUDirectory(tmp_path / "cache", max_size=25)
+
+    for index, name in enumerate(["first", "second", "third"]):
+        path = storage.directory / name
+        storage.write(path, b"0123456789")
+        os.utime(path, (index, index))
+
+    # Reading the first file makes it the most recently used
+    assert storage.read(storage.directory / "first") == b"0123456789"
+    assert storage.read(storage.directory / "nope") is None
+
+    assert storage.stats() == {"files": 3, "size": 30, "max_size": 25}
+    assert storage.prune() == 1
+    assert sorted([path.name for path, stat in storage.get_files()]) == [
+        "first",
+        "third",
+    ]
+
+    assert storage.prune(max_size=0) == 2
+    assert storage.stats()["files"] == 0
+
+
+def test_shared_environment(settings, project_registry, tmp_path):
+    """
+    Applications with the same template directory should share the same Jinja
+    environment.
+    """
+    project = get_shared_registry(project_registry, settings)
+    builder = ProjectBuilder(project, tmp_path)
+
+    assert builder.get_app_environment(project.apps["blog"]) is (
+        builder.get_app_environment(project.apps["cms"])
+    )
+
+
+def test_bytecode_cache(monkeypatch, settings, project_registry, tmp_path):
+    """
+    Templates compiled from a build should be loaded from bytecode cache in the next
+    builds.
+    """
+    compiled = []
+    original_compile = Environment.compile
+
+    def counting_compile(self, source, name=None, *args, **kwargs):
+        compiled.append(name)
+        return original_compile(self, source, name, *args, **kwargs)
+
+    monkeypatch.setattr(Environment, "compile", counting_compile)
+
+    project = get_shared_registry(project_registry, settings)
+    cache = FileBytecodeCache(tmp_path / "cache")
+
+    ProjectBuilder(project, tmp_path / "first", bytecode_cache=cache).process()
+    # Every templates are compiled once even if two applications use them
+    assert len(compiled) == len(set(compiled))
+    assert "_utils.jinja" in compiled
+    assert cache.storage.stats()["files"] == len(compiled)
+
+    compiled.clear()
+    ProjectBuilder(
+        project,
+        tmp_path / "second",
+        bytecode_cache=FileBytecodeCache(tmp_path / "cache"),
+    ).process()
+    assert compiled == []
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_render_cache(settings, project_registry, tmp_path, jobs):
+    """
+    Rendered targets should be got from render cache when their inputs and templates
+    have not changed, even from another project and template directory.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.data_path / "default_stack", template_dir)
+    cache = RenderCache(tmp_path / "cache")
+
+    builder = ProjectBuilder(
+        get_shared_registry(project_registry, settings, template_dir=template_dir),
+        tmp_path / "first",
+        render_cache=cache,
+        jobs=jobs,
+    )
+    builder.process()
+    assert (builder.stats["rendered"], builder.stats["cached"]) == (66, 0)
+    # Both applications have the same render context but their code
+    assert cache.stats()["files"] == 66 * 2
+
+    # Same stack from another location
+    other_dir = tmp_path / "other-stack"
+    shutil.copytree(template_dir, other_dir)
+    builder = ProjectBuilder(
+        get_shared_registry(project_registry, settings, template_dir=other_dir),
+        tmp_path / "second",
+        render_cache=cache,
+        jobs=jobs,
+    )
+    targets = builder.process()
+    assert (builder.stats["rendered"], builder.stats["cached"]) == (0, 66)
+    assert "_utils.jinja" in targets[0].dependencies
+    assert get_built_files(tmp_path / "second") == get_built_files(
+        tmp_path / "first"
+    )
+
+    # A changed template is rendered again and stored as another variant
+    source = template_dir / "models" / "fields" / "CharField.py"
+    original = source.read_text()
+    source.write_text(original + "# Changed")
+    builder = ProjectBuilder(
+        get_shared_registry(project_registry, settings, template_dir=template_dir),
+        tmp_path / "third",
+        render_cache=cache,
+        jobs=jobs,
+    )
+    builder.process()
+    assert (builder.stats["rendered"], builder.stats["cached"]) == (6, 60)
+    built = (tmp_path / "third" / "the-blog" / "models" / "blog.py").read_text()
+    assert "# Changed" in built
+
+    # Previous variant is still available
+    source.write_text(original)
+    builder = ProjectBuilder(
+        get_shared_registry(project_registry, settings, template_dir=template_dir),
+        tmp_path / "fourth",
+        render_cache=cache,
+        jobs=jobs,
+    )
+    builder.process()
+    assert (builder.stats["rendered"], builder.stats["cached"]) == (0, 66)
+    assert get_built_files(tmp_path / "fourth") == get_built_files(
+        tmp_path / "first"
+    )
+
+
+def test_render_cache_siblings(settings, project_registry, load_json, tmp_path):
+    """
+    Cached renders should be invalidated when a template can reach changed sibling
+    models from the application.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.data_path / "default_stack", template_dir)
+    template = template_dir / "templates" / "model_detail.html"
+    template.write_text(
+        template.read_text() +
+        "<!-- Siblings: {{ app.models|map(attribute='name')|join(',') }} -->\n"
+    )
+    declarations = tmp_path / "declarations.json"
+    shutil.copyfile(settings.data_path / "sample_declarations.json", declarations)
+    cache = RenderCache(tmp_path / "cache")
+
+    def build(destination):
+        builder = ProjectBuilder(
+            project_registry(
+                "blog",
+                template_dir=template_dir,
+                declarations=declarations,
+            ),
+            destination,
+            render_cache=cache,
+        )
+        builder.process()
+        return builder
+
+    build(tmp_path / "first")
+    detail = tmp_path / "first" / "the-blog" / "templates" / "blog" / "blog"
+    assert "Siblings: Blog,Article,Comment -->" in (detail / "detail.html").read_text()
+
+    # A new model changes the whole application so nothing is got from cache
+    data = load_json(declarations)
+    data["Tag"] = {"fields": {"title": {"kind": "CharField"}}}
+    declarations.write_text(json.dumps(data))
+    builder = build(tmp_path / "second")
+    assert builder.stats["cached"] == 0
+    detail = tmp_path / "second" / "the-blog" / "templates" / "blog" / "blog"
+    assert "Siblings: Blog,Article,Comment,Tag -->" in (
+        (detail / "detail.html").read_text()
+    )
+
+    # Unchanged application is still got from cache
+    builder = build(tmp_path / "third")
+    assert builder.stats["rendered"] == 0
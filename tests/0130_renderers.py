@@ -0,0 +1,113 @@
+from jinja2 import DictLoader, Environment
+
+from django_willpower.core import DataModel, Field
+from django_willpower.core.renderers import FieldRendererRegistry
+from django_willpower.core.tracking import TrackingLoader
+
+
+def get_environment():
+    """
+    Shortcut to get an environment with some field templates and a registry
+    installed.
+    """
+    loader = TrackingLoader(DictLoader({
+        "_utils.jinja": "{% macro label(value) %}<{{ value }}>{% endmacro %}",
+        "models/module.py": (
+            "{% for field in fields %}{{ render_field(field) }};{% endfor %}"
+        ),
+        "models/fields/CharField.py": "char {{ field.name }} {{ utils.label(name) }}",
+        "models/fields/TextField.py": "text {{ field.name }}",
+        "custom.py": "custom {{ field.name }}",
+        "direct.py": "{{ utils.label(name) }}",
+        "plain.py": "{{ name }}",
+    }))
+    env = Environment(loader=loader, cache_size=0)
+
+    registry = FieldRendererRegistry(env)
+    registry.install()
+
+    return env, registry
+
+
+def test_field_renderers():
+    """
+    Fields should be rendered with the template of their kind or their custom
+    template, each template is loaded only once.
+    """
+    env, registry = get_environment()
+    model = DataModel(
+        name="Article",
+        modelfields=[
+            Field(name="title"),
+            Field(name="content", kind="TextField"),
+            Field(name="subtitle"),
+            Field(name="slug", modelfield_template="custom.py"),
+        ]
+    )
+
+    loaded = []
+    original_load = env.loader.load
+
+    def counting_load(environment, name, globals=None):
+        loaded.append(name)
+        return original_load(environment, name, globals)
+
+    env.loader.load = counting_load
+
+    with env.loader.track() as dependencies:
+        rendered = env.get_template("models/module.py").render(
+            name="article",
+            fields=model.modelfields,
+        )
+
+    assert rendered == (
+        "char title <article>;text content;char subtitle <article>;custom slug;"
+    )
+    assert loaded == [
+        "models/module.py",
+        "models/fields/CharField.py",
+        "models/fields/TextField.py",
+        "custom.py",
+    ]
+    # Templates rendered from the registry are still tracked
+    assert dependencies == {
+        "_utils.jinja",
+        "custom.py",
+        "models/fields/CharField.py",
+        "models/fields/TextField.py",
+        "models/module.py",
+    }
+    assert list(registry.renderers.keys()) == ["CharField", "TextField"]
+    assert list(registry.custom_renderers.keys()) == ["custom.py"]
+
+    registry.clear()
+    assert registry.renderers == {}
+    assert registry.custom_renderers == {}
+
+
+def test_field_renderers_utils_dependency():
+    """
+    Utils template should be recorded as a dependency of templates which use its
+    macros directly, but not of the ones which do not use it.
+    """
+    env, registry = get_environment()
+
+    with env.loader.track() as dependencies:
+        rendered = env.get_template("direct.py").render(name="article")
+
+    assert rendered == "<article>"
+    assert dependencies == {"_utils.jinja", "direct.py"}
+
+    with env.loader.track() as dependencies:
+        rendered = env.get_template("plain.py").render(name="article")
+
+    assert rendered == "article"
+    assert dependencies == {"plain.py"}
+
+    # Still recorded once the global has been installed again
+    registry.clear()
+
+    with env.loader.track() as dependencies:
+        env.get_template("direct.py").render(name="article")
+
+    assert dependencies == {"_utils.jinja", "direct.py"}
@@ -0,0 +1,85 @@
+from jinja2 import Environment
+
+from django_willpower.core import Application, DataModel, Field
+from django_willpower.core.attributes import (
+    WHOLE_OBJECT, AttributeRecorder, get_signature,
+)
+
+
+def get_application():
+    """
+    Shortcut to get an application with a single model.
+    """
+    app = Application(
+        name="Blog",
+        code="blog",
+        models=[
+            DataModel(
+                name="Article",
+                modelfields=[
+                    Field(name="title"),
+                    Field(name="content", kind="TextField"),
+                ]
+            ),
+        ]
+    )
+
+    return app
+
+
+def test_attribute_recorder():
+    """
+    Recorder should record every attribute accessed from a template, including the
+    ones from objects reached through a tracked object.
+    """
+    app = get_application()
+    model = app.models[0]
+    recorder = AttributeRecorder()
+
+    template = Environment().from_string(
+        "{{ model.name }}:{% for field in model.modelfields %}"
+        "{{ field.kind }};{% endfor %}"
+    )
+    rendered = template.render(model=recorder.wrap(model))
+
+    assert rendered == "Article:CharField;TextField;"
+    assert recorder.keys == {
+        "model:blog:Article:name",
+        "model:blog:Article:modelfields",
+        "field:blog:Article:title:kind",
+        "field:blog:Article:content:kind",
+    }
+
+
+def test_attribute_recorder_whole_object():
+    """
+    Calling a method or printing a tracked object should record the whole object.
+    """
+    app = get_application()
+    recorder = AttributeRecorder()
+
+    tracked = recorder.wrap(app.models[0])
+    tracked.as_dict()
+    str(recorder.wrap(app))
+
+    assert recorder.keys == {
+        "model:blog:Article:{}".format(WHOLE_OBJECT),
+        "app:blog:{}".format(WHOLE_OBJECT),
+    }
+    assert tracked == app.models[0]
+
+
+def test_signature():
+    """
+    Registry objects should be replaced by their reference in signatures.
+    """
+    app = get_application()
+    model = app.models[0]
+
+    assert get_signature(model.modelfields) == [
+        {"ref": "field:blog:Article:title"},
+        {"ref": "field:blog:Article:content"},
+    ]
+    assert get_signature({"foo": (1, model)}) == {
+        "foo": [1, {"ref": "model:blog:Article"}],
+    }
@@ -0,0 +1,192 @@
+import json
+import shutil
+
+import pytest
+
+from django_willpower.core import ProjectWatcher
+from django_willpower.core.watcher import InotifyWatcher, PollingWatcher
+
+
+def get_inotify_watcher(paths):
+    """
+    Shortcut to get an inotify watcher or skip test if it is not available.
+    """
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError):
+        pytest.skip("Inotify is not available")
+
+
+@pytest.mark.parametrize("watcher_class", [PollingWatcher, get_inotify_watcher])
+def test_watcher(tmp_path, watcher_class):
+    """
+    Watchers should report created, modified and removed files from watched
+    directories and files only.
+    """
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "foo.py").write_text("foo")
+    config = tmp_path / "config.json"
+    config.write_text("{}")
+    (tmp_path / "ignored.txt").write_text("ignored")
+
+    if watcher_class is PollingWatcher:
+        watcher = PollingWatcher([templates, config], interval=0.01)
+    else:
+        watcher = watcher_class([templates, config])
+
+    try:
+        assert watcher.wait(timeout=0.05) == set()
+
+        (templates / "foo.py").write_text("changed foo")
+        (templates / "sub").mkdir()
+        (templates / "sub" / "bar.py").write_text("bar")
+        config.write_text('{"apps": {}}')
+        (tmp_path / "ignored.txt").write_text("changed")
+
+        changes = set()
+        while True:
+            more = watcher.wait(timeout=0.2)
+            if not more:
+                break
+            changes |= more
+
+        assert changes == {
+            (templates / "foo.py").resolve(),
+            (templates / "sub" / "bar.py").resolve(),
+            config.resolve(),
+        }
+
+        (templates / "foo.py").unlink()
+        assert watcher.wait(timeout=1) == {(templates / "foo.py").resolve()}
+    finally:
+        watcher.close()
+
+
+def test_project_watcher(settings, tmp_path):
+    """
+    Project watcher should only render again the modules affected by a change and
+    load registry again when a configuration file changes.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.configs_path / "appstack_single_component", template_dir)
+    declarations = tmp_path / "models.json"
+    shutil.copy(settings.configs_path / "models_basic_blog.json", declarations)
+
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "apps": {
+            "blog": {
+                "name": "Blog app",
+                "destination": "the-blog",
+                "template_dir": str(template_dir),
+                "declarations": str(declarations),
+                "appstack": str(template_dir / "appstack.json"),
+            },
+        },
+    }))
+
+    projectdir = tmp_path / "project"
+    watcher = ProjectWatcher(config, projectdir, debounce=0.05, polling=True)
+    watcher.start()
+
+    try:
+        assert watcher.get_watched_paths() == sorted([
+            config.resolve(),
+            declarations.resolve(),
+            template_dir.resolve(),
+            (template_dir / "appstack.json").resolve(),
+        ])
+
+        assert watcher.build()["rendered"] == 3
+        assert watcher.wait_changes(timeout=0.05) == set()
+
+        # A template change only renders its modules again
+        module = template_dir / "views" / "module.py"
+        module.write_text(module.read_text() + "\n# Changed\n")
+        changes = watcher.wait_changes(timeout=1)
+        assert changes == {module.resolve()}
+
+        registry = watcher.registry
+        stats = watcher.rebuild(changes)
+        assert watcher.registry is registry
+        assert stats["rendered"] == 2
+        assert stats["skipped"] == 1
+
+        # A declarations change loads registry again
+        models = json.loads(declarations.read_text())
+        models["Tag"] = {"fields": {"title": {"kind": "CharField"}}}
+        declarations.write_text(json.dumps(models))
+        changes = watcher.wait_changes(timeout=1)
+        assert changes == {declarations.resolve()}
+
+        stats = watcher.rebuild(changes)
+        assert watcher.registry is not registry
+        assert watcher.builder.registry is watcher.registry
+        assert stats["rendered"] == 2
+        assert (projectdir / "the-blog" / "views" / "tag.py").exists()
+
+        # An invalid configuration is reported without building
+        declarations.unlink()
+        changes = watcher.wait_changes(timeout=1)
+        assert watcher.rebuild(changes) is None
+    finally:
+        watcher.watcher.close()
+
+
+def test_project_watcher_staged(settings, tmp_path):
+    """
+    Project watcher with a staged build should stage the application destinations
+    from the registry loaded again after a configuration change.
+    """
+    template_dir = settings.configs_path / "appstack_single_component"
+    app = {
+        "name": "Blog app",
+        "destination": "the-blog",
+        "template_dir": str(template_dir),
+        "declarations": str(settings.configs_path / "models_basic_blog.json"),
+        "appstack": str(template_dir / "appstack.json"),
+    }
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"apps": {"blog": app}}))
+
+    projectdir = tmp_path / "project"
+    watcher = ProjectWatcher(
+        config,
+        projectdir,
+        debounce=0.05,
+        polling=True,
+        builder_options={"staged": True},
+    )
+    watcher.start()
+
+    try:
+        assert watcher.build()["rendered"] == 3
+
+        # Application destination is moved
+        app["destination"] = "new-blog"
+        config.write_text(json.dumps({"apps": {"blog": app}}))
+        changes = watcher.wait_changes(timeout=1)
+        assert changes == {config.resolve()}
+
+        stats = watcher.rebuild(changes)
+        assert watcher.builder.registry is watcher.registry
+        assert watcher.builder.sink.destinations == [
+            (projectdir / "new-blog").resolve()
+        ]
+        assert stats["rendered"] == 3
+        assert sorted(
+            str(path.relative_to(projectdir / "new-blog"))
+            for path in (projectdir / "new-blog").rglob("*.py")
+        ) == sorted(
+            str(path.relative_to(projectdir / "the-blog"))
+            for path in (projectdir / "the-blog").rglob("*.py")
+        )
+        # No staging directory is left behind
+        assert sorted(path.name for path in projectdir.iterdir()) == [
+            ".willpower-manifest.json",
+            "new-blog",
+            "the-blog",
+        ]
+    finally:
+        watcher.watcher.close()
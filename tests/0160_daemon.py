@@ -0,0 +1,237 @@
+import base64
+import json
+import shutil
+import socket
+import threading
+import time
+
+import pytest
+
+from django_willpower import __version__
+from django_willpower.core import DaemonClient, FileBytecodeCache, ProjectDaemon
+from django_willpower.exceptions import ProjectBuildError, ProjectValidationError
+
+
+@pytest.fixture
+def daemon_client(tmp_path):
+    """
+    Run a daemon in a thread and return a client for it.
+    """
+    socket_path = tmp_path / "willpower.sock"
+    daemon = ProjectDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve, daemon=True)
+    thread.start()
+
+    client = DaemonClient(socket_path, timeout=10)
+    for i in range(100):
+        if client.is_running():
+            break
+        time.sleep(0.02)
+
+    yield client
+
+    client.request("shutdown")
+    thread.join(timeout=5)
+    assert not socket_path.exists()
+
+
+def test_daemon(settings, tmp_path, daemon_client):
+    """
+    Daemon should answer build, plan and render requests with a registry loaded
+    again only when one of its files has changed.
+    """
+    declarations = tmp_path / "models.json"
+    shutil.copy(settings.configs_path / "models_basic_blog.json", declarations)
+    template_dir = settings.configs_path / "appstack_single_component"
+
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "apps": {
+            "blog": {
+                "name": "Blog app",
+                "destination": "the-blog",
+                "template_dir": str(template_dir),
+                "declarations": str(declarations),
+                "appstack": str(template_dir / "appstack.json"),
+            },
+        },
+    }))
+    projectdir = tmp_path / "project"
+
+    assert daemon_client.request("ping")["status"] == "ok"
+
+    response = daemon_client.request(
+        "build",
+        config=str(config),
+        basedir=str(projectdir),
+        options={"incremental": True},
+    )
+    assert response["stats"]["rendered"] == 3
+    assert (projectdir / "the-blog" / "views" / "article.py").exists()
+
+    response = daemon_client.request(
+        "plan",
+        config=str(config),
+        basedir=str(projectdir),
+        options={"incremental": True},
+    )
+    assert response["plan"]["skip"] == 3
+
+    response = daemon_client.request(
+        "render",
+        config=str(config),
+        path="blog@appviews:module",
+        model="Article",
+    )
+    assert response["binary"] is False
+    assert response["content"] == (
+        projectdir / "the-blog" / "views" / "article.py"
+    ).read_text()
+
+    # A changed declarations file is loaded again
+    models = json.loads(declarations.read_text())
+    models["Tag"] = {"fields": {"title": {"kind": "CharField"}}}
+    declarations.write_text(json.dumps(models))
+    response = daemon_client.request(
+        "build",
+        config=str(config),
+        basedir=str(projectdir),
+        options={"incremental": True},
+    )
+    assert response["stats"]["rendered"] == 2
+    assert response["stats"]["skipped"] == 2
+
+    # Errors are raised again from client
+    with pytest.raises(ProjectBuildError):
+        daemon_client.request(
+            "build",
+            config=str(config),
+            basedir=str(projectdir),
+            options={"foo": True},
+        )
+
+    with pytest.raises(ProjectValidationError):
+        daemon_client.request(
+            "build",
+            config=str(tmp_path / "nope.json"),
+            basedir=str(projectdir),
+        )
+
+
+def test_daemon_render_binary(settings, tmp_path, daemon_client):
+    """
+    Content of a copied binary file should be rendered encoded in base64.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.configs_path / "appstack_single_component", template_dir)
+    (template_dir / "logo.png").write_bytes(b"\x89PNG\r\n\xff\xfe")
+
+    appstack = json.loads((template_dir / "appstack.json").read_text())
+    appstack["components"][0]["modules"].append({
+        "name": "Logo",
+        "code": "logo",
+        "template": "logo.png",
+        "destination_pattern": "logo.png",
+        "once": True,
+        "copy_without_render": True,
+    })
+    (template_dir / "appstack.json").write_text(json.dumps(appstack))
+
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "apps": {
+            "blog": {
+                "name": "Blog app",
+                "destination": "the-blog",
+                "template_dir": str(template_dir),
+                "declarations": str(settings.configs_path / "models_basic_blog.json"),
+                "appstack": str(template_dir / "appstack.json"),
+            },
+        },
+    }))
+
+    response = daemon_client.request(
+        "render",
+        config=str(config),
+        path="blog@appviews:logo",
+    )
+    assert response["binary"] is True
+    assert base64.b64decode(response["content"]) == b"\x89PNG\r\n\xff\xfe"
+
+
+def test_daemon_caches(settings, tmp_path):
+    """
+    Cache options from requests should select the daemon bytecode cache, another
+    bytecode cache directory, no bytecode cache and the render cache size.
+    """
+    template_dir = settings.configs_path / "appstack_single_component"
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({
+        "apps": {
+            "blog": {
+                "name": "Blog app",
+                "destination": "the-blog",
+                "template_dir": str(template_dir),
+                "declarations": str(settings.configs_path / "models_basic_blog.json"),
+                "appstack": str(template_dir / "appstack.json"),
+            },
+        },
+    }))
+    projectdir = tmp_path / "project"
+    daemon_cache = FileBytecodeCache(tmp_path / "daemon-bytecode")
+    daemon = ProjectDaemon(tmp_path / "willpower.sock", bytecode_cache=daemon_cache)
+
+    builder = daemon.get_builder(config, projectdir, {})
+    assert builder.bytecode_cache is daemon_cache
+
+    assert daemon.get_builder(
+        config,
+        projectdir,
+        {"bytecode_cache": None},
+    ).bytecode_cache is None
+
+    builder = daemon.get_builder(config, projectdir, {
+        "bytecode_cache": str(tmp_path / "bytecode"),
+        "render_cache": str(tmp_path / "renders"),
+        "render_cache_size": 1024,
+    })
+    assert builder.bytecode_cache.directory == tmp_path / "bytecode"
+    assert builder.render_cache.directory == tmp_path / "renders"
+    assert builder.render_cache.storage.max_size == 1024
+
+    builder.process()
+    assert list((tmp_path / "bytecode").iterdir()) != []
+
+
+def test_daemon_ping(tmp_path, daemon_client):
+    """
+    Ping should return the daemon version and a daemon which does not answer in time
+    should not be considered as running.
+    """
+    assert daemon_client.ping()["version"] == __version__
+
+    # A socket which accepts connections but never answers
+    socket_path = tmp_path / "busy.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+
+        client = DaemonClient(socket_path)
+        client.PING_TIMEOUT = 0.1
+
+        start = time.perf_counter()
+        assert client.ping() is None
+        assert client.is_running() is False
+        assert time.perf_counter() - start < 2
+
+
+def test_daemon_not_running(tmp_path):
+    """
+    Client should report a daemon which is not running.
+    """
+    client = DaemonClient(tmp_path / "willpower.sock")
+
+    assert client.is_running() is False
+
+    with pytest.raises(ConnectionError):
+        client.request("ping")
@@ -0,0 +1,185 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from django_willpower.core import TarSink, ZipSink
+from django_willpower.core.builder import ProjectBuilder
+from django_willpower.core.shards import SHARD_FILENAME, merge_shards, parse_shard
+from django_willpower.exceptions import ProjectBuildError
+
+
+def get_files(path):
+    """
+    Shortcut to get a dict of all files contents indexed on their relative path.
+    """
+    files = {}
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            filepath = Path(root) / name
+            files[str(filepath.relative_to(path))] = filepath.read_bytes()
+
+    return files
+
+
+def test_parse_shard():
+    """
+    Shard definitions should be parsed and validated.
+    """
+    assert parse_shard("2/5") == (2, 5)
+
+    for value in ("2", "a/b", "0/2", "3/2", "1/0"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def test_partition(project_registry, tmp_path):
+    """
+    Partition should be deterministic, disjoint, complete and balanced by cost.
+    """
+    project = project_registry()
+    plan = ProjectBuilder(project, tmp_path).plan()
+
+    shards = plan.partition(2)
+    assert shards == ProjectBuilder(project, tmp_path).plan().partition(2)
+    assert shards[0].isdisjoint(shards[1])
+    assert shards[0] | shards[1] == set(range(len(plan.targets)))
+
+    costs = [sum([plan.targets[i].cost for i in indexes]) for indexes in shards]
+    assert max(costs) - min(costs) <= max([target.cost for target in plan.targets])
+
+    # More shards than targets leaves some shards empty
+    assert sorted([len(indexes) for indexes in plan.partition(7)]) == [
+        0, 0, 1, 1, 1, 1, 1
+    ]
+
+    plan.select_shard(2, 2)
+    assert plan.shard == (2, 2)
+    assert set(plan.pending) == shards[1]
+
+    with pytest.raises(ProjectBuildError):
+        ProjectBuilder(project, tmp_path).plan(shard=(3, 2))
+
+
+@pytest.mark.parametrize("output_format", ["dir", "zip", "tar"])
+def test_build_and_merge_shards(project_registry, tmp_path, output_format):
+    """
+    Shards built apart should be merged to the same files than a full build.
+    """
+    project = project_registry()
+
+    reference = tmp_path / "reference"
+    ProjectBuilder(project, reference).process()
+
+    outputs = []
+    for number in (1, 2, 3):
+        projectdir = tmp_path / "shard-{}".format(number)
+        if output_format == "zip":
+            outputs.append(tmp_path / "shard-{}.zip".format(number))
+            sink = ZipSink(projectdir, outputs[-1])
+        elif output_format == "tar":
+            outputs.append(tmp_path / "shard-{}.tar.gz".format(number))
+            sink = TarSink(projectdir, outputs[-1])
+        else:
+            outputs.append(projectdir)
+            sink = None
+
+        builder = ProjectBuilder(project, projectdir, sink=sink)
+        builder.process(shard=(number, 3))
+
+    if output_format == "dir":
+        manifest = json.loads((outputs[0] / SHARD_FILENAME).read_text())
+        assert manifest["shard"] == 1
+        assert manifest["count"] == 3
+        assert manifest["total"] == 5
+
+    merged = tmp_path / "merged"
+    stats = merge_shards(outputs, merged)
+    assert stats == {"shards": 3, "written": 5, "unchanged": 0}
+    assert get_files(merged) == get_files(reference)
+
+    # Missing and duplicated shards are refused before anything is merged
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([outputs[0], outputs[0], outputs[1]], tmp_path / "nope")
+    assert "Shard 1 is given more than once" in str(excinfo.value)
+    assert "Missing shards: 3" in str(excinfo.value)
+    assert not (tmp_path / "nope").exists()
+
+
+def test_merge_shards_mismatch(project_registry, tmp_path):
+    """
+    Shards from different plans or with missing targets should not be merged.
+    """
+    project = project_registry()
+
+    first = tmp_path / "first"
+    ProjectBuilder(project, first).process(shard=(1, 2))
+    second = tmp_path / "second"
+    ProjectBuilder(project, second).process(only=["blog@*"], shard=(2, 2))
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([first, second], tmp_path / "merged")
+    assert "has a different plan" in str(excinfo.value)
+
+    second = tmp_path / "third"
+    ProjectBuilder(project, second).process(shard=(2, 2))
+    manifest = json.loads((second / SHARD_FILENAME).read_text())
+    (second / manifest["targets"][0]).unlink()
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([first, second], tmp_path / "merged")
+    assert "is missing from shard" in str(excinfo.value)
+
+
+def test_merge_shards_unsafe_paths(project_registry, tmp_path):
+    """
+    Target names and symbolic links should not allow to read or write files outside
+    of the shard output and the project directory.
+    """
+    project = project_registry()
+
+    output = tmp_path / "output"
+    ProjectBuilder(project, output).process(shard=(1, 1))
+    manifest_path = output / SHARD_FILENAME
+    manifest = json.loads(manifest_path.read_text())
+
+    # Names pointing outside of directories are refused
+    (tmp_path / "secret.py").write_text("Secret")
+    tampered = dict(manifest, targets=manifest["targets"][1:] + [
+        "../secret.py",
+        "/tmp/absolute.py",
+        "the-blog/../../secret.py",
+    ])
+    manifest_path.write_text(json.dumps(tampered))
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([output], tmp_path / "merged")
+    for name in tampered["targets"][-3:]:
+        assert "Target {} from shard {} is not a relative path".format(
+            name, output
+        ) in str(excinfo.value)
+    assert not (tmp_path / "merged").exists()
+
+    # A symbolic link in shard output can not expose a file from elsewhere
+    manifest_path.write_text(json.dumps(manifest))
+    target = output / manifest["targets"][0]
+    target.unlink()
+    target.symlink_to(tmp_path / "secret.py")
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([output], tmp_path / "merged")
+    assert "is missing from shard" in str(excinfo.value)
+
+    # A symbolic link in destination can not redirect writes outside of it
+    target.unlink()
+    ProjectBuilder(project, output).process(shard=(1, 1))
+    merged = tmp_path / "merged"
+    merged.mkdir()
+    (tmp_path / "elsewhere").mkdir()
+    (merged / "the-blog").symlink_to(tmp_path / "elsewhere")
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        merge_shards([output], merged)
+    assert "is not a child of the project directory" in str(excinfo.value)
+    assert list((tmp_path / "elsewhere").iterdir()) == []
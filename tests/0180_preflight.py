@@ -0,0 +1,184 @@
+import os
+import shutil
+
+import pytest
+from jinja2 import Environment, TemplateNotFound
+
+from django_willpower.core.builder import ProjectBuilder
+from django_willpower.core.preflight import TemplatePreflight
+from django_willpower.exceptions import ProjectBuildError
+
+
+def copy_stack(settings, tmp_path):
+    """
+    Shortcut to copy the template directory of the CMS application so tests can
+    edit its templates.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.configs_path / "appstack_dual_components", template_dir)
+
+    return template_dir
+
+
+def test_check_template(settings, project_registry, tmp_path):
+    """
+    Template should be loaded from application environment and its references
+    should be found, or its error returned.
+    """
+    template_dir = copy_stack(settings, tmp_path)
+    (template_dir / "foo.py").write_text(
+        "{% include 'bar.py' %}{% from 'macros.jinja' import ping %}"
+        "{% include name %}{{ render_field(field) }}"
+    )
+    (template_dir / "plain.py").write_text("{{ foo }}")
+    (template_dir / "invalid.py").write_text("\n{% if foo %}")
+
+    project = project_registry("cms", template_dir=template_dir)
+    builder = ProjectBuilder(project, tmp_path / "project")
+    preflight = TemplatePreflight(builder)
+    app = project.apps["cms"]
+
+    assert preflight.check_template(app, "foo.py") == (
+        ["bar.py", "macros.jinja"], True, True, None
+    )
+    assert "foo.py" in builder.get_app_environment(app).loader._templates
+
+    assert preflight.check_template(app, "plain.py") == ([], False, False, None)
+
+    assert preflight.check_template(app, "invalid.py") == (
+        [],
+        False,
+        False,
+        "Template 'invalid.py' line 2: Unexpected end of template. Jinja was looking "
+        "for the following tags: 'elif' or 'else' or 'endif'. The innermost block "
+        "that needs to be closed is 'if'.",
+    )
+
+    with pytest.raises(TemplateNotFound):
+        preflight.check_template(app, "nope.py")
+
+
+def test_preflight_valid(project_registry, tmp_path):
+    """
+    Preflight should pass without error on a valid stack and templates compiled
+    during preflight should not be compiled again for rendering.
+    """
+    project = project_registry("cms")
+    builder = ProjectBuilder(project, tmp_path / "project")
+
+    TemplatePreflight(builder).run(builder.get_targets())
+
+    jinja_env = builder.get_app_environment(project.apps["cms"])
+    assert sorted(jinja_env.loader._templates.keys()) == [
+        "plugins/module.py",
+        "views/module.py",
+    ]
+
+    builder.process()
+    assert builder.stats["rendered"] == 2
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_preflight_errors(settings, project_registry, tmp_path, jobs):
+    """
+    Preflight should report every template errors at once before anything is
+    written, including the errors from referenced templates and field templates.
+    """
+    template_dir = copy_stack(settings, tmp_path)
+    project = project_registry("cms", template_dir=template_dir)
+    project.find("cms@applugins:module").template = "plugins/nope.py"
+    (template_dir / "views" / "module.py").write_text(
+        "{% include 'views/_header.py' %}"
+        "{% for field in model_inventory.modelfields %}"
+        "{{ render_field(field) }}"
+        "{% endfor %}"
+    )
+    (template_dir / "views" / "_header.py").write_text("{% if foo %}")
+
+    projectdir = tmp_path / "project"
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, projectdir, jobs=jobs).process()
+
+    message = str(excinfo.value)
+    assert message.startswith("Preflight found ")
+    assert (
+        "- Template of module 'cms@applugins:module' does not exist: plugins/nope.py"
+    ) in message
+    assert "- Template 'views/_header.py' line 1: Unexpected end of template" in (
+        message
+    )
+    assert "does not exist: models/fields/CharField.py" in message
+    assert not projectdir.exists()
+
+
+def test_preflight_dynamic_include(settings, project_registry, tmp_path):
+    """
+    A template which includes a template from a variable should have the template
+    of every field checked.
+    """
+    template_dir = copy_stack(settings, tmp_path)
+    project = project_registry("cms", template_dir=template_dir)
+    (template_dir / "views" / "module.py").write_text(
+        "{% for field in model_inventory.modelfields %}"
+        "{% include field.modelfield_template %}"
+        "{% endfor %}"
+    )
+
+    projectdir = tmp_path / "project"
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, projectdir).process()
+
+    assert "does not exist: models/fields/CharField.py" in str(excinfo.value)
+    assert not projectdir.exists()
+
+
+def test_preflight_disabled(project_registry, tmp_path):
+    """
+    Without preflight, template errors are only found while rendering.
+    """
+    project = project_registry("cms")
+    project.find("cms@applugins:module").template = "plugins/nope.py"
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project, tmp_path / "project", preflight=False).process()
+
+    assert str(excinfo.value).startswith("Unable to render")
+
+
+def test_preflight_reuse(monkeypatch, settings, project_registry, tmp_path):
+    """
+    Preflight should only parse again the templates which have changed since the
+    previous build of the same builder.
+    """
+    parsed = []
+    original_parse = Environment.parse
+
+    def counting_parse(self, source, name=None, filename=None):
+        parsed.append(name)
+        return original_parse(self, source, name, filename)
+
+    monkeypatch.setattr(Environment, "parse", counting_parse)
+
+    template_dir = copy_stack(settings, tmp_path)
+    builder = ProjectBuilder(
+        project_registry("cms", template_dir=template_dir),
+        tmp_path / "project",
+    )
+
+    builder.process()
+    assert sorted(parsed) == ["plugins/module.py", "views/module.py"]
+
+    parsed.clear()
+    builder.process()
+    assert parsed == []
+
+    source = template_dir / "views" / "module.py"
+    source.write_text(source.read_text() + "# Changed\n")
+    mtime = source.stat().st_mtime + 10
+    os.utime(source, (mtime, mtime))
+
+    builder.process()
+    assert parsed == ["views/module.py"]
+    assert "# Changed" in (
+        tmp_path / "project" / "the-cms" / "views" / "page.py"
+    ).read_text()
@@ -0,0 +1,348 @@
+import json
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+
+from django_willpower.core.builder import ProjectBuilder
+from django_willpower.core.sinks import FilesystemSink, MemorySink, TarSink, ZipSink
+from django_willpower.core.writers import WriteBehind
+from django_willpower.exceptions import ProjectBuildError
+
+
+class SlowSink(MemorySink):
+    """
+    A memory sink which simulates the latency of a slow filesystem.
+    """
+    def __init__(self, projectdir, delay):
+        super().__init__(projectdir)
+        self.delay = delay
+
+    def write(self, path, data):
+        time.sleep(self.delay)
+        return super().write(path, data)
+
+
+def test_writebehind_order():
+    """
+    Writes should be collected in submission order whatever the order they finish
+    in.
+    """
+    collected = []
+
+    def job(delay, value):
+        time.sleep(delay)
+        return value
+
+    writer = WriteBehind(4)
+    try:
+        for value, delay in enumerate([0.05, 0.01, 0.03, 0, 0.02]):
+            writer.submit(str(value), collected.append, job, delay, value)
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert collected == [0, 1, 2, 3, 4]
+    assert len(writer) == 0
+
+
+def test_writebehind_error_order():
+    """
+    The reported error should be the one from the oldest failed write, even if a
+    later write has failed before it.
+    """
+    collected = []
+
+    def job(delay, value):
+        time.sleep(delay)
+        if value in (1, 3):
+            raise OSError("Failure {}".format(value))
+        return value
+
+    writer = WriteBehind(4)
+    try:
+        with pytest.raises(ProjectBuildError) as excinfo:
+            for value, delay in enumerate([0, 0.05, 0, 0, 0]):
+                writer.submit(str(value), collected.append, job, delay, value)
+            writer.flush()
+    finally:
+        writer.close(cancel=True)
+
+    assert str(excinfo.value) == "Unable to write '1': OSError: Failure 1"
+    assert collected == [0]
+
+
+def test_writebehind_backpressure():
+    """
+    Submitting should block once queue is full, so there are never more pending
+    writes than the queue size.
+    """
+    lock = threading.Lock()
+    running = []
+    maximum = []
+
+    def job():
+        with lock:
+            running.append(1)
+            maximum.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.pop()
+
+    writer = WriteBehind(2, queue_size=3)
+    try:
+        for index in range(10):
+            writer.submit(str(index), lambda result: None, job)
+            assert len(writer) <= 3
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert len(maximum) == 10
+    assert max(maximum) <= 2
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_build_writers(project_registry, tmp_path, jobs):
+    """
+    Builder should write the same files with the same stats and manifest when
+    writes are made from writer threads.
+    """
+    project = project_registry()
+
+    sync_builder = ProjectBuilder(project, tmp_path / "sync", incremental=True)
+    sync_builder.process()
+
+    builder = ProjectBuilder(
+        project,
+        tmp_path / "async",
+        jobs=jobs,
+        incremental=True,
+        writers=3,
+        write_queue_size=2,
+    )
+    builder.process()
+
+    assert builder.stats == sync_builder.stats
+
+    sync_files = sorted([
+        path.relative_to(tmp_path / "sync")
+        for path in (tmp_path / "sync").rglob("*")
+        if path.is_file()
+    ])
+    files = sorted([
+        path.relative_to(tmp_path / "async")
+        for path in (tmp_path / "async").rglob("*")
+        if path.is_file()
+    ])
+    assert files == sync_files
+    for path in files:
+        if path.name == ".willpower-manifest.json":
+            continue
+        assert (tmp_path / "async" / path).read_text() == (
+            (tmp_path / "sync" / path).read_text()
+        )
+
+    assert sorted(builder.manifest.entries) == sorted(sync_builder.manifest.entries)
+
+    # Incremental build from writer threads skips everything
+    builder = ProjectBuilder(project, tmp_path / "async", incremental=True, writers=3)
+    builder.process()
+    assert builder.stats["skipped"] == 5
+    assert builder.stats["rendered"] == 0
+
+
+def test_build_writers_archive(project_registry, tmp_path):
+    """
+    A sink which does not support concurrent writes should still be written from
+    writer threads.
+    """
+    project = project_registry()
+    archive = tmp_path / "project.zip"
+    sink = ZipSink(tmp_path / "project", archive)
+
+    builder = ProjectBuilder(project, tmp_path / "project", sink=sink, writers=4)
+    builder.process()
+
+    assert builder.stats["written"] == 5
+
+    with zipfile.ZipFile(archive) as fp:
+        assert len(fp.namelist()) == 5
+
+
+@pytest.mark.parametrize("output_format", ["zip", "tar"])
+def test_build_writers_archive_streaming(settings, project_registry, tmp_path,
+                                         output_format):
+    """
+    Streamed modules written from the main thread and copied modules written from
+    writer threads should not be written at once into an archive.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.data_path / "default_stack", template_dir)
+
+    asset = template_dir / "static" / "logo.png"
+    asset.parent.mkdir()
+    asset.write_bytes(b"\x89PNG\r\n\xff\xfe" * 100000)
+
+    appstack = json.loads((template_dir / "appstack.json").read_text())
+    appstack["components"].append({
+        "name": "Static",
+        "code": "static",
+        "directory": "static",
+        "modules": [
+            {
+                "name": "Logo",
+                "code": "logo",
+                "template": "static/logo.png",
+                "destination_pattern": "logo.png",
+                "once": True,
+                "copy_without_render": True,
+            },
+        ],
+    })
+    (template_dir / "appstack.json").write_text(json.dumps(appstack))
+
+    project = project_registry(
+        template_dir=template_dir,
+        declarations=settings.data_path / "sample_declarations.json",
+    )
+
+    reference = tmp_path / "reference"
+    ProjectBuilder(project, reference).process()
+    expected = {
+        str(path.relative_to(reference)): path.read_bytes()
+        for path in reference.rglob("*")
+        if path.is_file() and not path.name.startswith(".willpower")
+    }
+
+    projectdir = tmp_path / "project"
+    if output_format == "zip":
+        archive = tmp_path / "project.zip"
+        sink = ZipSink(projectdir, archive)
+    else:
+        archive = tmp_path / "project.tar.gz"
+        sink = TarSink(projectdir, archive)
+
+    builder = ProjectBuilder(
+        project, projectdir, sink=sink, streaming=True, writers=2,
+    )
+    builder.process()
+    assert builder.stats["copied"] == 2
+
+    if output_format == "zip":
+        with zipfile.ZipFile(archive) as fp:
+            assert fp.testzip() is None
+            built = {name: fp.read(name) for name in fp.namelist()}
+    else:
+        with tarfile.open(archive, "r:gz") as fp:
+            built = {
+                member.name: fp.extractfile(member).read()
+                for member in fp.getmembers()
+                if member.isfile()
+            }
+
+    assert built == expected
+
+
+def test_build_writers_error(project_registry, tmp_path):
+    """
+    A failed write from writer threads should abort the build with the target path.
+    """
+    project = project_registry()
+
+    class FailingSink(MemorySink):
+        def write(self, path, data):
+            if path.parts[-2:] == ("views", "page.py"):
+                raise OSError("No space left on device")
+            return super().write(path, data)
+
+    sink = FailingSink(tmp_path)
+    builder = ProjectBuilder(project, tmp_path, sink=sink, writers=2)
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        builder.process()
+
+    assert str(excinfo.value) == (
+        "Unable to write 'cms@appviews:module#Page': OSError: No space left on "
+        "device"
+    )
+
+
+@pytest.mark.parametrize("options", [
+    {"writers": 2},
+    {"streaming": True},
+    {"streaming": True, "jobs": 2},
+])
+@pytest.mark.parametrize("policy, expected_files, expected_directories", [
+    ("none", 0, 0),
+    ("file", 5, 3),
+    ("build", 5, 3),
+])
+def test_sink_fsync(monkeypatch, project_registry, tmp_path, policy, expected_files,
+                    expected_directories, options):
+    """
+    Written files should be flushed to disk depending on fsync policy, including
+    the temporary files of streamed modules rendered by worker processes.
+    """
+    synced = []
+    monkeypatch.setattr(
+        "django_willpower.core.sinks.fsync_path",
+        lambda path: synced.append(path)
+    )
+
+    project = project_registry()
+    builder = ProjectBuilder(project, tmp_path, fsync=policy, **options)
+    builder.process()
+
+    # Flushed temporary files have been renamed since
+    assert len([path for path in synced if not path.is_dir()]) == expected_files
+    assert len([path for path in synced if path.is_dir()]) == expected_directories
+
+
+def test_sink_fsync_invalid(tmp_path):
+    """
+    An unknown fsync policy should be refused.
+    """
+    with pytest.raises(ProjectBuildError) as excinfo:
+        FilesystemSink(tmp_path, fsync="always")
+
+    assert str(excinfo.value) == (
+        "Invalid fsync policy 'always', it must be one of: none, file, build"
+    )
+
+
+def test_writers_benchmark(project_registry, tmp_path):
+    """
+    On a slow filesystem, writing from threads should overlap writes with rendering
+    and with each others so the build takes less time.
+    """
+    project = project_registry()
+    delay = 0.05
+
+    def timed(writers):
+        builder = ProjectBuilder(
+            project,
+            tmp_path,
+            sink=SlowSink(tmp_path, delay),
+            writers=writers,
+            preflight=False,
+        )
+        # Warm up environments so only rendering and writing are measured
+        builder.process()
+
+        builder.sink = SlowSink(tmp_path, delay)
+        start = time.perf_counter()
+        builder.process()
+
+        return time.perf_counter() - start, builder.sink.files
+
+    sync_elapsed, sync_files = timed(0)
+    async_elapsed, async_files = timed(4)
+
+    assert async_files == sync_files
+    # Five writes sequentially against at most two rounds of concurrent writes
+    assert sync_elapsed >= 5 * delay
+    assert async_elapsed < sync_elapsed * 0.75
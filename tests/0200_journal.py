@@ -0,0 +1,247 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from django_willpower import __version__
+from django_willpower.core.builder import ProjectBuilder
+from django_willpower.core.journal import BuildJournal
+from django_willpower.core.sinks import FilesystemSink, MemorySink
+from django_willpower.exceptions import ProjectBuildError
+
+
+def get_built_files(path):
+    """
+    Shortcut to get a dict of all built files contents indexed on their relative path.
+    """
+    built_files = {}
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            filepath = Path(root) / name
+            built_files[str(filepath.relative_to(path))] = filepath.read_text()
+
+    return built_files
+
+
+class InterruptedSink(FilesystemSink):
+    """
+    A filesystem sink which interrupts the build after some writes, like a Ctrl-C.
+    """
+    def __init__(self, projectdir, limit):
+        super().__init__(projectdir)
+        self.limit = limit
+
+    def write(self, path, data):
+        if self.limit == 0:
+            raise KeyboardInterrupt()
+        self.limit -= 1
+
+        return super().write(path, data)
+
+
+def interrupt_build(project_registry, projectdir, limit, **kwargs):
+    """
+    Shortcut to run a build interrupted after some written targets.
+    """
+    builder = ProjectBuilder(
+        project_registry(),
+        projectdir,
+        sink=InterruptedSink(projectdir, limit),
+        **kwargs
+    )
+
+    with pytest.raises(KeyboardInterrupt):
+        builder.process()
+
+
+def test_journal_load(tmp_path):
+    """
+    Journal should ignore undecodable lines and journals from another version.
+    """
+    path = tmp_path / BuildJournal.FILENAME
+    journal = BuildJournal(path)
+
+    journal.open("plan-1")
+    journal.record("foo.py", "app@comp:mod#Foo", "inputs-1", path)
+    journal.close()
+
+    # Simulate a build killed while writing an entry
+    with path.open("a") as fp:
+        fp.write('{"key": "bar.py", "ha')
+
+    journal = BuildJournal(path).load()
+    assert journal.plan == "plan-1"
+    assert list(journal.entries.keys()) == ["foo.py"]
+    assert journal.entries["foo.py"]["target"] == "app@comp:mod#Foo"
+
+    path.write_text(json.dumps({"version": "0.0.0", "plan": "plan-1"}) + "\n")
+    journal = BuildJournal(path).load()
+    assert journal.plan is None
+    assert journal.entries == {}
+
+    journal.close(remove=True)
+    assert not path.exists()
+
+
+def test_journal_written(project_registry, tmp_path):
+    """
+    An interrupted build should leave a journal with its completed targets and a
+    finished build should remove it.
+    """
+    projectdir = tmp_path / "project"
+    interrupt_build(project_registry, projectdir, 2)
+
+    lines = [
+        json.loads(line)
+        for line in (projectdir / BuildJournal.FILENAME).read_text().splitlines()
+    ]
+    assert lines[0]["version"] == __version__
+    assert [line["target"] for line in lines[1:]] == [
+        "blog@appviews:module#Blog",
+        "blog@appviews:module#Article",
+    ]
+    assert lines[1]["hash"] == BuildJournal.file_hash(
+        projectdir / "the-blog" / "views" / "blog.py"
+    )
+
+    ProjectBuilder(project_registry(), projectdir).process()
+    assert not (projectdir / BuildJournal.FILENAME).exists()
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"streaming": True},
+    {"jobs": 2},
+    {"jobs": 2, "streaming": True},
+    {"writers": 2},
+])
+def test_journal_content_hash(monkeypatch, project_registry, tmp_path, options):
+    """
+    Journal entries should be recorded with the hash of written contents without
+    reading the written files again.
+    """
+    recorded = {}
+    record = BuildJournal.record
+
+    def spy(self, key, *args, **kwargs):
+        recorded[key] = kwargs.get("content_hash")
+        return record(self, key, *args, **kwargs)
+
+    monkeypatch.setattr(BuildJournal, "record", spy)
+
+    projectdir = tmp_path / "project"
+    ProjectBuilder(project_registry(), projectdir, **options).process()
+
+    assert len(recorded) == 5
+    for key, content_hash in recorded.items():
+        assert content_hash == BuildJournal.file_hash(projectdir / key)
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"jobs": 2},
+    {"writers": 2},
+    {"incremental": True},
+])
+def test_resume(project_registry, tmp_path, options):
+    """
+    Resuming should only build the targets which have not been completed by the
+    interrupted build and write the same files than a complete build.
+    """
+    reference = tmp_path / "reference"
+    ProjectBuilder(project_registry(), reference, **options).process()
+
+    projectdir = tmp_path / "project"
+    interrupt_build(project_registry, projectdir, 3)
+
+    builder = ProjectBuilder(project_registry(), projectdir, **options)
+    builder.process(resume=True)
+
+    assert builder.stats["skipped"] == 3
+    assert builder.stats["rendered"] == 2
+    assert not (projectdir / BuildJournal.FILENAME).exists()
+
+    built_files = get_built_files(projectdir)
+    reference_files = get_built_files(reference)
+    built_files.pop(".willpower-manifest.json", None)
+    reference_files.pop(".willpower-manifest.json", None)
+    assert built_files == reference_files
+
+
+def test_resume_twice(project_registry, tmp_path):
+    """
+    A resumed build which is interrupted again should keep the targets completed
+    by both builds.
+    """
+    projectdir = tmp_path / "project"
+    interrupt_build(project_registry, projectdir, 1)
+
+    builder = ProjectBuilder(
+        project_registry(),
+        projectdir,
+        sink=InterruptedSink(projectdir, 2),
+    )
+    with pytest.raises(KeyboardInterrupt):
+        builder.process(resume=True)
+
+    builder = ProjectBuilder(project_registry(), projectdir)
+    builder.process(resume=True)
+
+    assert builder.stats["skipped"] == 3
+    assert builder.stats["rendered"] == 2
+
+
+def test_resume_changes(project_registry, tmp_path):
+    """
+    A completed target should be built again if its file or its inputs have changed
+    since the interrupted build.
+    """
+    projectdir = tmp_path / "project"
+    interrupt_build(project_registry, projectdir, 4)
+
+    (projectdir / "the-blog" / "views" / "blog.py").write_text("Edited")
+
+    # Module '__init__' is rendered with all blog models so it changes too
+    project = project_registry()
+    project.apps["blog"].get_model("Article").verbose_plural = "Posts"
+
+    builder = ProjectBuilder(project, projectdir)
+    builder.process(resume=True)
+
+    assert builder.stats["skipped"] == 1
+    assert builder.stats["rendered"] == 4
+    assert (projectdir / "the-blog" / "views" / "blog.py").read_text() != "Edited"
+
+
+def test_resume_errors(project_registry, tmp_path):
+    """
+    Resuming should fail if journal has been written for another plan or if journal
+    is not available, and build everything when there is no journal.
+    """
+    projectdir = tmp_path / "project"
+
+    builder = ProjectBuilder(project_registry(), projectdir)
+    builder.process(resume=True)
+    assert builder.stats["rendered"] == 5
+
+    interrupt_build(project_registry, projectdir, 1)
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(project_registry(), projectdir).process(
+            only=["blog@*"],
+            resume=True,
+        )
+    assert str(excinfo.value).startswith(
+        "Build journal does not match the current plan"
+    )
+
+    with pytest.raises(ProjectBuildError) as excinfo:
+        ProjectBuilder(
+            project_registry(),
+            projectdir,
+            sink=MemorySink(projectdir),
+        ).process(resume=True)
+    assert str(excinfo.value) == (
+        "Resume is only available with a filesystem sink and without staged build."
+    )
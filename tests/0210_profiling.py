@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from django_willpower import __version__
+from django_willpower.core import BuildProfiler
+from django_willpower.core.builder import ProjectBuilder
+
+
+def test_profiler_phase():
+    """
+    Phase timings should accumulate.
+    """
+    profiler = BuildProfiler()
+
+    with profiler.phase("foo"):
+        sum(range(1000))
+    with profiler.phase("foo"):
+        pass
+
+    assert profiler.phases["foo"]["count"] == 2
+    assert profiler.phases["foo"]["wall"] > 0
+    assert profiler.phases["foo"]["cpu"] >= 0
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"jobs": 2},
+    {"writers": 2},
+    {"streaming": True},
+])
+def test_build_profile(project_registry, tmp_path, options):
+    """
+    Builder should record phases, targets renders and writes with the size of their
+    output and template compilations.
+    """
+    profiler = BuildProfiler()
+    builder = ProjectBuilder(
+        project_registry(),
+        tmp_path,
+        profiler=profiler,
+        **options
+    )
+    builder.process()
+
+    report = profiler.get_report()
+
+    assert report["version"] == __version__
+    assert {"plan", "preflight", "prepare", "render", "close", "finalize"} <= set(
+        report["phases"]
+    )
+    assert sorted(report["targets"]) == [
+        "blog@appviews:init",
+        "blog@appviews:module#Article",
+        "blog@appviews:module#Blog",
+        "cms@applugins:module#Page",
+        "cms@appviews:module#Page",
+    ]
+
+    for path, profile in report["targets"].items():
+        assert profile["render"]["count"] == 1
+        assert profile["write"]["count"] == 1
+        assert profile["written"] is True
+        assert profile["bytes"] == (tmp_path / profile["destination"]).stat().st_size
+
+    assert report["targets"]["cms@appviews:module#Page"]["destination"] == (
+        "the-cms/views/page.py"
+    )
+
+    assert report["totals"]["targets"] == 5
+    assert report["totals"]["bytes"] == report["totals"]["written"]
+    assert report["totals"]["bytes"] == sum([
+        path.stat().st_size for path in tmp_path.rglob("*.py")
+    ])
+    assert sorted(report["apps"]) == ["blog", "cms"]
+    assert report["apps"]["blog"]["targets"] == 3
+    assert sorted(report["components"]) == [
+        "blog@appviews",
+        "cms@applugins",
+        "cms@appviews",
+    ]
+    assert report["templates"]["views/module.py"]["targets"] == 3
+
+    if options.get("jobs", 1) == 1:
+        # Compiled templates from current process
+        assert report["totals"]["compile"]["count"] >= 3
+        assert report["templates"]["plugins/module.py"]["compile"]["count"] == 1
+
+
+def test_build_profile_unchanged(project_registry, tmp_path):
+    """
+    Files left unchanged should not be counted as written bytes.
+    """
+    ProjectBuilder(project_registry(), tmp_path).process()
+
+    profiler = BuildProfiler()
+    ProjectBuilder(
+        project_registry(),
+        tmp_path,
+        profiler=profiler,
+    ).process()
+
+    report = profiler.get_report()
+    assert report["totals"]["bytes"] > 0
+    assert report["totals"]["written"] == 0
+
+
+def test_profile_summary(project_registry, tmp_path):
+    """
+    Summary should list phases and the slowest targets and report should be saved
+    as JSON.
+    """
+    profiler = BuildProfiler()
+    ProjectBuilder(
+        project_registry(),
+        tmp_path / "project",
+        profiler=profiler,
+    ).process()
+
+    summary = profiler.get_summary(top=2)
+    lines = summary.splitlines()
+
+    assert lines[0] == "Phases:"
+    assert "Targets: 5 rendered in " in summary
+    slowest = lines[lines.index("Slowest targets:") + 1:]
+    assert len(slowest) == 2
+    assert [
+        line.split()[-1] for line in slowest
+    ] == [path for path, profile in profiler.get_slowest_targets(top=2)]
+
+    path = tmp_path / "profile.json"
+    profiler.save(path)
+    assert json.loads(path.read_text()) == profiler.get_report()
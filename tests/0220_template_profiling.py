@@ -0,0 +1,122 @@
+import shutil
+import sys
+
+import pytest
+
+from django_willpower.core import TemplateProfiler
+from django_willpower.core.builder import ProjectBuilder
+
+
+def copy_stack(settings, tmp_path):
+    """
+    Shortcut to copy the template directory of the CMS application where the views
+    template includes a template, calls a macro from utilities and an inline macro
+    from a block.
+    """
+    template_dir = tmp_path / "stack"
+    shutil.copytree(settings.configs_path / "appstack_dual_components", template_dir)
+
+    (template_dir / "_utils.jinja").write_text(
+        "{% macro title(text) -%}\n"
+        "{{ text|upper }}\n"
+        "{%- endmacro %}\n"
+    )
+    (template_dir / "views" / "_header.py").write_text(
+        "# {{ utils.title(model_inventory.name) }}\n"
+    )
+    (template_dir / "views" / "module.py").write_text(
+        "{% macro klass(name) -%}\n"
+        "class {{ name }}:\n"
+        "    pass\n"
+        "{%- endmacro %}\n"
+        "{% include 'views/_header.py' %}\n"
+        "{% block body %}\n"
+        "{{ klass(model_inventory.name) }}\n"
+        "{% endblock %}\n"
+    )
+
+    return template_dir
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"jobs": 2},
+    {"streaming": True},
+])
+def test_template_profiler_stacks(settings, project_registry, tmp_path, options):
+    """
+    Render times should be attributed to template lines under the lines which
+    include templates and call macros, including the renders from workers.
+    """
+    previous = sys.gettrace()
+    profiler = TemplateProfiler()
+
+    builder = ProjectBuilder(
+        project_registry("cms", template_dir=copy_stack(settings, tmp_path)),
+        tmp_path / "project",
+        template_profiler=profiler,
+        **options
+    )
+    builder.process()
+
+    assert sys.gettrace() is previous
+    assert (tmp_path / "project" / "the-cms" / "views" / "page.py").read_text() == (
+        "\n# PAGE\n\nclass Page:\n    pass\n"
+    )
+
+    assert {
+        ("views/module.py:5", "views/_header.py:1"),
+        ("views/module.py:5", "views/_header.py:1", "_utils.jinja:title():2"),
+        ("views/module.py:6", "views/module.py:block_body:7"),
+        (
+            "views/module.py:6",
+            "views/module.py:block_body:7",
+            "views/module.py:klass():2",
+        ),
+        ("plugins/module.py:1",),
+    } <= set(profiler.stacks)
+
+    for stack, elapsed in profiler.stacks.items():
+        assert len(stack) > 0
+        assert elapsed >= 0
+
+
+def test_template_profiler_output(tmp_path):
+    """
+    Stacks should be merged and output in the collapsed stack format and summary
+    should list lines from their self time.
+    """
+    profiler = TemplateProfiler()
+    profiler.merge({
+        ("foo.py:1",): 0.002,
+        ("foo.py:2", "bar.py:1"): 0.0015,
+        ("foo.py:3",): 0.0000001,
+    })
+    profiler.merge({
+        ("foo.py:1",): 0.001,
+        ("foo.py:4", "bar.py:1"): 0.001,
+    })
+
+    assert profiler.get_collapsed() == (
+        "foo.py:1 3000\n"
+        "foo.py:2;bar.py:1 1500\n"
+        "foo.py:4;bar.py:1 1000\n"
+    )
+    assert profiler.get_lines(top=2) == [
+        ("foo.py:1", pytest.approx(0.003)),
+        ("bar.py:1", pytest.approx(0.0025)),
+    ]
+    assert profiler.get_summary(top=2).splitlines() == [
+        "Slowest template lines:",
+        "      3.000ms foo.py:1",
+        "      2.500ms bar.py:1",
+    ]
+
+    path = tmp_path / "profiles" / "templates.txt"
+    profiler.save(path)
+    assert path.read_text() == profiler.get_collapsed()
+
+    stacks = profiler.pop_stacks()
+    assert len(stacks) == 4
+    assert profiler.stacks == {}
+    assert profiler.get_collapsed() == ""
@@ -7,6 +7,7 @@ from pathlib import Path
 import pytest
 
 import django_willpower
+from django_willpower.core import ProjectRegistry
 
 
 class FixturesSettingsTestMixin(object):
@@ -97,3 +98,53 @@ def load_json():
         return json.loads(path.read_text())
 
     return func
+
+
+@pytest.fixture(scope="module")
+def project_registry(settings):
+    """
+    Return a function to get a project registry loaded with the blog and CMS
+    applications from configuration samples.
+
+    Loaded applications can be restricted to the given application codes. Template
+    directory (where application stack is found) and declarations can be replaced
+    for every loaded applications, like with an edited copy of a template directory.
+
+    Example:
+        You may use it like this: ::
+
+            project = project_registry()
+            project = project_registry("cms", template_dir=tmp_path / "stack")
+    """
+    apps = {
+        "blog": {
+            "name": "Blog app",
+            "destination": "the-blog",
+            "template_dir": settings.configs_path / "appstack_single_component",
+            "declarations": settings.configs_path / "models_basic_blog.json",
+        },
+        "cms": {
+            "name": "CMS app",
+            "destination": "the-cms",
+            "template_dir": settings.configs_path / "appstack_dual_components",
+            "declarations": settings.configs_path / "models_basic_cms.json",
+        },
+    }
+
+    def func(*codes, template_dir=None, declarations=None):
+        configs = {}
+        for code in codes or apps.keys():
+            config = dict(apps[code])
+            if template_dir:
+                config["template_dir"] = template_dir
+            if declarations:
+                config["declarations"] = declarations
+            config["appstack"] = config["template_dir"] / "appstack.json"
+            configs[code] = config
+
+        project = ProjectRegistry()
+        project.load_configuration({"apps": configs})
+
+        return project
+
+    return func